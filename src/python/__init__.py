@@ -1,6 +1,14 @@
 from .main import main
 
-from .adapters.incoming.api import app
-
 
 __all__ = ["main"]
+
+
+def __getattr__(name: str):
+    # The API, with FastAPI, Pydantic and SQLAlchemy, is only imported when
+    # used, so the CLI and workers that do not serve it start faster.
+    if name == "app":
+        from .adapters.incoming.api import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,11 @@
 import argparse
+import importlib.util
+import logging
+import os
+
 from . import main
+from .main import setup_logging
+from .adapters.incoming.cli import add_subcommands
 
 
 parser = argparse.ArgumentParser(description="Run the message board.")
@@ -15,23 +21,104 @@ parser.add_argument(
 parser.add_argument(
     "--reload", action="store_true", help="Reload the server on changes."
 )
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+    help="The worker processes to serve with (defaults to WEB_CONCURRENCY or 1).",
+)
+parser.add_argument(
+    "--loop",
+    choices=("auto", "uvloop", "asyncio"),
+    default="auto",
+    help="The event loop; auto uses uvloop when installed.",
+)
+parser.add_argument(
+    "--http",
+    choices=("auto", "httptools", "h11"),
+    default="auto",
+    help="The HTTP parser; auto uses httptools when installed.",
+)
+parser.add_argument(
+    "--timeout-keep-alive",
+    type=int,
+    default=75,
+    help="The seconds to keep idle connections open; keep it longer than the "
+    "load balancer's idle timeout so it never reuses a closing connection.",
+)
+parser.add_argument(
+    "--backlog",
+    type=int,
+    default=2048,
+    help="The connections the socket queues while every worker is busy.",
+)
+parser.add_argument(
+    "--limit-concurrency",
+    type=int,
+    default=None,
+    help="The connections and tasks per worker beyond which requests get 503.",
+)
+add_subcommands(parser.add_subparsers(dest="command", title="commands"))
+
+logger = logging.getLogger(__name__)
+
+# The fast implementations of each option, and the fallback when missing.
+IMPLEMENTATIONS = {"loop": ("uvloop", "asyncio"), "http": ("httptools", "h11")}
+
+
+def _implementation(option: str, requested: str) -> str:
+    fast, fallback = IMPLEMENTATIONS[option]
+    if requested not in ("auto", fast):
+        return requested
+    if importlib.util.find_spec(fast) is not None:
+        return fast
+    if requested == fast:
+        logger.warning("%s is not installed, using %s", fast, fallback)
+    return fallback
+
+
+def server_options(args: argparse.Namespace) -> dict:
+    """
+    Returns the uvicorn settings of the serving arguments.
+    """
+    return dict(
+        host=args.host,
+        port=args.port,
+        loop=_implementation("loop", args.loop),
+        http=_implementation("http", args.http),
+        timeout_keep_alive=args.timeout_keep_alive,
+        backlog=args.backlog,
+        limit_concurrency=args.limit_concurrency,
+        # main() configures logging; uvicorn's own configuration would replace
+        # it, and requests are logged by the API's access log instead.
+        log_config=None,
+        access_log=False,
+    )
 
 
 def cli():
+    args = parser.parse_args()
+    if args.command is not None:
+        setup_logging(args.debug)
+        return args.handler(args)
     import uvicorn
 
-    args = parser.parse_args()
-    if args.reload:
+    if args.reload or args.workers > 1:
+        # Each worker process imports and builds its own app, with its own
+        # engine, through the factory; they learn of --debug from DEBUG.
+        if args.debug:
+            os.environ["DEBUG"] = "true"
+        setup_logging(args.debug)
         uvicorn.run(
             "src.python:main",
             factory=True,
             reload=args.reload,
-            host=args.host,
-            port=args.port,
+            workers=None if args.reload else args.workers,
+            **server_options(args),
         )
     else:
         app = main(debug=args.debug)
-        uvicorn.run(app, reload=args.reload, host=args.host, port=args.port)
+        uvicorn.run(app, **server_options(args))
 
 
 if __name__ == "__main__":
@@ -2,24 +2,83 @@
 Adapter for REST API
 """
 
+import asyncio
 import datetime
+import functools
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import format_datetime, parsedate_to_datetime
+from itertools import cycle
 from types import NoneType
-from typing import Annotated, Any, Optional
+from typing import Annotated, Any, AsyncIterator, Mapping, Optional, Sequence
 
-from decouple import config
-from fastapi import Depends, FastAPI, Response
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, ConfigDict, Field
+from decouple import Csv, config
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing_extensions import TypedDict
 
 from ...domain.models import Message, Visitor
-from ...ports.repository import SQLAlchemyRepository
+from ...ports.cache import BaseSharedCache, InMemorySharedCache, LRUCache
+from ...ports.producer import BaseProducer, Event, InMemoryEventSink
+from ...ports.repository import (
+    BatchError,
+    BatchResult,
+    BaseRepository,
+    CachedRepository,
+    EntityNotFoundError,
+    Outbox,
+    Page,
+    SQLAlchemyRepository,
+    Version,
+    decode_cursor,
+    decode_search_cursor,
+)
+from ..outgoing import migrations
+from ..outgoing.logging import log_context, track_database_time
+from ..outgoing.metrics import MetricsRegistry, instrument_engine
+from ..outgoing.profiling import Profiler
+from ..outgoing.outbox import OutboxRelay
+from ..outgoing.producer import BatchingProducer, NDJSONFileSink
 from ..outgoing.relational_database import (
+    DEFAULT_DATABASE_URL,
     MessageModel,
     VisitorModel,
     async_sessionmaker,
     create_database_engine,
     get_sessionmaker,
+    maintain_sqlite,
+    maintain_sqlite_periodically,
+    messages_search,
+    outbox,
+    warm_pool,
+)
+from .schemas import (
+    MessageCreateSchema,
+    MessageUpdateSchema,
+    VisitorCreateSchema,
+    VisitorUpdateSchema,
 )
+from .settings import get_database_engine_options
+
+logger = logging.getLogger(__name__)
 
 
 class VisitorSchema(BaseModel, Visitor):
@@ -29,11 +88,6 @@ class VisitorSchema(BaseModel, Visitor):
     messages: list["MessageSchema"] = Field(..., default_factory=list)
 
 
-class VisitorCreateSchema(BaseModel):
-    name: str
-    email: str
-
-
 async def filter_visitor_parameters(name: str = None, email: str = None):
     params = dict()
     if name:
@@ -47,160 +101,1369 @@ class MessageSchema(BaseModel, Message):
     model_config = ConfigDict(from_attributes=True)
 
     deleted_at: datetime.datetime | Any = Field(..., exclude=True)
+    # the column is nullable, e.g. for messages stored without the API
+    visitor_id: Optional[int] = None
+
+
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    """
+    Converts an aware datetime to the naive UTC the database stores.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
 
 
-class MessageCreateSchema(BaseModel):
-    content: str
-    sender: str
-    receiver: str
-    visitor_id: int
+async def filter_message_parameters(
+    sender: str = None,
+    receiver: str = None,
+    visitor_id: int = None,
+    created_after: datetime.datetime = None,
+    created_before: datetime.datetime = None,
+):
+    params = dict()
+    if sender:
+        params["sender"] = sender
+    if receiver:
+        params["receiver"] = receiver
+    if visitor_id is not None:
+        params["visitor_id"] = visitor_id
+    if created_after is not None:
+        params["created_at__gte"] = as_utc(created_after)
+    if created_before is not None:
+        params["created_at__lt"] = as_utc(created_before)
+    return params
 
 
-class MessageUpdateSchema(MessageCreateSchema):
-    content: Optional[str] = None
-    sender: Optional[str] = None
-    receiver: Optional[str] = None
-    visitor_id: Optional[int] = None
+class BatchCountSchema(BaseModel):
+    count: int
+
+
+class BatchErrorSchema(BaseModel):
+    index: int
+    detail: Any
+
+
+class VisitorBatchSchema(BaseModel):
+    items: list[VisitorSchema]
+    errors: list[BatchErrorSchema]
+
+
+class MessageBatchSchema(BaseModel):
+    items: list[MessageSchema]
+    errors: list[BatchErrorSchema]
+
+
+class MessageSearchHitSchema(MessageSchema):
+    rank: float
+    snippet: str
+
+
+BATCH_MAX_ITEMS = 10_000
+
+BatchItems = Annotated[list[Any], Body(max_length=BATCH_MAX_ITEMS)]
+
+
+async def create_batch(
+    repository: BaseRepository, schema: type[BaseModel], items: list[Any]
+) -> BatchResult:
+    """
+    Validates each batch item on its own and creates the valid ones in bulk,
+    reporting failures by their position in the request.
+    """
+    valid, indexes, errors = [], [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(schema.model_validate(item).model_dump())
+            indexes.append(index)
+        except ValidationError as e:
+            errors.append(
+                BatchError(index, e.errors(include_url=False, include_context=False))
+            )
+    result = await repository.create_many(
+        valid, chunk_size=config("BATCH_CHUNK_SIZE", default=500, cast=int)
+    )
+    errors.extend(BatchError(indexes[e.index], e.detail) for e in result.errors)
+    result.errors = sorted(errors, key=lambda error: error.index)
+    return result
+
+
+async def pagination_parameters(
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: Optional[str] = None,
+):
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return dict(limit=limit, cursor=cursor)
+
+
+async def search_pagination_parameters(
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: Optional[str] = None,
+):
+    if cursor is not None:
+        try:
+            decode_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return dict(limit=limit, cursor=cursor)
+
+
+def set_pagination_headers(request: Request, response: Response, page: Page):
+    """
+    Advertises the next page through `X-Next-Cursor` and a `Link` header.
+    """
+    if page.next_cursor is not None:
+        next_url = request.url.include_query_params(cursor=page.next_cursor)
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+def has_validators(request: Request) -> bool:
+    """
+    Whether the request is conditional, i.e. worth probing a `Version` for.
+    """
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def not_modified(request: Request, version: Version, modified_since=False) -> bool:
+    """
+    Evaluates `If-None-Match` (weak comparison) and, when `modified_since` is
+    set, `If-Modified-Since` against a `Version`.
+
+    `If-Modified-Since` only suits single resources: a deletion does not move
+    `Last-Modified` of a listing forward.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return version.etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if modified_since and if_modified_since and version.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        last_modified = version.last_modified.replace(tzinfo=datetime.timezone.utc)
+        return last_modified <= since
+    return False
+
+
+def set_version_headers(response: Response, version: Version):
+    """
+    Sets the `ETag` and `Last-Modified` validators of a response.
+    """
+    response.headers["ETag"] = version.etag
+    if version.last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(
+            version.last_modified.replace(tzinfo=datetime.timezone.utc),
+            usegmt=True,
+        )
+
+
+def not_modified_response(version: Version) -> Response:
+    response = Response(status_code=304)
+    set_version_headers(response, version)
+    return response
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def streaming_media_type(request: Request, stream: bool = False):
+    """
+    Returns the media type to stream a listing as, or `None` to page it.
+    """
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return NDJSON_MEDIA_TYPE
+    if stream:
+        return "application/json"
+    return None
+
+
+@dataclass
+class Fieldset:
+    """
+    The columns and relationships a listing loads and renders.
+    """
+
+    schema: type[BaseModel]
+    fields: list[str]
+    relationships: Mapping[str, type[BaseModel]] = field(default_factory=dict)
+    include: list[str] = field(default_factory=list)
+
+    def load(self) -> dict[str, str]:
+        """
+        Returns repository loading options: included relationships are
+        loaded in one extra query, everything else is left unloaded.
+        """
+        return {"*": "noload", **{name: "selectin" for name in self.include}}
+
+    def construct(self, entity: Any) -> BaseModel:
+        data = {name: getattr(entity, name) for name in self.fields}
+        for name in self.include:
+            schema = self.relationships[name]
+            data[name] = [schema.model_validate(item) for item in getattr(entity, name)]
+        return self.schema.model_construct(**data)
+
+    def dump(self, entity: Any) -> dict[str, Any]:
+        return self.construct(entity).model_dump(
+            mode="json", include={*self.fields, *self.include}
+        )
+
+    def dump_json(self, entity: Any) -> bytes:
+        return (
+            self.construct(entity)
+            .model_dump_json(include={*self.fields, *self.include})
+            .encode()
+        )
+
+    def dump_rows(self, rows: Sequence[Any]) -> bytes:
+        """
+        Serializes rows read by `paginate_rows` as a JSON array, in one pass
+        and without constructing models. Fields keep the schema's order.
+        """
+        fields = tuple(name for name in self.schema.model_fields if name in self.fields)
+        return row_serializer(self.schema, fields).dump_json(
+            [{name: row._mapping[name] for name in fields} for row in rows]
+        )
+
+
+@functools.lru_cache(maxsize=64)
+def row_serializer(schema: type[BaseModel], fields: tuple[str, ...]) -> TypeAdapter:
+    """
+    Returns a serializer of lists of `fields` mappings typed as in `schema`,
+    compiled once per schema and fieldset. It renders values exactly as the
+    schema's `model_dump(mode="json")` would.
+    """
+    row = TypedDict(
+        f"{schema.__name__}Row",
+        {name: Optional[schema.model_fields[name].annotation] for name in fields},
+    )
+    return TypeAdapter(list[row])
+
+
+def fieldset_parameters(
+    schema: type[BaseModel],
+    relationships: Optional[Mapping[str, type[BaseModel]]] = None,
+):
+    """
+    Returns a dependency parsing the comma-separated `fields` (columns to
+    render, default all) and `include` (relationships to embed, default none)
+    query parameters for `schema`.
+    """
+    relationships = relationships or {}
+    columns = [
+        name
+        for name, info in schema.model_fields.items()
+        if not info.exclude and name not in relationships
+    ]
+
+    async def parameters(fields: Optional[str] = None, include: Optional[str] = None):
+        selected = [name for name in (fields or "").split(",") if name] or columns
+        included = [name for name in (include or "").split(",") if name]
+        unknown = set(selected) - set(columns) | set(included) - set(relationships)
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return Fieldset(schema, selected, relationships, included)
+
+    return parameters
+
+
+async def read_page(
+    repository: BaseRepository,
+    fieldset: Fieldset,
+    pagination_parameters: Mapping[str, Any],
+    filters: Mapping[str, Any],
+) -> tuple[Page, Response]:
+    """
+    Reads and renders a page of a listing. Without included relationships,
+    the page is read as plain rows and serialized straight to JSON, skipping
+    the ORM entities and models; with them, or when the repository cannot
+    read rows, entities are loaded and rendered through the schema.
+    """
+    if not fieldset.include:
+        try:
+            page = await repository.paginate_rows(
+                **pagination_parameters, columns=fieldset.fields, **filters
+            )
+        except NotImplementedError:
+            pass
+        else:
+            return page, Response(
+                fieldset.dump_rows(page.items), media_type="application/json"
+            )
+    page = await repository.paginate(
+        **pagination_parameters,
+        load=fieldset.load(),
+        columns=fieldset.fields,
+        **filters,
+    )
+    return page, JSONResponse([fieldset.dump(entity) for entity in page.items])
+
+
+def stream_response(
+    entities: AsyncIterator[Any], fieldset: Fieldset, media_type: str
+) -> StreamingResponse:
+    """
+    Serializes entities one at a time as they arrive from the repository,
+    either as NDJSON or as a single JSON array.
+    """
+
+    async def ndjson():
+        async for entity in entities:
+            yield fieldset.dump_json(entity) + b"\n"
+
+    async def json_array():
+        separator = b"["
+        async for entity in entities:
+            yield separator + fieldset.dump_json(entity)
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+
+    body = ndjson() if media_type == NDJSON_MEDIA_TYPE else json_array()
+    return StreamingResponse(body, media_type=media_type)
 
 
 VisitorFilterParameters = Annotated[dict, Depends(filter_visitor_parameters)]
+MessageFilterParameters = Annotated[dict, Depends(filter_message_parameters)]
+PaginationParameters = Annotated[dict, Depends(pagination_parameters)]
+SearchPaginationParameters = Annotated[dict, Depends(search_pagination_parameters)]
+StreamingMediaType = Annotated[Optional[str], Depends(streaming_media_type)]
+VisitorFieldset = Annotated[
+    Fieldset,
+    Depends(fieldset_parameters(VisitorSchema, {"messages": MessageSchema})),
+]
+MessageFieldset = Annotated[Fieldset, Depends(fieldset_parameters(MessageSchema))]
+
 
+def create_caches() -> tuple[Optional[dict[str, LRUCache]], Optional[BaseSharedCache]]:
+    """
+    Returns the per-process entity caches, or `None` unless `CACHE_ENABLED`
+    is on, and the shared cache selected by `CACHE_SHARED_BACKEND`.
+
+    Caching is off by default: writes only invalidate the caches of the
+    process handling them, so with several workers or replicas the others
+    serve stale entities for up to `CACHE_TTL` seconds.
+    """
+    if not config("CACHE_ENABLED", default=False, cast=bool):
+        return None, None
+    maxsize = config("CACHE_MAXSIZE", default=1024, cast=int)
+    ttl = config("CACHE_TTL", default=30.0, cast=float)
+    caches = {name: LRUCache(maxsize, ttl) for name in ("visitors", "messages")}
+    backend = config("CACHE_SHARED_BACKEND", default="")
+    if backend == "memory":
+        return caches, InMemorySharedCache()
+    if backend:
+        raise ValueError(f"Unknown CACHE_SHARED_BACKEND {backend!r}")
+    return caches, None
+
+
+def create_producer() -> Optional[BaseProducer]:
+    """
+    Returns the event producer for the `EVENTS_SINK` backend ("ndjson" or
+    "memory"), or `None` when events are disabled (the default).
+    """
+    backend = config("EVENTS_SINK", default="")
+    if not backend:
+        return None
+    if backend == "ndjson":
+        sink = NDJSONFileSink(config("EVENTS_NDJSON_PATH", default="events.ndjson"))
+    elif backend == "memory":
+        sink = InMemoryEventSink()
+    else:
+        raise ValueError(f"Unknown EVENTS_SINK {backend!r}")
+    return BatchingProducer(
+        sink,
+        max_queue_size=config("EVENTS_QUEUE_SIZE", default=10_000, cast=int),
+        batch_size=config("EVENTS_BATCH_SIZE", default=500, cast=int),
+        linger=config("EVENTS_LINGER", default=0.05, cast=float),
+        overflow=config("EVENTS_OVERFLOW", default="block"),
+        block_timeout=config("EVENTS_BLOCK_TIMEOUT", default=0.1, cast=float),
+    )
+
+
+def create_outbox_relay(
+    sessionmaker: async_sessionmaker, producer: Optional[BaseProducer]
+) -> Optional[OutboxRelay]:
+    """
+    Returns the relay publishing the outbox through `producer` when
+    `EVENTS_OUTBOX` is enabled, or `None` to publish events directly.
+    """
+    if producer is None or not config("EVENTS_OUTBOX", default=False, cast=bool):
+        return None
+    return OutboxRelay(
+        sessionmaker,
+        outbox,
+        producer,
+        batch_size=config("EVENTS_OUTBOX_BATCH_SIZE", default=500, cast=int),
+        poll_interval=config("EVENTS_OUTBOX_POLL_INTERVAL", default=1.0, cast=float),
+        claim_timeout=config("EVENTS_OUTBOX_CLAIM_TIMEOUT", default=30.0, cast=float),
+    )
+
+
+def create_metrics(app: FastAPI) -> Optional[MetricsRegistry]:
+    """
+    Returns the registry of the process's metrics, or `None` when
+    `METRICS_ENABLED` is off. Event delivery and cache statistics are read at
+    scrape time.
+    """
+    if not config("METRICS_ENABLED", default=True, cast=bool):
+        return None
+    registry = MetricsRegistry()
+    registry.counter(
+        "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+    )
+    registry.histogram(
+        "http_request_duration_seconds",
+        "Time spent handling HTTP requests.",
+        ("method", "route", "status"),
+    )
+    registry.gauge("http_requests_in_flight", "HTTP requests being handled.")
 
-async def get_session():
-    database_url = config("DATABASE_URL", default="sqlite+aiosqlite:///local.sqlite")
-    engine = await create_database_engine(url=database_url)
-    yield get_sessionmaker(engine)
-    await engine.dispose()
+    events = registry.counter(
+        "events_total", "Events handled by the producer.", ("outcome",)
+    )
+    queued = registry.gauge("events_queued", "Events waiting to be delivered.")
+    outbox_lag = registry.gauge(
+        "events_outbox_lag_seconds",
+        "Age of the oldest event of the last batch relayed from the outbox.",
+    )
+    outbox_errors = registry.counter(
+        "events_outbox_relay_errors_total", "Outbox relay polls that failed."
+    )
+
+    def collect_events():
+        producer = app.state.producer
+        if producer is None:
+            return
+        for outcome in ("published", "delivered", "dropped", "failed"):
+            events.set_total(getattr(producer.stats, outcome), outcome)
+        if isinstance(producer, BatchingProducer):
+            queued.set(producer.queue.qsize())
+        if app.state.outbox_relay is not None:
+            outbox_lag.set(app.state.outbox_relay.stats.lag)
+            outbox_errors.set_total(app.state.outbox_relay.stats.errors)
+
+    registry.collectors.append(collect_events)
+
+    cache_lookups = registry.counter(
+        "cache_operations_total",
+        "Entity cache lookups and removals by outcome.",
+        ("cache", "outcome"),
+    )
+    cache_entries = registry.gauge(
+        "cache_entries", "Entities held by the cache.", ("cache",)
+    )
+
+    def collect_caches():
+        for name, cache in (app.state.caches or {}).items():
+            for outcome in ("hits", "misses", "evictions", "expirations"):
+                cache_lookups.set_total(getattr(cache.stats, outcome), name, outcome)
+            cache_entries.set(len(cache), name)
+
+    registry.collectors.append(collect_caches)
+    return registry
+
+
+def create_profiler(app: FastAPI) -> Optional[Profiler]:
+    """
+    Returns the request profiler when the app runs in debug mode or
+    `PROFILING_ENABLED` is on, or `None`. Requests are profiled when they
+    send `X-Profile` or, with a `PROFILING_SAMPLE_RATE` probability, at
+    random; profiles are kept in memory and written to `PROFILING_DIR`.
+    """
+    if not (app.debug or config("PROFILING_ENABLED", default=False, cast=bool)):
+        return None
+    return Profiler(
+        sample_rate=config("PROFILING_SAMPLE_RATE", default=0.0, cast=float),
+        interval=config("PROFILING_INTERVAL", default=0.001, cast=float),
+        directory=config("PROFILING_DIR", default="") or None,
+    )
+
+
+def log_task_exit(task: asyncio.Task) -> None:
+    """
+    Done callback of background tasks, which only stop when cancelled: logs
+    a task that died of an error, which would otherwise go unnoticed until
+    shutdown.
+    """
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            "Background task %s stopped", task.get_name(), exc_info=task.exception()
+        )
+
+
+def start_background_task(coroutine, name: str) -> asyncio.Task:
+    """
+    Runs `coroutine` as a task named `name`, logged by `log_task_exit`.
+    """
+    task = asyncio.create_task(coroutine, name=name)
+    task.add_done_callback(log_task_exit)
+    return task
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the database engine and sessionmaker once per worker process, so
+    workers never share connections, opens `DATABASE_POOL_WARM` connections
+    (default `DATABASE_POOL_SIZE`) ahead of the first requests, and disposes of
+    the connection pool on shutdown. Pending schema migrations are
+    applied first unless `DATABASE_MIGRATE_ON_STARTUP` is disabled. SQLite
+    databases are checkpointed and optimized every
+    `DATABASE_SQLITE_MAINTENANCE_INTERVAL` seconds and on shutdown.
+
+    `DATABASE_READ_URL` lists replicas (comma separated) that reads are
+    spread over; see `ReadYourWritesMiddleware`. With `EVENTS_OUTBOX`, message
+    events are written to the outbox with the messages and published by a
+    background relay. Pending events are flushed before the engines are
+    disposed of.
+    """
+    database_url = config("DATABASE_URL", default=DEFAULT_DATABASE_URL)
+    engine_options = get_database_engine_options()
+    engine = await create_database_engine(url=database_url, **engine_options)
+    if config("DATABASE_MIGRATE_ON_STARTUP", default=True, cast=bool):
+        await migrations.upgrade(engine)
+    warm_connections = config(
+        "DATABASE_POOL_WARM", default=engine_options["pool_size"], cast=int
+    )
+    await warm_pool(engine, warm_connections)
+    track_database_time(engine)
+    app.state.metrics = create_metrics(app)
+    app.state.profiler = create_profiler(app)
+    if app.state.metrics is not None:
+        instrument_engine(engine, app.state.metrics)
+    app.state.engine = engine
+    app.state.sessionmaker = get_sessionmaker(engine)
+    replica_options = get_database_engine_options(replica=True)
+    read_engines = [
+        await create_database_engine(url=url, **replica_options)
+        for url in config("DATABASE_READ_URL", default="", cast=Csv())
+    ]
+    for read_engine in read_engines:
+        await warm_pool(read_engine, warm_connections)
+        track_database_time(read_engine)
+        if app.state.metrics is not None:
+            instrument_engine(read_engine, app.state.metrics, database="replica")
+    app.state.replicas = None
+    app.state.read_your_writes = 0.0
+    if read_engines:
+        app.state.replicas = cycle([get_sessionmaker(e) for e in read_engines])
+        app.state.read_your_writes = config(
+            "DATABASE_READ_YOUR_WRITES", default=5.0, cast=float
+        )
+    app.state.caches, app.state.shared_cache = create_caches()
+    app.state.producer = create_producer()
+    if app.state.producer is not None:
+        await app.state.producer.start()
+    app.state.outbox_relay = create_outbox_relay(
+        app.state.sessionmaker, app.state.producer
+    )
+    relay = None
+    if app.state.outbox_relay is not None:
+        relay = start_background_task(app.state.outbox_relay.run(), "outbox-relay")
+    interval = config("DATABASE_SQLITE_MAINTENANCE_INTERVAL", default=300.0, cast=float)
+    maintenance = None
+    if engine.dialect.name == "sqlite" and interval > 0:
+        maintenance = start_background_task(
+            maintain_sqlite_periodically(engine, interval), "sqlite-maintenance"
+        )
+    yield
+    if maintenance is not None:
+        maintenance.cancel()
+    try:
+        if relay is not None:
+            relay.cancel()
+            await asyncio.gather(relay, return_exceptions=True)
+            await app.state.outbox_relay.drain()
+        if app.state.producer is not None:
+            await app.state.producer.close()
+        if maintenance is not None:
+            await maintain_sqlite(engine)
+    finally:
+        # even when flushing the events failed
+        for read_engine in read_engines:
+            await read_engine.dispose()
+        await engine.dispose()
+
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def reads_primary(request: Request) -> bool:
+    """
+    Whether the client wrote recently enough to have its reads pinned to the
+    primary database.
+    """
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def uses_cache(request: Request) -> bool:
+    """
+    Pinned reads skip the cache, which replicas may have filled with rows
+    older than the client's own writes; writes always invalidate it.
+    """
+    if request.app.state.caches is None:
+        return False
+    return request.method not in SAFE_METHODS or not reads_primary(request)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a client's reads to the primary for `DATABASE_READ_YOUR_WRITES`
+    seconds after a successful write, with a cookie holding the expiry, so
+    replication lag never hides its own writes from it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+        window = getattr(scope["app"].state, "read_your_writes", 0.0)
+        if not window:
+            return await self.app(scope, receive, send)
+
+        async def send_with_pin(message: dict):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={time.time() + window:.3f}; "
+                    f"Max-Age={math.ceil(window)}; Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
+
+
+access_logger = logging.getLogger(f"{__name__}.access")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID = re.compile(r"^[\w.-]{1,128}$")
+
+
+class RequestLoggingMiddleware:
+    """
+    Identifies each request by the client's `X-Request-ID`, or a new id,
+    echoed in the response and added to every record logged while handling
+    it, and logs one access record per request with its route, status,
+    duration and database time.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER, "")
+        if not REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        fields = {"request_id": request_id, "db_time_ms": 0.0, "db_queries": 0}
+        token = log_context.set(fields)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message: dict):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            access_logger.info(
+                '"%s %s" %d',
+                scope["method"],
+                scope["path"],
+                status,
+                extra=dict(
+                    method=scope["method"],
+                    path=scope["path"],
+                    route=getattr(route, "path", None),
+                    status=status,
+                    duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                ),
+            )
+            log_context.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Counts and times requests by method, route and status, and tracks the
+    requests in flight. Requests matching no route share the "unmatched"
+    route, so unknown paths cannot grow the number of series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        metrics = getattr(scope["app"].state, "metrics", None)
+        if metrics is None:
+            return await self.app(scope, receive, send)
+        in_flight = metrics.metrics["http_requests_in_flight"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: dict):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            labels = (
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status),
+            )
+            metrics.metrics["http_requests_total"].inc(*labels)
+            metrics.metrics["http_request_duration_seconds"].observe(
+                time.perf_counter() - start, *labels
+            )
+
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class ProfilingMiddleware:
+    """
+    Samples the event loop's stack while handling a request that sends
+    `X-Profile` or is sampled, when profiling is enabled, and returns the id
+    to fetch the profile with from `/debug/profiles/{id}` in `X-Profile-Id`.
+    Requests arriving while another is profiled are not profiled.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profiler = getattr(scope["app"].state, "profiler", None)
+        if profiler is None or not (
+            PROFILE_HEADER in Headers(scope=scope)
+            or random.random() < profiler.sample_rate
+        ):
+            return await self.app(scope, receive, send)
+        if not profiler.start():
+            return await self.app(scope, receive, send)
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message: dict):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            route = scope.get("route")
+            await profiler.stop(
+                profile_id,
+                scope["method"],
+                scope["path"],
+                getattr(route, "path", None),
+            )
+
+
+async def log_route(request: Request) -> None:
+    """
+    Adds the matched route to the request's log records.
+    """
+    fields = log_context.get()
+    if fields is not None:
+        fields["route"] = request.scope["route"].path
+
+
+async def get_session(request: Request) -> async_sessionmaker:
+    return request.app.state.sessionmaker
+
+
+async def get_read_session(request: Request) -> async_sessionmaker:
+    """
+    Returns the next replica's sessionmaker, or the primary's when there are
+    no replicas or the client's reads are pinned to it.
+    """
+    if request.app.state.replicas is None or reads_primary(request):
+        return request.app.state.sessionmaker
+    return next(request.app.state.replicas)
 
 
 DatabaseSession = Annotated[async_sessionmaker, Depends(get_session)]
+ReadDatabaseSession = Annotated[async_sessionmaker, Depends(get_read_session)]
+
+
+async def get_visitor_repository(
+    request: Request, session: DatabaseSession, read_session: ReadDatabaseSession
+) -> BaseRepository:
+    repository = SQLAlchemyRepository(
+        session, VisitorModel, read_sessionmaker=read_session
+    )
+    if not uses_cache(request):
+        return repository
+    return CachedRepository(
+        repository,
+        request.app.state.caches["visitors"],
+        "visitors",
+        shared=request.app.state.shared_cache,
+    )
+
+
+VisitorRepository = Annotated[BaseRepository, Depends(get_visitor_repository)]
+
+
+async def get_message_repository(
+    request: Request,
+    session: DatabaseSession,
+    read_session: ReadDatabaseSession,
+    visitors: VisitorRepository,
+) -> BaseRepository:
+    search_table = None
+    if request.app.state.engine.dialect.name == "sqlite":
+        search_table = messages_search
+    message_outbox = None
+    if request.app.state.outbox_relay is not None:
+        message_outbox = Outbox(outbox, "message", key="visitor_id")
+    repository = SQLAlchemyRepository(
+        session,
+        MessageModel,
+        search_table,
+        read_sessionmaker=read_session,
+        outbox=message_outbox,
+    )
+    if not uses_cache(request):
+        return repository
+    # visitors embed their messages, so message writes invalidate them too
+    return CachedRepository(
+        repository,
+        request.app.state.caches["messages"],
+        "messages",
+        shared=request.app.state.shared_cache,
+        related={"visitor_id": visitors},
+    )
 
-app = FastAPI(dependencies=[Depends(get_session)])
 
+MessageRepository = Annotated[BaseRepository, Depends(get_message_repository)]
 
-@app.get("/")
+
+async def get_producer(request: Request) -> Optional[BaseProducer]:
+    """
+    Returns the producer to publish events with, or `None` when they are
+    disabled or recorded in the outbox by the repository instead.
+    """
+    if request.app.state.outbox_relay is not None:
+        return None
+    return request.app.state.producer
+
+
+Producer = Annotated[Optional[BaseProducer], Depends(get_producer)]
+
+
+async def publish_messages(
+    producer: Optional[BaseProducer], type_: str, messages: list[MessageSchema]
+):
+    """
+    Enqueues one `message.<type_>` event per message, keyed by visitor so a
+    visitor's events stay ordered, like the outbox keys them.
+    """
+    if producer is None:
+        return
+    for message in messages:
+        key = message.visitor_id
+        await producer.publish(
+            Event(
+                f"message.{type_}",
+                message.model_dump(mode="json"),
+                key=None if key is None else str(key),
+            )
+        )
+
+
+router = APIRouter()
+
+
+@router.get("/")
 async def root():
     return {"message": "Hello, World"}
 
 
+@router.get("/debug/profiles", include_in_schema=False)
+async def list_profiles(request: Request) -> Response:
+    """
+    Lists the most recent request profiles, newest first.
+    """
+    profiler = request.app.state.profiler
+    if profiler is None:
+        return Response(status_code=404)
+    return JSONResponse(
+        [
+            dict(
+                id=profile.id,
+                method=profile.method,
+                path=profile.path,
+                route=profile.route,
+                started_at=profile.started_at.isoformat(),
+                duration_ms=round(profile.duration * 1000, 3),
+                samples=profile.samples,
+            )
+            for profile in reversed(profiler.profiles)
+        ]
+    )
+
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, request: Request) -> Response:
+    """
+    Returns a request profile as collapsed stacks, e.g. for `flamegraph.pl`.
+    """
+    profiler = request.app.state.profiler
+    profile = profiler.get(profile_id) if profiler is not None else None
+    if profile is None:
+        return Response(status_code=404)
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request) -> Response:
+    """
+    Exposes the process's metrics in the Prometheus text format.
+    """
+    registry = request.app.state.metrics
+    if registry is None:
+        return Response(status_code=404)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 ##### Visitors #####
 
 
-@app.get("/visitors", response_model=list[VisitorSchema], status_code=200)
+@router.get("/visitors", response_model=list[VisitorSchema], status_code=200)
 async def get_visitors(
     filter_visitor_parameters: VisitorFilterParameters,
-    session: DatabaseSession,
+    pagination_parameters: PaginationParameters,
+    fieldset: VisitorFieldset,
+    media_type: StreamingMediaType,
+    repository: VisitorRepository,
+    request: Request,
 ) -> JSONResponse:
     """
-    Returns the number of visitors to the API.
+    Returns a page of visitors to the API, oldest first.
+
+    Messages are only loaded and rendered with `?include=messages`, and
+    `?fields=` selects the rendered columns. With `Accept:
+    application/x-ndjson` or `?stream=true`, every visitor after the cursor is
+    streamed instead and `limit` is ignored.
     """
-    repository = SQLAlchemyRepository(session, VisitorModel)
-    visitors = await repository.list(**filter_visitor_parameters)
-    return [VisitorSchema.model_validate(visitor) for visitor in visitors]
+    options = dict(load=fieldset.load(), columns=fieldset.fields)
+    if media_type is not None:
+        visitors = repository.stream(
+            batch_size=config("STREAM_BATCH_SIZE", default=500, cast=int),
+            cursor=pagination_parameters["cursor"],
+            **options,
+            **filter_visitor_parameters,
+        )
+        return stream_response(visitors, fieldset, media_type)
+    if has_validators(request):
+        version = await repository.version(
+            **pagination_parameters,
+            include=fieldset.include,
+            **filter_visitor_parameters,
+        )
+        if version is not None and not_modified(request, version):
+            return not_modified_response(version)
+    page, response = await read_page(
+        repository, fieldset, pagination_parameters, filter_visitor_parameters
+    )
+    set_pagination_headers(request, response, page)
+    set_version_headers(response, Version.of(page.items, fieldset.include))
+    return response
 
 
-@app.get("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
-async def get_visitor_by_id(visitor_id: int, session: DatabaseSession) -> JSONResponse:
+@router.get("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
+async def get_visitor_by_id(
+    visitor_id: int,
+    repository: VisitorRepository,
+    request: Request,
+    response: Response,
+) -> JSONResponse:
     """
     Returns a visitor by ID.
+
+    Responds `304 Not Modified` when `If-None-Match` matches the current
+    `ETag`, which also covers the visitor's messages.
     """
-    repository = SQLAlchemyRepository(session, VisitorModel)
+    if has_validators(request):
+        version = await repository.version(include=("messages",), id=visitor_id)
+        if version is not None:
+            if version.count == 0:
+                return Response(status_code=404)
+            if not_modified(request, version):
+                return not_modified_response(version)
     visitor = await repository.get(visitor_id)
     if visitor is None:
         return Response(status_code=404)
+    set_version_headers(response, Version.of([visitor], ("messages",)))
     return VisitorSchema.model_validate(visitor)
 
 
-@app.post("/visitors", response_model=VisitorSchema, status_code=201)
+@router.post("/visitors", response_model=VisitorSchema, status_code=201)
 async def create_visitor(
-    session: DatabaseSession, visitor: VisitorCreateSchema
+    repository: VisitorRepository, visitor: VisitorCreateSchema
 ) -> JSONResponse:
     """
     Creates a visitor.
     """
-    repository = SQLAlchemyRepository(session, VisitorModel)
     created_visitor = await repository.create(visitor.model_dump())
     return VisitorSchema.model_validate(created_visitor)
 
 
-@app.patch("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
-@app.put("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
+@router.post("/visitors:batch", response_model=VisitorBatchSchema, status_code=201)
+async def create_visitors(
+    repository: VisitorRepository, visitors: BatchItems, response: Response
+) -> JSONResponse:
+    """
+    Creates many visitors in one transaction. Items that fail are reported by
+    index and the response status is then 207.
+    """
+    result = await create_batch(repository, VisitorCreateSchema, visitors)
+    if result.errors:
+        response.status_code = 207
+    return VisitorBatchSchema(
+        items=[VisitorSchema.model_validate(visitor) for visitor in result.items],
+        errors=[BatchErrorSchema(**vars(error)) for error in result.errors],
+    )
+
+
+@router.patch("/visitors:batch", response_model=BatchCountSchema, status_code=200)
+async def update_visitors(
+    filter_visitor_parameters: VisitorFilterParameters,
+    repository: VisitorRepository,
+    visitor: VisitorUpdateSchema,
+) -> JSONResponse:
+    """
+    Updates every visitor matching the filters with one statement.
+    """
+    data = visitor.model_dump(exclude_none=True)
+    if not filter_visitor_parameters or not data:
+        raise HTTPException(
+            status_code=400, detail="At least one filter and one field are required"
+        )
+    visitors = await repository.update_where(data, **filter_visitor_parameters)
+    return BatchCountSchema(count=len(visitors))
+
+
+@router.delete("/visitors:batch", response_model=BatchCountSchema, status_code=200)
+async def delete_visitors(
+    filter_visitor_parameters: VisitorFilterParameters, repository: VisitorRepository
+) -> JSONResponse:
+    """
+    Deletes every visitor matching the filters with one statement.
+    """
+    if not filter_visitor_parameters:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    deleted = await repository.delete_where(**filter_visitor_parameters)
+    return BatchCountSchema(count=len(deleted))
+
+
+@router.patch("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
+@router.put("/visitors/{visitor_id}", response_model=VisitorSchema, status_code=200)
 async def update_visitor(
-    visitor_id: int, session: DatabaseSession, visitor: VisitorCreateSchema
+    visitor_id: int, repository: VisitorRepository, visitor: VisitorCreateSchema
 ) -> JSONResponse:
     """
     Updates a visitor.
     """
-    repository = SQLAlchemyRepository(session, VisitorModel)
-    updated_visitor = await repository.update(visitor_id, visitor.model_dump())
+    updated_visitor = await repository.update(
+        visitor_id, visitor.model_dump(), load={"messages": "selectin"}
+    )
+    if updated_visitor is None:
+        return Response(status_code=404)
     return VisitorSchema.model_validate(updated_visitor)
 
 
-@app.delete("/visitors/{visitor_id}", status_code=204)
-async def delete_visitor(visitor_id: int, session: DatabaseSession) -> JSONResponse:
+@router.delete("/visitors/{visitor_id}", status_code=204)
+async def delete_visitor(
+    visitor_id: int, repository: VisitorRepository
+) -> JSONResponse:
     """
     Deletes a visitor.
     """
-    repository = SQLAlchemyRepository(session, VisitorModel)
-    await repository.delete(visitor_id)
+    try:
+        await repository.delete(visitor_id)
+    except EntityNotFoundError:
+        return Response(status_code=404)
     return Response(status_code=204)
 
 
 ##### Messages #####
 
 
-@app.get("/messages", response_model=list[MessageSchema], status_code=200)
-async def get_messages(session: DatabaseSession) -> JSONResponse:
+@router.get("/messages", response_model=list[MessageSchema], status_code=200)
+async def get_messages(
+    filter_message_parameters: MessageFilterParameters,
+    pagination_parameters: PaginationParameters,
+    fieldset: MessageFieldset,
+    media_type: StreamingMediaType,
+    repository: MessageRepository,
+    request: Request,
+) -> JSONResponse:
     """
-    Returns the number of messages to the API.
+    Returns a page of messages to the API, oldest first.
+
+    Messages can be filtered by `sender`, `receiver`, `visitor_id` and a
+    `created_after`/`created_before` range, each backed by an index.
+    `?fields=` selects the rendered columns. With `Accept:
+    application/x-ndjson` or `?stream=true`, every message after the cursor is
+    streamed instead and `limit` is ignored.
     """
-    repository = SQLAlchemyRepository(session, MessageModel)
-    messages = await repository.list()
-    return [MessageSchema.model_validate(message) for message in messages]
+    options = dict(load=fieldset.load(), columns=fieldset.fields)
+    if media_type is not None:
+        messages = repository.stream(
+            batch_size=config("STREAM_BATCH_SIZE", default=500, cast=int),
+            cursor=pagination_parameters["cursor"],
+            **options,
+            **filter_message_parameters,
+        )
+        return stream_response(messages, fieldset, media_type)
+    if has_validators(request):
+        version = await repository.version(
+            **pagination_parameters,
+            include=fieldset.include,
+            **filter_message_parameters,
+        )
+        if version is not None and not_modified(request, version):
+            return not_modified_response(version)
+    page, response = await read_page(
+        repository, fieldset, pagination_parameters, filter_message_parameters
+    )
+    set_pagination_headers(request, response, page)
+    set_version_headers(response, Version.of(page.items, fieldset.include))
+    return response
+
 
+@router.get(
+    "/messages/search", response_model=list[MessageSearchHitSchema], status_code=200
+)
+async def search_messages(
+    q: Annotated[str, Query(min_length=1, max_length=1000)],
+    filter_message_parameters: MessageFilterParameters,
+    pagination_parameters: SearchPaginationParameters,
+    fieldset: MessageFieldset,
+    repository: MessageRepository,
+    request: Request,
+) -> JSONResponse:
+    """
+    Returns a page of messages whose content matches `q`, best match first,
+    each with its `rank` and a `snippet` highlighting the matched terms.
 
-@app.get("/messages/{message_id}", response_model=MessageSchema, status_code=200)
-async def get_message_by_id(message_id: int, session: DatabaseSession) -> JSONResponse:
+    `q` uses the SQLite FTS5 query syntax, e.g. `"exact phrase"`, `prefix*`
+    or `hello OR hi`. The listing filters and `?fields=` apply as for
+    `GET /messages`.
+    """
+    try:
+        page = await repository.search(
+            q,
+            **pagination_parameters,
+            load=fieldset.load(),
+            columns=fieldset.fields,
+            **filter_message_parameters,
+        )
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="Search is not available")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid search query")
+    response = JSONResponse(
+        [
+            {**fieldset.dump(hit.entity), "rank": hit.rank, "snippet": hit.snippet}
+            for hit in page.items
+        ]
+    )
+    set_pagination_headers(request, response, page)
+    return response
+
+
+@router.get("/messages/{message_id}", response_model=MessageSchema, status_code=200)
+async def get_message_by_id(
+    message_id: int,
+    repository: MessageRepository,
+    request: Request,
+    response: Response,
+) -> JSONResponse:
     """
     Returns a message by ID.
+
+    Responds `304 Not Modified` when `If-None-Match` matches the current
+    `ETag` or the message is unchanged since `If-Modified-Since`.
     """
-    repository = SQLAlchemyRepository(session, MessageModel)
+    if has_validators(request):
+        version = await repository.version(id=message_id)
+        if version is not None:
+            if version.count == 0:
+                return Response(status_code=404)
+            if not_modified(request, version, modified_since=True):
+                return not_modified_response(version)
     message = await repository.get(message_id)
     if message is None:
         return Response(status_code=404)
+    set_version_headers(response, Version.of([message]))
     return MessageSchema.model_validate(message)
 
 
-@app.post("/messages", response_model=MessageSchema, status_code=201)
+@router.post("/messages", response_model=MessageSchema, status_code=201)
 async def create_message(
-    session: DatabaseSession, message: MessageCreateSchema
+    repository: MessageRepository, message: MessageCreateSchema, producer: Producer
 ) -> JSONResponse:
     """
     Creates a message.
     """
-    repository = SQLAlchemyRepository(session, MessageModel)
     created_message = await repository.create(message.model_dump())
-    return MessageSchema.model_validate(created_message)
+    created_message = MessageSchema.model_validate(created_message)
+    await publish_messages(producer, "created", [created_message])
+    return created_message
+
+
+@router.post("/messages:batch", response_model=MessageBatchSchema, status_code=201)
+async def create_messages(
+    repository: MessageRepository,
+    messages: BatchItems,
+    response: Response,
+    producer: Producer,
+) -> JSONResponse:
+    """
+    Creates many messages in one transaction. Items that fail are reported by
+    index and the response status is then 207.
+    """
+    result = await create_batch(repository, MessageCreateSchema, messages)
+    if result.errors:
+        response.status_code = 207
+    items = [MessageSchema.model_validate(message) for message in result.items]
+    await publish_messages(producer, "created", items)
+    return MessageBatchSchema(
+        items=items,
+        errors=[BatchErrorSchema(**vars(error)) for error in result.errors],
+    )
+
+
+@router.patch("/messages:batch", response_model=BatchCountSchema, status_code=200)
+async def update_messages(
+    filter_message_parameters: MessageFilterParameters,
+    repository: MessageRepository,
+    message: MessageUpdateSchema,
+    producer: Producer,
+) -> JSONResponse:
+    """
+    Updates every message matching the filters with one statement, e.g.
+    re-assigning the receiver of all of a visitor's messages, and publishes
+    one `message.updated` event per updated message.
+    """
+    data = message.model_dump(exclude_none=True)
+    if not filter_message_parameters or not data:
+        raise HTTPException(
+            status_code=400, detail="At least one filter and one field are required"
+        )
+    messages = await repository.update_where(data, **filter_message_parameters)
+    items = [MessageSchema.model_validate(message) for message in messages]
+    await publish_messages(producer, "updated", items)
+    return BatchCountSchema(count=len(items))
 
 
-@app.put("/messages/{message_id}", response_model=MessageSchema, status_code=200)
-@app.patch("/messages/{message_id}", response_model=MessageSchema, status_code=200)
+@router.delete("/messages:batch", response_model=BatchCountSchema, status_code=200)
+async def delete_messages(
+    filter_message_parameters: MessageFilterParameters,
+    repository: MessageRepository,
+    producer: Producer,
+) -> JSONResponse:
+    """
+    Deletes every message matching the filters with one statement, e.g. all
+    of a visitor's messages, and publishes one `message.deleted` event per
+    deleted message.
+    """
+    if not filter_message_parameters:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    deleted = await repository.delete_where(**filter_message_parameters)
+    if producer is not None:
+        for message_id in deleted:
+            await producer.publish(Event("message.deleted", {"id": message_id}))
+    return BatchCountSchema(count=len(deleted))
+
+
+@router.put("/messages/{message_id}", response_model=MessageSchema, status_code=200)
+@router.patch("/messages/{message_id}", response_model=MessageSchema, status_code=200)
 async def update_message(
-    message_id: int, session: DatabaseSession, message: MessageUpdateSchema
+    message_id: int,
+    repository: MessageRepository,
+    message: MessageUpdateSchema,
+    producer: Producer,
 ) -> JSONResponse:
     """
     Updates a message.
     """
-    repository = SQLAlchemyRepository(session, MessageModel)
-    updated_message = await repository.update(message_id, message.model_dump())
-    return MessageSchema.model_validate(updated_message)
+    updated_message = await repository.update(
+        message_id, message.model_dump(), load={"*": "noload"}
+    )
+    if updated_message is None:
+        return Response(status_code=404)
+    updated_message = MessageSchema.model_validate(updated_message)
+    await publish_messages(producer, "updated", [updated_message])
+    return updated_message
 
 
-@app.delete("/messages/{message_id}", status_code=204)
-async def delete_message(message_id: int, session: DatabaseSession) -> JSONResponse:
+@router.delete("/messages/{message_id}", status_code=204)
+async def delete_message(
+    message_id: int, repository: MessageRepository, producer: Producer
+) -> JSONResponse:
     """
     Deletes a message.
     """
-    repository = SQLAlchemyRepository(session, MessageModel)
-    await repository.delete(message_id)
+    try:
+        await repository.delete(message_id)
+    except EntityNotFoundError:
+        return Response(status_code=404)
+    if producer is not None:
+        await producer.publish(Event("message.deleted", {"id": message_id}))
     return Response(status_code=204)
+
+
+def create_app(debug: bool = False) -> FastAPI:
+    """
+    Returns a new application with the routes and middleware of the API and
+    its own state, e.g. one per worker process.
+    """
+    app = FastAPI(debug=debug, lifespan=lifespan, dependencies=[Depends(log_route)])
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
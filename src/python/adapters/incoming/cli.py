@@ -1,4 +1,265 @@
 """
 Adapter for CLI
+
+Handlers import what they use, so parsing the arguments, e.g. for `--help`,
+stays fast. `consume` takes the request schemas and engine settings from their
+own modules rather than the API, so it never loads FastAPI.
 """
 
+import argparse
+import sys
+
+
+def add_subcommands(subparsers: argparse._SubParsersAction) -> None:
+    """
+    Registers the CLI subcommands; each sets a `handler` taking the parsed
+    arguments.
+    """
+    db_parser = subparsers.add_parser("db", help="Manage the database schema.")
+    db_parser.add_argument(
+        "--database-url",
+        default=None,
+        help="The database URL (defaults to the DATABASE_URL setting).",
+    )
+    db_subparsers = db_parser.add_subparsers(dest="db_command", required=True)
+
+    upgrade_parser = db_subparsers.add_parser(
+        "upgrade", help="Apply pending schema migrations."
+    )
+    upgrade_parser.add_argument(
+        "--to", type=int, default=None, help="The schema version to upgrade to."
+    )
+    upgrade_parser.set_defaults(handler=db_upgrade)
+
+    current_parser = db_subparsers.add_parser(
+        "current", help="Print the applied schema version."
+    )
+    current_parser.set_defaults(handler=db_current)
+
+    consume_parser = subparsers.add_parser(
+        "consume", help="Store messages read from a newline-delimited JSON source."
+    )
+    consume_parser.add_argument(
+        "source", help='The NDJSON file to read messages from, or "-" for stdin.'
+    )
+    consume_parser.add_argument(
+        "--database-url",
+        default=None,
+        help="The database URL (defaults to the DATABASE_URL setting).",
+    )
+    consume_parser.add_argument(
+        "--batch-size", type=int, default=1000, help="The messages per insert."
+    )
+    consume_parser.add_argument(
+        "--concurrency", type=int, default=4, help="The inserts run at once."
+    )
+    consume_parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="A file to record progress in and resume from.",
+    )
+    consume_parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep waiting for lines appended to the source.",
+    )
+    consume_parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10.0,
+        help="The seconds between progress reports.",
+    )
+    consume_parser.set_defaults(handler=consume)
+
+    loadtest_parser = subparsers.add_parser(
+        "loadtest", help="Send a read/write mix or a recorded request log."
+    )
+    loadtest_parser.add_argument(
+        "--url",
+        default=None,
+        help="The base URL of the API (defaults to an in-process app).",
+    )
+    loadtest_parser.add_argument(
+        "--replay",
+        default=None,
+        help="An NDJSON request log (e.g. the access log) to replay.",
+    )
+    loadtest_parser.add_argument(
+        "--clients", type=int, default=10, help="The requests in flight at most."
+    )
+    loadtest_parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="The requests per second, arriving open-loop (default: as fast as "
+        "the clients go, or the replayed log's pace).",
+    )
+    loadtest_parser.add_argument(
+        "--duration", type=float, default=10.0, help="The seconds to run for."
+    )
+    loadtest_parser.add_argument(
+        "--requests", type=int, default=None, help="The requests to send at most."
+    )
+    loadtest_parser.add_argument(
+        "--read-ratio",
+        type=float,
+        default=0.9,
+        help="The fraction of reads in the mix.",
+    )
+    loadtest_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="How much faster than recorded to replay the log.",
+    )
+    loadtest_parser.add_argument(
+        "--timeout", type=float, default=10.0, help="The seconds per request."
+    )
+    loadtest_parser.set_defaults(handler=loadtest)
+
+
+def _run(coroutine) -> None:
+    import asyncio
+
+    asyncio.run(coroutine)
+
+
+def _database_url(args: argparse.Namespace) -> str:
+    from decouple import config
+
+    from ..outgoing.relational_database import DEFAULT_DATABASE_URL
+
+    return args.database_url or config("DATABASE_URL", default=DEFAULT_DATABASE_URL)
+
+
+def db_upgrade(args: argparse.Namespace) -> None:
+    """
+    Applies pending schema migrations.
+    """
+    from ..outgoing import migrations
+    from ..outgoing.relational_database import create_database_engine
+
+    async def run():
+        engine = await create_database_engine(_database_url(args))
+        try:
+            version = await migrations.upgrade(engine, target=args.to)
+        finally:
+            await engine.dispose()
+        print(f"Database schema at version {version}")
+
+    _run(run())
+
+
+def db_current(args: argparse.Namespace) -> None:
+    """
+    Prints the applied schema version.
+    """
+    from ..outgoing import migrations
+    from ..outgoing.relational_database import create_database_engine
+
+    async def run():
+        engine = await create_database_engine(_database_url(args))
+        try:
+            version = await migrations.current_version(engine)
+        finally:
+            await engine.dispose()
+        print(f"Database schema at version {version} (head {migrations.head()})")
+
+    _run(run())
+
+
+def consume(args: argparse.Namespace) -> None:
+    """
+    Stores the messages of a newline-delimited JSON source in batches,
+    reporting progress on stderr.
+    """
+    from ..outgoing import migrations
+    from ..outgoing.relational_database import (
+        MessageModel,
+        create_database_engine,
+        get_sessionmaker,
+    )
+    from ...ports.repository import SQLAlchemyRepository
+    from .schemas import MessageCreateSchema
+    from .settings import get_sqlite_pragmas
+    from .consumer import BatchConsumer, NDJSONFileSource, format_stats
+
+    def report(stats):
+        print(format_stats(stats), file=sys.stderr)
+
+    async def run():
+        engine = await create_database_engine(
+            _database_url(args),
+            pool_size=args.concurrency,
+            sqlite_pragmas=get_sqlite_pragmas(),
+        )
+        try:
+            await migrations.upgrade(engine)
+            consumer = BatchConsumer(
+                NDJSONFileSource(args.source, args.checkpoint, follow=args.follow),
+                SQLAlchemyRepository(get_sessionmaker(engine), MessageModel),
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                transform=lambda data: MessageCreateSchema.model_validate(
+                    data
+                ).model_dump(),
+                report=report,
+                report_interval=args.report_interval,
+            )
+            stats = await consumer.run()
+        finally:
+            await engine.dispose()
+        print(format_stats(stats))
+
+    _run(run())
+
+
+def loadtest(args: argparse.Namespace) -> None:
+    """
+    Sends a read/write mix, or replays a request log, against a running API
+    or an in-process app, and prints latency and error statistics.
+    """
+    from contextlib import AsyncExitStack
+
+    import httpx
+
+    from ..outgoing.loadtest import (
+        LoadGenerator,
+        MixedWorkload,
+        RequestLog,
+        format_report,
+    )
+
+    async def run():
+        async with AsyncExitStack() as stack:
+            if args.url is None:
+                from .api import app
+
+                await stack.enter_async_context(app.router.lifespan_context(app))
+                client_options = dict(
+                    transport=httpx.ASGITransport(app=app), base_url="http://loadtest"
+                )
+            else:
+                client_options = dict(
+                    base_url=args.url,
+                    limits=httpx.Limits(max_connections=args.clients),
+                )
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(timeout=args.timeout, **client_options)
+            )
+            generator = LoadGenerator(
+                client,
+                clients=args.clients,
+                rate=args.rate,
+                duration=args.duration,
+                requests=args.requests,
+                speed=args.speed,
+            )
+            if args.replay is not None:
+                workload = RequestLog(args.replay)
+            else:
+                workload = MixedWorkload(read_ratio=args.read_ratio)
+            stats = await generator.run(workload)
+        print(format_report(stats))
+
+    _run(run())
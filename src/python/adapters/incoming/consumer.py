@@ -0,0 +1,229 @@
+"""
+Adapter for consuming messages in bulk.
+
+`BatchConsumer` reads micro-batches from a source and stores each with one
+multi-row insert through the repository, with `concurrency` batches in flight.
+The source is acknowledged up to the last position below which every batch is
+stored, so a restarted consumer resumes without losing records; records of
+batches in flight at a crash are delivered again (at-least-once).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Mapping, Optional, Sequence
+
+from ...ports.consumer import BaseSource, ConsumerStats, Record
+from ...ports.repository import BaseRepository
+
+
+class NDJSONFileSource(BaseSource):
+    """
+    Reads one JSON object per line from a file, or from stdin for "-".
+
+    Positions are byte offsets. With a `checkpoint` path, committed offsets
+    are persisted there and reading resumes from the last one. With `follow`,
+    the source waits for more lines at the end of the file instead of ending.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        checkpoint: Optional[str | Path] = None,
+        follow: bool = False,
+    ):
+        self.path = str(path)
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+        self.follow = follow
+        self.offset = 0
+        self.committed = 0
+        self._file: Optional[IO[bytes]] = None
+
+    async def start(self) -> None:
+        if self.path == "-":
+            self._file = sys.stdin.buffer
+            return
+        if self.checkpoint is not None and self.checkpoint.exists():
+            self.committed = json.loads(self.checkpoint.read_text())["offset"]
+        self._file = open(self.path, "rb")
+        self._file.seek(self.committed)
+        self.offset = self.committed
+
+    def _read_lines(self, max_records: int) -> list[Record]:
+        records = []
+        while len(records) < max_records:
+            line = self._file.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n") and self.follow:
+                # an incomplete line still being written; re-read it later
+                self._file.seek(self.offset)
+                break
+            self.offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                records.append(Record(self.offset, json.loads(line)))
+            except ValueError as e:
+                records.append(Record(self.offset, None, f"Invalid JSON: {e}"))
+        return records
+
+    async def read(
+        self, max_records: int, timeout: float
+    ) -> Optional[Sequence[Record]]:
+        records = await asyncio.to_thread(self._read_lines, max_records)
+        if records:
+            return records
+        if not self.follow:
+            return None
+        await asyncio.sleep(timeout)
+        return []
+
+    def _write_checkpoint(self, offset: int) -> None:
+        partial = self.checkpoint.with_suffix(".tmp")
+        partial.write_text(json.dumps({"offset": offset}))
+        os.replace(partial, self.checkpoint)
+
+    async def commit(self, position: int) -> None:
+        self.committed = position
+        if self.checkpoint is not None:
+            await asyncio.to_thread(self._write_checkpoint, position)
+
+    def lag(self) -> Optional[int]:
+        if self.path == "-":
+            return None
+        return os.stat(self.path).st_size - self.committed
+
+    async def close(self) -> None:
+        if self._file is not None and self.path != "-":
+            self._file.close()
+
+
+class BatchConsumer:
+    """
+    Stores records from a source through `repository.create_many`.
+
+    Up to `batch_size` records are read at a time, waiting at most `linger`
+    seconds for the first, and up to `concurrency` batches are inserted at
+    once while the next ones are read. `transform` maps each record to the
+    repository's fields; records that fail to parse or insert are counted as
+    failed and skipped. Every `report_interval` seconds, `report` receives the
+    running statistics.
+    """
+
+    def __init__(
+        self,
+        source: BaseSource,
+        repository: BaseRepository,
+        batch_size: int = 1000,
+        concurrency: int = 4,
+        linger: float = 0.5,
+        transform: Callable[[Mapping[str, Any]], Mapping[str, Any]] = dict,
+        report: Optional[Callable[[ConsumerStats], None]] = None,
+        report_interval: float = 10.0,
+    ):
+        self.source = source
+        self.repository = repository
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.linger = linger
+        self.transform = transform
+        self.report = report
+        self.report_interval = report_interval
+        self.stats = ConsumerStats()
+        self._completed: dict[int, Any] = {}
+        self._next_sequence = 0
+        self._commit_lock = asyncio.Lock()
+
+    async def run(self) -> ConsumerStats:
+        """
+        Consumes until the source is exhausted and returns the statistics.
+        """
+        start = time.perf_counter()
+        batches: asyncio.Queue = asyncio.Queue(self.concurrency)
+        await self.source.start()
+        workers = [
+            asyncio.create_task(self._work(batches)) for _ in range(self.concurrency)
+        ]
+        reporter = asyncio.create_task(self._report(start))
+        reader = asyncio.create_task(self._read(batches))
+        try:
+            # a failing worker or reader raises here rather than stalling
+            await asyncio.gather(reader, *workers)
+        finally:
+            tasks = (reporter, reader, *workers)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.source.close()
+        self._update(start)
+        return self.stats
+
+    async def _read(self, batches: asyncio.Queue) -> None:
+        sequence = 0
+        while (
+            records := await self.source.read(self.batch_size, self.linger)
+        ) is not None:
+            if records:
+                self.stats.consumed += len(records)
+                await batches.put((sequence, records))
+                sequence += 1
+        for _ in range(self.concurrency):
+            await batches.put(None)
+
+    async def _work(self, batches: asyncio.Queue) -> None:
+        while (batch := await batches.get()) is not None:
+            sequence, records = batch
+            await self._insert(records)
+            await self._complete(sequence, records[-1].position)
+
+    async def _insert(self, records: Sequence[Record]) -> None:
+        rows = []
+        for record in records:
+            if record.error is not None:
+                self.stats.failed += 1
+                continue
+            try:
+                rows.append(self.transform(record.data))
+            except (KeyError, TypeError, ValueError):
+                self.stats.failed += 1
+        if rows:
+            result = await self.repository.create_many(rows, chunk_size=self.batch_size)
+            self.stats.inserted += len(result.items)
+            self.stats.failed += len(result.errors)
+        self.stats.batches += 1
+
+    async def _complete(self, sequence: int, position: Any) -> None:
+        """
+        Commits the source up to the end of the longest run of stored batches,
+        as batches may finish out of order.
+        """
+        self._completed[sequence] = position
+        async with self._commit_lock:
+            position = None
+            while self._next_sequence in self._completed:
+                position = self._completed.pop(self._next_sequence)
+                self._next_sequence += 1
+            if position is not None:
+                await self.source.commit(position)
+
+    def _update(self, start: float) -> None:
+        self.stats.elapsed = time.perf_counter() - start
+        self.stats.lag = self.source.lag()
+
+    async def _report(self, start: float) -> None:
+        while self.report is not None:
+            await asyncio.sleep(self.report_interval)
+            self._update(start)
+            self.report(self.stats)
+
+
+def format_stats(stats: ConsumerStats) -> str:
+    return (
+        f"consumed={stats.consumed} inserted={stats.inserted} "
+        f"failed={stats.failed} batches={stats.batches} "
+        f"rate={stats.rate:.0f}/s lag={stats.lag if stats.lag is not None else '-'}"
+    )
@@ -0,0 +1,32 @@
+"""
+Schemas of the data clients send to create and update visitors and messages.
+Update schemas make every field optional, so only the fields sent are set.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class VisitorCreateSchema(BaseModel):
+    name: str
+    email: str
+
+
+class VisitorUpdateSchema(VisitorCreateSchema):
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+
+class MessageCreateSchema(BaseModel):
+    content: str
+    sender: str
+    receiver: str
+    visitor_id: int
+
+
+class MessageUpdateSchema(MessageCreateSchema):
+    content: Optional[str] = None
+    sender: Optional[str] = None
+    receiver: Optional[str] = None
+    visitor_id: Optional[int] = None
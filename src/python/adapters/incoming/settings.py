@@ -0,0 +1,49 @@
+"""
+Database engine settings read from the environment: the connection pool and
+the SQLite pragmas, for the primary database and its read replicas.
+"""
+
+from typing import Any
+
+from decouple import config
+
+from ..outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
+    SQLITE_REPLICA_PRAGMAS,
+    SQLITE_WRITER_PRAGMAS,
+)
+
+
+def get_database_engine_options(replica: bool = False) -> dict[str, Any]:
+    """
+    Returns the connection pool settings for the database engine, or for the
+    engine of a read `replica`.
+    """
+    return dict(
+        pool_size=config("DATABASE_POOL_SIZE", default=5, cast=int),
+        max_overflow=config("DATABASE_MAX_OVERFLOW", default=10, cast=int),
+        pool_pre_ping=config("DATABASE_POOL_PRE_PING", default=True, cast=bool),
+        pool_recycle=config("DATABASE_POOL_RECYCLE", default=3600, cast=int),
+        sqlite_pragmas=get_sqlite_pragmas(replica),
+    )
+
+
+def get_sqlite_pragmas(replica: bool = False) -> dict[str, Any]:
+    """
+    Returns the SQLite pragmas of the `DATABASE_SQLITE_PROFILE` profile, each
+    overridable with `DATABASE_SQLITE_<PRAGMA>`, e.g.
+    `DATABASE_SQLITE_MMAP_SIZE=0`. A `replica` gets the read-only pragmas
+    instead of the writer's.
+    """
+    profile = config("DATABASE_SQLITE_PROFILE", default="performance")
+    if profile not in SQLITE_PRAGMA_PROFILES:
+        raise ValueError(f"Unknown DATABASE_SQLITE_PROFILE {profile!r}")
+    pragmas = {
+        name: config(f"DATABASE_SQLITE_{name.upper()}", default=value)
+        for name, value in SQLITE_PRAGMA_PROFILES[profile].items()
+    }
+    if replica:
+        for name in SQLITE_WRITER_PRAGMAS:
+            pragmas.pop(name, None)
+        pragmas.update(SQLITE_REPLICA_PRAGMAS)
+    return pragmas
@@ -0,0 +1,330 @@
+"""
+Adapter for load testing the API over HTTP.
+
+`LoadGenerator` sends the requests of a workload with `clients` requests in
+flight at most. With a `rate`, requests arrive open-loop: they are scheduled
+at random (Poisson) arrival times whether or not earlier ones have completed,
+and latency is measured from the scheduled time, so a server that falls behind
+shows the queueing delay its clients would see. Without one, each client sends
+its next request as soon as the previous completes.
+
+Workloads are a synthetic read/write mix (`MixedWorkload`) or a recorded
+request log (`RequestLog`), e.g. the API's access log.
+"""
+
+import asyncio
+import json
+import random
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import httpx
+
+from .metrics import LATENCY_BUCKETS
+
+
+@dataclass
+class LoadRequest:
+    """
+    A request to send. `name` groups requests in the report, e.g. by route,
+    and `at` is the offset in seconds at which a replayed request was sent.
+    """
+
+    method: str
+    path: str
+    name: str
+    body: Any = None
+    at: Optional[float] = None
+
+
+@dataclass
+class LoadStats:
+    """
+    The latencies in seconds and statuses of the requests sent, by name.
+    Requests that failed without a response have the status 0.
+    """
+
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    elapsed: float = 0.0
+
+    def record(self, name: str, status: int, latency: float) -> None:
+        self.latencies[name].append(latency)
+        self.statuses[name][status] += 1
+
+    @property
+    def sent(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    @property
+    def errors(self) -> int:
+        """
+        The requests that failed or got a client or server error response.
+        """
+        return sum(
+            count
+            for statuses in self.statuses.values()
+            for status, count in statuses.items()
+            if status == 0 or status >= 400
+        )
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def all_latencies(self) -> list[float]:
+        return [latency for values in self.latencies.values() for latency in values]
+
+
+class MixedWorkload:
+    """
+    Reads and writes messages, a `read_ratio` fraction of requests being
+    reads: a page of messages or one of the messages seen so far. Writes
+    create messages for a visitor created by `prepare`.
+    """
+
+    def __init__(self, read_ratio: float = 0.9, page_size: int = 20, seed=None):
+        self.read_ratio = read_ratio
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.visitor_id: Optional[int] = None
+        self.message_ids: list[int] = []
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        response = await client.post(
+            "/visitors", json=dict(name="Load Test", email="loadtest@example.com")
+        )
+        response.raise_for_status()
+        self.visitor_id = response.json()["id"]
+        response = await client.get("/messages", params=dict(limit=1000))
+        response.raise_for_status()
+        self.message_ids = [message["id"] for message in response.json()]
+
+    def __iter__(self) -> Iterator[LoadRequest]:
+        while True:
+            if self.random.random() >= self.read_ratio:
+                body = dict(
+                    content=f"load test {self.random.getrandbits(32):08x}",
+                    sender="loadtest",
+                    receiver="loadtest",
+                    visitor_id=self.visitor_id,
+                )
+                yield LoadRequest("POST", "/messages", "POST /messages", body)
+            elif self.message_ids and self.random.random() < 0.5:
+                message_id = self.random.choice(self.message_ids)
+                yield LoadRequest(
+                    "GET", f"/messages/{message_id}", "GET /messages/{message_id}"
+                )
+            else:
+                yield LoadRequest(
+                    "GET", f"/messages?limit={self.page_size}", "GET /messages"
+                )
+
+    def observe(self, request: LoadRequest, response: httpx.Response) -> None:
+        if request.method == "POST" and response.status_code == 201:
+            self.message_ids.append(response.json()["id"])
+
+
+class RequestLog:
+    """
+    Replays the requests of a newline-delimited JSON log, one object per line
+    with a `method` and a `path`, and optionally a JSON `body`, the matched
+    `route` (to group requests by) and the `time` it was sent. Lines without a
+    method and path, e.g. other log records, are skipped. Access log records
+    have no bodies, so writes replayed from them are rejected as invalid.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[LoadRequest]:
+        start = None
+        with self.path.open() as lines:
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict) or not (
+                    entry.get("method") and entry.get("path")
+                ):
+                    continue
+                at = None
+                if "time" in entry:
+                    sent = datetime.fromisoformat(entry["time"]).timestamp()
+                    start = sent if start is None else start
+                    at = sent - start
+                method = entry["method"].upper()
+                yield LoadRequest(
+                    method,
+                    entry["path"],
+                    f"{method} {entry.get('route') or entry['path']}",
+                    entry.get("body"),
+                    at,
+                )
+
+    def observe(self, request: LoadRequest, response: httpx.Response) -> None:
+        pass
+
+
+class LoadGenerator:
+    """
+    Sends the requests of a workload through `client` for up to `duration`
+    seconds or `requests` requests, whichever comes first.
+
+    With a `rate`, requests arrive open-loop at that average rate per second.
+    Without one, replayed requests keep their recorded spacing, divided by
+    `speed`, and synthetic requests are sent back to back (closed-loop).
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        clients: int = 10,
+        rate: Optional[float] = None,
+        duration: float = 10.0,
+        requests: Optional[int] = None,
+        speed: float = 1.0,
+        seed=None,
+    ):
+        self.client = client
+        self.clients = clients
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+        self.speed = speed
+        self.random = random.Random(seed)
+        self.stats = LoadStats()
+        # closed-loop requests are only scheduled when a client is free
+        self._free_clients = asyncio.Semaphore(clients)
+
+    async def run(self, workload: MixedWorkload | RequestLog) -> LoadStats:
+        await workload.prepare(self.client)
+        queue: asyncio.Queue = asyncio.Queue()
+        start = time.perf_counter()
+        workers = [
+            asyncio.create_task(self._send(queue, workload))
+            for _ in range(self.clients)
+        ]
+        try:
+            await self._schedule(queue, workload, start)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+    async def _schedule(
+        self, queue: asyncio.Queue, workload: MixedWorkload | RequestLog, start: float
+    ) -> None:
+        due = start
+        for count, request in enumerate(workload):
+            if self.requests is not None and count >= self.requests:
+                break
+            if self.rate:
+                due += self.random.expovariate(self.rate)
+            elif request.at is not None:
+                due = start + request.at / self.speed
+            else:
+                due = None
+            if (due or time.perf_counter()) - start >= self.duration:
+                break
+            if due is None:
+                await self._free_clients.acquire()
+            elif (delay := due - time.perf_counter()) > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((request, due))
+        for _ in range(self.clients):
+            queue.put_nowait(None)
+
+    async def _send(
+        self, queue: asyncio.Queue, workload: MixedWorkload | RequestLog
+    ) -> None:
+        while (item := await queue.get()) is not None:
+            request, due = item
+            started = due if due is not None else time.perf_counter()
+            try:
+                response = await self.client.request(
+                    request.method, request.path, json=request.body
+                )
+            except httpx.HTTPError:
+                status = 0
+            else:
+                status = response.status_code
+                workload.observe(request, response)
+            self.stats.record(request.name, status, time.perf_counter() - started)
+            if due is None:
+                self._free_clients.release()
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[max(0, min(len(ordered), round(q / 100 * len(ordered))) - 1)]
+
+
+def _format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms"
+
+
+def format_histogram(latencies: list[float], width: int = 40) -> str:
+    """
+    Renders the latencies as one bar per `LATENCY_BUCKETS` bucket, from the
+    first non-empty bucket to the last.
+    """
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for latency in latencies:
+        counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+    used = [i for i, count in enumerate(counts) if count]
+    if not used:
+        return ""
+    labels = [f"<= {_format_ms(bound)}" for bound in LATENCY_BUCKETS]
+    labels.append(f"> {_format_ms(LATENCY_BUCKETS[-1])}")
+    most = max(counts)
+    return "\n".join(
+        f"{labels[i]:>12} | {'#' * round(counts[i] / most * width):<{width}} "
+        f"{counts[i]}"
+        for i in range(used[0], used[-1] + 1)
+    )
+
+
+def format_report(stats: LoadStats) -> str:
+    """
+    Summarizes a run: overall rate, error rate and latency histogram, then
+    the latency percentiles and statuses of each kind of request.
+    """
+    error_rate = stats.errors / stats.sent if stats.sent else 0.0
+    lines = [
+        f"requests={stats.sent} duration={stats.elapsed:.1f}s "
+        f"rate={stats.rate:.1f}/s errors={stats.errors} ({error_rate:.1%})"
+    ]
+    latencies = sorted(stats.all_latencies())
+    if not latencies:
+        return lines[0]
+    lines.append(
+        "latency "
+        + " ".join(
+            f"p{q}={_format_ms(_percentile(latencies, q))}" for q in (50, 90, 99)
+        )
+        + f" max={_format_ms(latencies[-1])}"
+    )
+    lines.append(format_histogram(latencies))
+    for name in sorted(stats.latencies):
+        ordered = sorted(stats.latencies[name])
+        statuses = " ".join(
+            f"{status or 'failed'}={count}"
+            for status, count in sorted(stats.statuses[name].items())
+        )
+        lines.append(
+            f"{name}: n={len(ordered)} p50={_format_ms(_percentile(ordered, 50))} "
+            f"p99={_format_ms(_percentile(ordered, 99))} {statuses}"
+        )
+    return "\n".join(lines)
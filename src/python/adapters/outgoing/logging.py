@@ -1,3 +1,174 @@
 """
 Adapter for logging formats.
+
+`configure_logging` routes every record through a `QueueHandler`, so a logging
+call on the event loop only interpolates the message and enqueues the record;
+a `QueueListener` thread serializes it as one JSON object per line and writes
+it. Records carry the fields of the current `log_context`, e.g. the request
+id, the route and the time spent in the database so far.
 """
+
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Fields added to every record logged in the current context, e.g. a request.
+log_context: ContextVar[Optional[dict[str, Any]]] = ContextVar(
+    "log_context", default=None
+)
+
+# Attributes of every record; any other attribute was passed with `extra`.
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the `log_context` fields onto each record, unless it was logged
+    with a field of the same name.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, value in (log_context.get() or {}).items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `rate` fraction of DEBUG records. Records with a request id are
+    sampled by it, so a request's debug records are kept or dropped together.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id is None:
+            return random.random() < self.rate
+        return zlib.crc32(str(request_id).encode()) / 2**32 < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as a single-line JSON object with its time, level,
+    logger, message and extra fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them. Unlike `QueueHandler`, the
+    exception is kept for the listener to format, since the queue never
+    leaves the process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+
+def configure_logging(
+    level: int | str = logging.INFO,
+    debug_sample_rate: float = 1.0,
+    stream: Optional[IO[str]] = None,
+) -> QueueListener:
+    """
+    Sends every record, including uvicorn's, as JSON lines to `stream`
+    (default stderr) from a background thread, replacing any previous
+    configuration. Call `stop_logging` to flush the queue on exit.
+    """
+    stop_logging()
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter())
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers.clear()
+    # uvicorn.access is left alone: uvicorn stops it propagating when its
+    # access log is disabled, possibly before this runs in a worker process.
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).propagate = True
+
+    global _listener
+    _listener = QueueListener(records, output)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Writes the queued records and stops the listener thread, if running.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    # a connection runs one statement at a time
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - conn.info["query_started"]
+    fields = log_context.get()
+    if fields is not None:
+        fields["db_time_ms"] = round(fields.get("db_time_ms", 0) + elapsed * 1000, 3)
+        fields["db_queries"] = fields.get("db_queries", 0) + 1
+
+
+def track_database_time(engine: AsyncEngine) -> None:
+    """
+    Adds the time spent executing statements, and their number, to the
+    `db_time_ms` and `db_queries` fields of the current `log_context`.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,232 @@
+"""
+Adapter for exporting metrics in the Prometheus text format.
+
+Metrics are aggregated in-process and without locks: they are only updated
+from the event loop thread (SQLAlchemy runs the events of an async engine
+there too), so each observation is a few dictionary and list operations.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Seconds; requests and statements are both mostly in the millisecond range.
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    A named family of series, one per combination of label values.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help_: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self.series: dict[tuple, object] = {}
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """
+        Returns `(suffix, labels, value)` triples to expose.
+        """
+        return [
+            ("", _format_labels(self.labels, key), value)
+            for key, value in self.series.items()
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def set_total(self, value: float, *labels: str) -> None:
+        """
+        Sets the count from a total kept elsewhere, e.g. a component's stats.
+        """
+        self.series[labels] = value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.series[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """
+    Counts observations into cumulative `buckets` (upper bounds), keeping
+    their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            # per-bucket counts, the last one for values above every bound
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        samples = []
+        names = (*self.labels, "le")
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                bucket = _format_labels(names, (*key, _format_value(bound)))
+                samples.append(("_bucket", bucket, cumulative))
+            labels = _format_labels(self.labels, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    The metrics of a process. `collectors` run before each render, to update
+    metrics whose values are only read on demand (e.g. queue sizes).
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_, labels))
+
+    def gauge(self, name: str, help_: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        for collect in self.collectors:
+            collect()
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+    if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        return operation
+    return "OTHER"
+
+
+def instrument_engine(
+    engine: AsyncEngine, registry: MetricsRegistry, database: str = "primary"
+) -> None:
+    """
+    Counts and times the statements an engine executes, by operation, and how
+    long checkouts wait for a pooled connection (with a `TimedQueuePool`).
+    The metrics are shared by every engine instrumented on the registry and
+    told apart by the `database` label.
+    """
+    statements = registry.metrics.get("db_statement_duration_seconds")
+    if statements is None:
+        statements = registry.histogram(
+            "db_statement_duration_seconds",
+            "Time spent executing database statements.",
+            ("database", "operation"),
+        )
+        registry.histogram(
+            "db_pool_checkout_wait_seconds",
+            "Time spent waiting for a pooled database connection.",
+            ("database",),
+        )
+    checkout_wait = registry.metrics["db_pool_checkout_wait_seconds"]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["metrics_query_started"]
+        statements.observe(elapsed, database, _statement_operation(statement))
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        wait: Optional[float] = connection_record.info.pop("checkout_wait", None)
+        if wait is not None:
+            checkout_wait.observe(wait, database)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine.pool, "checkout", checkout)
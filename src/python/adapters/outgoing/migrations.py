@@ -0,0 +1,237 @@
+"""
+Adapter for versioned schema migrations of the relational database.
+
+Migrations run once, either from the CLI (`python -m src.python db upgrade`)
+or at application startup, and record the applied version in the
+`schema_version` table. Concurrent migrators (e.g. several replicas starting
+at once) serialize on a database-level lock so only one of them performs DDL.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    insert,
+    inspect,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateTable
+
+from .relational_database import (
+    FILTER_INDEXES,
+    KEYSET_INDEXES,
+    BaseRelationalModel,
+    MessageModel,
+    VisitorModel,
+    messages_search,
+    outbox,
+)
+
+ADVISORY_LOCK_KEY = 0x6D6967726174  # "migrat"
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    A single schema change, applied synchronously on a connection.
+    """
+
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _create_initial_schema(conn: Connection) -> None:
+    BaseRelationalModel.metadata.create_all(
+        conn, tables=[VisitorModel.__table__, MessageModel.__table__]
+    )
+
+
+def _create_keyset_indexes(conn: Connection) -> None:
+    for index in KEYSET_INDEXES:
+        index.create(conn, checkfirst=True)
+
+
+def _create_filter_indexes(conn: Connection) -> None:
+    for index in FILTER_INDEXES:
+        index.create(conn, checkfirst=True)
+
+
+def _create_message_search(conn: Connection) -> None:
+    # Other backends provide their own search index.
+    if conn.dialect.name != "sqlite":
+        return
+    fts = messages_search.name
+    statements = (
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            content, content='messages', content_rowid='id',
+            tokenize='porter unicode61'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON messages
+        BEGIN
+            INSERT INTO {fts}({fts}, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_update
+        AFTER UPDATE OF content ON messages
+        BEGIN
+            INSERT INTO {fts}({fts}, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+        END""",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    )
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+
+def _create_outbox(conn: Connection) -> None:
+    outbox.create(conn, checkfirst=True)
+
+
+def _add_revision(conn: Connection) -> None:
+    # The initial migration creates the tables from the current models, which
+    # already have the column.
+    for table in (VisitorModel.__table__, MessageModel.__table__):
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        if "revision" not in existing:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} "
+                "ADD COLUMN revision INTEGER NOT NULL DEFAULT 1"
+            )
+
+
+def _autoincrement_ids(conn: Connection) -> None:
+    # SQLite cannot alter a primary key, so tables created without
+    # AUTOINCREMENT are rebuilt: a copy is created from the current model,
+    # filled, and renamed over the original. Dropping the original drops its
+    # indexes and search triggers, which are created again.
+    if conn.dialect.name != "sqlite":
+        return
+    for table in (VisitorModel.__table__, MessageModel.__table__):
+        ddl = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table.name,),
+        ).scalar_one()
+        if "AUTOINCREMENT" in ddl.upper():
+            continue
+        copy = f"{table.name}_rebuild"
+        create = str(CreateTable(table).compile(dialect=conn.dialect))
+        conn.exec_driver_sql(
+            create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {copy} ", 1)
+        )
+        columns = ", ".join(column.name for column in table.columns)
+        conn.exec_driver_sql(
+            f"INSERT INTO {copy} ({columns}) SELECT {columns} FROM {table.name}"
+        )
+        conn.exec_driver_sql(f"DROP TABLE {table.name}")
+        conn.exec_driver_sql(f"ALTER TABLE {copy} RENAME TO {table.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+        if table is MessageModel.__table__:
+            _create_message_search(conn)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "Create visitors and messages", _create_initial_schema),
+    Migration(
+        2, "Index (created_at, id) for keyset pagination", _create_keyset_indexes
+    ),
+    Migration(
+        3, "Index filtered columns ahead of (created_at, id)", _create_filter_indexes
+    ),
+    Migration(4, "Full-text search over message content", _create_message_search),
+    Migration(5, "Outbox of events to publish", _create_outbox),
+    Migration(6, "Revision counters for cache validators", _add_revision),
+    Migration(7, "Never reuse the ids of deleted rows", _autoincrement_ids),
+]
+
+
+def head() -> int:
+    """
+    Returns the latest known schema version.
+    """
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+async def _current_version(conn: AsyncConnection) -> int:
+    has_table = await conn.run_sync(
+        lambda sync_conn: sync_conn.dialect.has_table(sync_conn, schema_version.name)
+    )
+    if not has_table:
+        return 0
+    version = await conn.scalar(select(func.max(schema_version.c.version)))
+    return version or 0
+
+
+async def _acquire_lock(conn: AsyncConnection) -> None:
+    """
+    Takes a lock held until the migration transaction ends.
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        await conn.execution_options(sqlite_begin="BEGIN IMMEDIATE")
+        await conn.begin()
+    elif dialect == "postgresql":
+        await conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({ADVISORY_LOCK_KEY})")
+
+
+async def current_version(engine: AsyncEngine) -> int:
+    """
+    Returns the schema version recorded in the database.
+    """
+    async with engine.connect() as conn:
+        return await _current_version(conn)
+
+
+async def upgrade(engine: AsyncEngine, target: Optional[int] = None) -> int:
+    """
+    Applies all pending migrations up to `target` (default: head) and returns
+    the resulting schema version.
+
+    An up-to-date database is detected with a single read and never locked.
+    """
+    target = head() if target is None else target
+    version = await current_version(engine)
+    if version >= target:
+        return version
+
+    async with engine.connect() as conn:
+        await _acquire_lock(conn)
+        await conn.run_sync(metadata.create_all)
+        version = await _current_version(conn)
+        for migration in MIGRATIONS:
+            if version < migration.version <= target:
+                await conn.run_sync(migration.upgrade)
+                await conn.execute(
+                    insert(schema_version).values(
+                        version=migration.version,
+                        description=migration.description,
+                    )
+                )
+                version = migration.version
+        await conn.commit()
+    return version
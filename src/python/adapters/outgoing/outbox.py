@@ -0,0 +1,190 @@
+"""
+Adapter for relaying outbox events to a producer.
+
+Repositories record events in the `outbox` table in the same transaction as
+the writes they describe. `OutboxRelay` polls the table in batches, claiming
+rows with a single `UPDATE ... RETURNING` so concurrent relays (e.g. one per
+worker process) do not publish the same rows, publishes them through the
+producer port and deletes them once delivered. Delivery is at-least-once: a
+relay that crashes after publishing leaves its claimed rows to be published
+again once the claim expires, so consumers deduplicate on the event id.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Table, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ...ports.producer import BaseProducer, Event
+from ...ports.repository import WRITE_EXECUTION_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the shortest wait after a failed poll, even without a poll interval.
+MIN_BACKOFF = 0.1
+
+
+@dataclass
+class OutboxStats:
+    """
+    `lag` is the age in seconds of the oldest event of the last batch when it
+    was published, i.e. how far behind the writes the relay runs; `errors`
+    counts the polls that failed.
+    """
+
+    polls: int = 0
+    relayed: int = 0
+    retried: int = 0
+    batches: int = 0
+    errors: int = 0
+    lag: float = 0.0
+
+
+def _utcnow() -> datetime:
+    # The table stores naive UTC timestamps, like SQLite's CURRENT_TIMESTAMP.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class OutboxRelay:
+    """
+    Publishes the events of an outbox `table` through `producer`.
+
+    Each poll claims up to `batch_size` rows for `claim_timeout` seconds,
+    publishes them, waits for the producer to deliver them and deletes them.
+    Rows the producer rejects or fails to deliver are released for the next
+    poll. The relay polls again immediately after a full batch and otherwise
+    sleeps `poll_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker,
+        table: Table,
+        producer: BaseProducer,
+        batch_size: int = 500,
+        poll_interval: float = 1.0,
+        claim_timeout: float = 30.0,
+        max_backoff: float = 30.0,
+    ):
+        self.session = sessionmaker
+        self.table = table
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_backoff = max_backoff
+        self.stats = OutboxStats()
+
+    async def _claim(self) -> list:
+        now = _utcnow()
+        t = self.table
+        claimable = (
+            select(t.c.id)
+            .where(or_(t.c.claimed_until.is_(None), t.c.claimed_until < now))
+            .order_by(t.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        query = (
+            update(t)
+            .where(t.c.id.in_(claimable.scalar_subquery()))
+            .values(
+                claimed_until=now + timedelta(seconds=self.claim_timeout),
+                attempts=t.c.attempts + 1,
+            )
+            .returning(
+                t.c.id, t.c.event_id, t.c.type, t.c.key, t.c.payload, t.c.occurred_at
+            )
+        )
+        async with self.session() as s:
+            await s.connection(execution_options=WRITE_EXECUTION_OPTIONS)
+            rows = (await s.execute(query)).all()
+            await s.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    async def _finish(self, sent: list[int], released: list[int]) -> None:
+        t = self.table
+        async with self.session() as s:
+            await s.connection(execution_options=WRITE_EXECUTION_OPTIONS)
+            if sent:
+                await s.execute(delete(t).where(t.c.id.in_(sent)))
+            if released:
+                await s.execute(
+                    update(t).where(t.c.id.in_(released)).values(claimed_until=None)
+                )
+            await s.commit()
+
+    async def relay_once(self) -> int:
+        """
+        Publishes one batch and returns the number of events relayed.
+        """
+        self.stats.polls += 1
+        rows = await self._claim()
+        if not rows:
+            return 0
+        failed = self.producer.stats.failed
+        sent, released = [], []
+        try:
+            for row in rows:
+                event = Event(
+                    row.type,
+                    row.payload,
+                    key=row.key,
+                    id=row.event_id,
+                    occurred_at=row.occurred_at.replace(tzinfo=timezone.utc),
+                )
+                published = await self.producer.publish(event)
+                (sent if published else released).append(row.id)
+            await self.producer.flush()
+        except Exception:
+            # release the batch for the next poll rather than the claim timeout
+            await self._finish([], [row.id for row in rows])
+            raise
+        if self.producer.stats.failed > failed:
+            # which of the batch failed is unknown; publish all of it again
+            sent, released = [], sent + released
+        await self._finish(sent, released)
+        self.stats.relayed += len(sent)
+        self.stats.retried += len(released)
+        self.stats.batches += 1
+        self.stats.lag = (_utcnow() - rows[0].occurred_at).total_seconds()
+        return len(sent)
+
+    async def pending(self) -> int:
+        """
+        Returns the number of events waiting in the outbox.
+        """
+        async with self.session() as s:
+            return await s.scalar(select(func.count()).select_from(self.table))
+
+    async def drain(self) -> None:
+        """
+        Relays until a poll relays less than a full batch.
+        """
+        while await self.relay_once() >= self.batch_size:
+            pass
+
+    async def run(self) -> None:
+        """
+        Relays until cancelled. A poll that fails, e.g. because the database
+        is busy, the pool is exhausted or the producer raises, is logged and
+        retried after a back-off doubling from `poll_interval` (at least
+        `MIN_BACKOFF`) up to `max_backoff` seconds.
+        """
+        failures = 0
+        while True:
+            try:
+                relayed = await self.relay_once()
+            except Exception:
+                self.stats.errors += 1
+                logger.exception("Outbox relay poll failed")
+                backoff = max(self.poll_interval, MIN_BACKOFF) * 2**failures
+                failures += 1
+                await asyncio.sleep(min(backoff, self.max_backoff))
+                continue
+            failures = 0
+            if relayed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
@@ -1,3 +1,193 @@
 """
 Adapter for producing messages.
-"""
\ No newline at end of file
+
+`BatchingProducer` decouples publishing from delivery: `publish` only enqueues
+onto a bounded in-process queue, and a background task delivers the events to
+a sink in batches of up to `batch_size`, waiting at most `linger` seconds for a
+batch to fill. `NDJSONFileSink` stands in for a broker locally.
+"""
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import IO, Optional, Sequence
+
+from ...ports.producer import BaseEventSink, BaseProducer, Event, ProducerStats
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_oldest")
+
+
+class BatchingProducer(BaseProducer):
+    """
+    Publishes events through a bounded queue drained in batches.
+
+    When the queue is full, `overflow` decides: "block" applies backpressure
+    to the publisher for up to `block_timeout` seconds (forever if `None`)
+    before dropping the event, "drop_new" drops the event and "drop_oldest"
+    makes room by dropping the oldest queued event. Failed batches are retried
+    `max_retries` times with exponential backoff before being counted as
+    failed.
+    """
+
+    def __init__(
+        self,
+        sink: BaseEventSink,
+        max_queue_size: int = 10_000,
+        batch_size: int = 500,
+        linger: float = 0.05,
+        overflow: str = "block",
+        block_timeout: Optional[float] = 0.1,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.linger = linger
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.stats = ProducerStats()
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flushing = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def publish(self, event: Event) -> bool:
+        if self._closing:
+            self.stats.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if not await self._overflow(event):
+                self.stats.dropped += 1
+                return False
+        self.stats.published += 1
+        return True
+
+    async def _overflow(self, event: Event) -> bool:
+        if self.overflow == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.stats.dropped += 1
+            self.queue.put_nowait(event)
+            return True
+        if self.overflow == "block":
+            try:
+                await asyncio.wait_for(self.queue.put(event), self.block_timeout)
+                return True
+            except TimeoutError:
+                pass
+        return False
+
+    async def _next_batch(self) -> list[Event]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0 or self._flushing.is_set():
+                break
+            # Wait for the next event, unless the producer starts closing.
+            getter = asyncio.ensure_future(self.queue.get())
+            flushing = asyncio.ensure_future(self._flushing.wait())
+            done, _ = await asyncio.wait(
+                (getter, flushing), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            flushing.cancel()
+            if getter not in done:
+                getter.cancel()
+                break
+            batch.append(getter.result())
+        return batch
+
+    async def _deliver(self, batch: list[Event]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sink.write(batch)
+            except Exception:
+                if attempt == self.max_retries:
+                    logger.exception("Dropping %d events after retries", len(batch))
+                    self.stats.failed += len(batch)
+                    return
+                await asyncio.sleep(self.retry_backoff * 2**attempt)
+            else:
+                self.stats.delivered += len(batch)
+                self.stats.batches += 1
+                return
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def flush(self) -> None:
+        await self.start()
+        await self.queue.join()
+
+    async def close(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Stops accepting events, delivers the queued ones (giving up after
+        `timeout` seconds) and closes the sink.
+        """
+        self._closing = True
+        self._flushing.set()
+        await self.start()
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except TimeoutError:
+            self.stats.dropped += self.queue.qsize()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self.sink.close()
+
+
+class NDJSONFileSink(BaseEventSink):
+    """
+    Appends events to a newline-delimited JSON file, one line per event,
+    writing from a worker thread so the event loop never blocks on I/O.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file: Optional[IO[str]] = None
+
+    def _write(self, lines: str) -> None:
+        if self._file is None:
+            self._file = self.path.open("a", encoding="utf-8")
+        self._file.write(lines)
+        self._file.flush()
+
+    async def write(self, events: Sequence[Event]) -> None:
+        lines = "".join(
+            json.dumps(event.to_dict(), separators=(",", ":"), default=str) + "\n"
+            for event in events
+        )
+        await asyncio.to_thread(self._write, lines)
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
@@ -0,0 +1,191 @@
+"""
+Adapter for profiling requests.
+
+`StackSampler` periodically samples the stack of the event loop thread from a
+background thread while a request is handled, and `Profiler` keeps the most
+recent profiles as collapsed stacks (`frame;frame;frame count` lines), the
+input format of flame graph tools such as `flamegraph.pl` and speedscope.
+
+Sampling sees everything the event loop runs during the request, including
+other requests' tasks, and time spent waiting on I/O shows up as the loop's
+selector. Only one request is profiled at a time.
+
+SQLAlchemy's asyncio extension runs ORM code in child greenlets, whose frame
+chains stop at the greenlet's root. The sampler tracks the greenlet running
+on the sampled thread and continues each stack with the frames of its
+parents, so ORM time is attributed to the repository method and route that
+awaited it.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Optional
+
+import greenlet
+
+_labels: dict[CodeType, str] = {}
+
+
+def _label(code: CodeType) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = Path(code.co_filename).name
+        label = _labels[code] = (
+            f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        )
+    return label
+
+
+def collapse(
+    frame: Optional[FrameType], running: Optional[greenlet.greenlet] = None
+) -> str:
+    """
+    Returns the stack ending at `frame` as `;`-separated frames, root first.
+    With the `running` greenlet that `frame` belongs to, the stack continues
+    through the frames where its parent greenlets switched into it.
+    """
+    frames = []
+    while frame is not None:
+        frames.append(_label(frame.f_code))
+        frame = frame.f_back
+        if frame is None and running is not None:
+            running = running.parent
+            frame = running.gr_frame if running is not None else None
+    return ";".join(reversed(frames))
+
+
+class StackSampler:
+    """
+    Counts the stacks of the thread `thread_id` sampled every `interval`
+    seconds, until stopped.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.running: Optional[greenlet.greenlet] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            running = self.running
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            if running is not None and running.gr_frame is not None:
+                # it switched away since; the frame is another greenlet's
+                running = None
+            self.stacks[collapse(frame, running)] += 1
+
+    def _trace(self, event: str, args: tuple) -> None:
+        if event in ("switch", "throw"):
+            self.running = args[1]
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+    def start(self) -> None:
+        """
+        Starts sampling; when `thread_id` is the calling thread, its greenlet
+        switches are tracked as well.
+        """
+        # A busy thread only yields the GIL every switch interval (5ms by
+        # default), which would cap the sampling rate.
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._tracing = self.thread_id == threading.get_ident()
+        if self._tracing:
+            self.running = greenlet.getcurrent()
+            self._previous_trace = greenlet.settrace(self._trace)
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+        if self._tracing:
+            greenlet.settrace(self._previous_trace)
+        return self.stacks
+
+
+@dataclass
+class Profile:
+    id: str
+    method: str
+    path: str
+    route: Optional[str]
+    duration: float
+    stacks: Counter[str]
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+class Profiler:
+    """
+    Profiles one request at a time, keeping the last `keep` profiles and, with
+    a `directory`, writing each to `<id>.collapsed` there. `sample_rate` is
+    the fraction of requests to profile without being asked to.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        interval: float = 0.001,
+        keep: int = 20,
+        directory: Optional[str | Path] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.directory = Path(directory) if directory else None
+        self.profiles: deque[Profile] = deque(maxlen=keep)
+        self._sampler: Optional[StackSampler] = None
+        self._started = 0.0
+
+    def start(self) -> bool:
+        """
+        Starts sampling the calling thread, unless a profile is in progress,
+        and returns whether it started.
+        """
+        if self._sampler is not None:
+            return False
+        self._sampler = StackSampler(threading.get_ident(), self.interval)
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return True
+
+    async def stop(
+        self, id_: str, method: str, path: str, route: Optional[str] = None
+    ) -> Profile:
+        """
+        Stops sampling and records the profile.
+        """
+        sampler, self._sampler = self._sampler, None
+        duration = time.perf_counter() - self._started
+        profile = Profile(id_, method, path, route, duration, sampler.stop())
+        self.profiles.append(profile)
+        if self.directory is not None:
+            await asyncio.to_thread(self._write, profile)
+        return profile
+
+    def _write(self, profile: Profile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile.id}.collapsed").write_text(profile.collapsed())
+
+    def get(self, id_: str) -> Optional[Profile]:
+        return next((p for p in self.profiles if p.id == id_), None)
@@ -2,10 +2,34 @@
 Adapter for Relational Database.
 """
 
+import asyncio
+import re
+import time
+from contextlib import AsyncExitStack
 from datetime import datetime
-from typing import Annotated, AsyncGenerator, Optional
+from functools import partial
+from typing import Annotated, Any, AsyncGenerator, Mapping, Optional
 
-from sqlalchemy import ForeignKey, select
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    MetaData,
+    String,
+    Table,
+    event,
+    literal_column,
+    make_url,
+    select,
+    text,
+)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     AsyncEngine,
@@ -14,10 +38,19 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.sql import func
 
 from ...domain.models import BaseModel, Message, Visitor
 
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///local.sqlite"
+
+# SQLite's CURRENT_TIMESTAMP has second precision; binding parameters the same
+# way keeps comparisons against server-generated timestamps consistent.
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
 
 class BaseRelationalModel(AsyncAttrs, DeclarativeBase, BaseModel):
     """
@@ -25,27 +58,177 @@ class BaseRelationalModel(AsyncAttrs, DeclarativeBase, BaseModel):
     """
 
     __abstract__ = True
+    # Without AUTOINCREMENT, SQLite hands the id of the last deleted row to
+    # the next insert, whose validators could then match the deleted row's.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, unique=True, autoincrement=True)
-    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(Timestamp, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
-        server_default=func.now(), onupdate=func.now()
+        Timestamp, server_default=func.now(), onupdate=func.now()
+    )
+    # Bumped by every UPDATE: unlike `updated_at`, which has second precision
+    # on SQLite, it tells apart edits made within the same second.
+    revision: Mapped[int] = mapped_column(
+        server_default=text("1"), onupdate=literal_column("revision + 1")
     )
     deleted_at: Optional[Mapped[datetime]] = Annotated[
         datetime, mapped_column(nullable=True, default=None)
     ]
 
 
-async def create_database_engine(url: str) -> AsyncEngine:
+def is_memory_database(url: str) -> bool:
+    """
+    Returns whether the URL points at an in-memory SQLite database, which can
+    only live on a single connection and therefore cannot be pooled.
+    """
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+# Connection pragmas applied on connect, selected with `sqlite_pragmas`.
+# "performance" lets readers proceed while a writer commits (WAL), syncs only
+# at checkpoints, memory-maps and caches the hot pages, and waits on locks
+# instead of failing immediately.
+SQLITE_PRAGMA_PROFILES: dict[str, dict[str, Any]] = {
+    "none": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # in KiB when negative
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+# Replicas only read: they leave the journal mode (a property of the database
+# file) and write durability to the primary, and refuse writes.
+SQLITE_WRITER_PRAGMAS = ("journal_mode", "synchronous")
+SQLITE_REPLICA_PRAGMAS: dict[str, Any] = {"query_only": "ON"}
+
+_PRAGMA_TOKEN = re.compile(r"^-?\w+$")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    A queue pool that records how long each checkout waited for a connection,
+    including opening a new one, in the connection record's
+    `info["checkout_wait"]` for `checkout` event listeners (e.g. metrics).
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        record = super()._do_get()
+        record.info["checkout_wait"] = time.perf_counter() - start
+        return record
+
+
+def _disable_sqlite_autobegin(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def _apply_sqlite_pragmas(
+    pragmas: Mapping[str, Any], dbapi_connection, connection_record
+) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _begin_sqlite_transaction(conn: Connection) -> None:
+    conn.exec_driver_sql(conn.get_execution_options().get("sqlite_begin", "BEGIN"))
+
+
+async def create_database_engine(
+    url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = False,
+    pool_recycle: int = -1,
+    sqlite_pragmas: Optional[Mapping[str, Any]] = None,
+) -> AsyncEngine:
     """
     Creates a database engine.
+
+    When `pool_size` is given, connections are kept in a queue pool so that
+    they are reused across sessions instead of opened per checkout. The schema
+    is managed separately by the `migrations` adapter.
+
+    For SQLite, transactions are begun explicitly (with the statement given by
+    the `sqlite_begin` execution option, default `BEGIN`) instead of by the
+    driver, so that SAVEPOINTs nest inside the enclosing transaction, and
+    `sqlite_pragmas` (e.g. a `SQLITE_PRAGMA_PROFILES` entry) are set on every
+    new connection.
     """
-    engine = create_async_engine(url)
-    async with engine.begin() as conn:
-        await conn.run_sync(BaseRelationalModel.metadata.create_all)
+    for name, value in (sqlite_pragmas or {}).items():
+        if not (_PRAGMA_TOKEN.match(name) and _PRAGMA_TOKEN.match(str(value))):
+            raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+    options = dict(pool_pre_ping=pool_pre_ping, pool_recycle=pool_recycle)
+    if pool_size is not None and not is_memory_database(url):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+        )
+    engine = create_async_engine(url, **options)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _disable_sqlite_autobegin)
+        event.listen(engine.sync_engine, "begin", _begin_sqlite_transaction)
+        if sqlite_pragmas:
+            event.listen(
+                engine.sync_engine,
+                "connect",
+                partial(_apply_sqlite_pragmas, dict(sqlite_pragmas)),
+            )
     return engine
 
 
+async def warm_pool(engine: AsyncEngine, connections: int) -> None:
+    """
+    Opens up to `connections` pooled connections at once and returns them to
+    the pool, so the first requests do not pay for connecting (and applying
+    the SQLite pragmas). At most the pool's size are opened, as the pool would
+    close any more on return; engines without a queue pool are left alone.
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return
+    async with AsyncExitStack() as stack:
+        for _ in range(min(connections, engine.pool.size())):
+            await stack.enter_async_context(engine.connect())
+
+
+async def maintain_sqlite(engine: AsyncEngine) -> None:
+    """
+    Checkpoints the WAL into the database file without blocking readers or
+    writers, and lets SQLite refresh the planner statistics it finds stale.
+    Does nothing for other databases.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        await conn.exec_driver_sql("PRAGMA optimize")
+
+
+async def maintain_sqlite_periodically(engine: AsyncEngine, interval: float) -> None:
+    """
+    Runs `maintain_sqlite` every `interval` seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await maintain_sqlite(engine)
+        except OperationalError:
+            # Busy for longer than busy_timeout; retry on the next tick.
+            continue
+
+
 def get_sessionmaker(
     engine: AsyncEngine, expire_on_commit=False
 ) -> AsyncGenerator[AsyncSession, None]:
@@ -91,3 +274,60 @@ class MessageModel(BaseRelationalModel, Message):
         cascade_backrefs=False,
         back_populates="messages",
     )
+
+
+# Keyset pagination walks (created_at, id) in order.
+KEYSET_INDEXES = (
+    Index("ix_visitors_created_at_id", VisitorModel.created_at, VisitorModel.id),
+    Index("ix_messages_created_at_id", MessageModel.created_at, MessageModel.id),
+)
+
+# Equality filters lead, so a filtered page is a range scan of one index that
+# is already in keyset order; created_at ranges use the keyset index.
+FILTER_INDEXES = tuple(
+    Index(
+        f"ix_{model.__tablename__}_{column}_created_at_id",
+        getattr(model, column),
+        model.created_at,
+        model.id,
+    )
+    for model, column in (
+        (VisitorModel, "name"),
+        (VisitorModel, "email"),
+        (MessageModel, "visitor_id"),
+        (MessageModel, "sender"),
+        (MessageModel, "receiver"),
+    )
+)
+
+
+# SQLite FTS5 index over messages.content, created and kept in sync with
+# triggers by the migrations. It lives outside the model metadata because it is
+# not a regular table; `rank` and `rowid` are FTS5's hidden columns.
+search_metadata = MetaData()
+
+messages_search = Table(
+    "messages_fts",
+    search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("content", String),
+    Column("rank", Float),
+)
+
+
+# Events recorded in the same transaction as the writes they describe and
+# published by the `outbox` relay. A relay claims rows by setting
+# `claimed_until`, so concurrent relays skip each other's rows until the claim
+# expires.
+outbox = Table(
+    "outbox",
+    BaseRelationalModel.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("event_id", String(32), nullable=False),
+    Column("type", String, nullable=False),
+    Column("key", String, nullable=True),
+    Column("payload", JSON, nullable=False),
+    Column("occurred_at", Timestamp, nullable=False, server_default=func.now()),
+    Column("claimed_until", Timestamp, nullable=True),
+    Column("attempts", Integer, nullable=False, server_default="0"),
+)
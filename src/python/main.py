@@ -1,9 +1,38 @@
-def main(debug: bool = False):
+from typing import Optional
+
+
+def setup_logging(debug: bool = False):
+    """
+    Logs JSON lines off the event loop, at `LOG_LEVEL` (DEBUG in debug mode,
+    INFO otherwise), keeping a `LOG_DEBUG_SAMPLE_RATE` fraction of DEBUG
+    records.
+    """
+    import atexit
+
+    from decouple import config
+
+    from .adapters.outgoing.logging import configure_logging, stop_logging
+
+    configure_logging(
+        level=config("LOG_LEVEL", default="DEBUG" if debug else "INFO").upper(),
+        debug_sample_rate=config("LOG_DEBUG_SAMPLE_RATE", default=0.1, cast=float),
+    )
+    # once, however many apps are created
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+
+
+def main(debug: Optional[bool] = None):
     """
-    Runs the various apps, i.e. message board.
+    The app factory: imports and creates the various apps, i.e. message
+    board, which importing the package does not. `debug` defaults to the
+    `DEBUG` setting, e.g. in worker processes uvicorn starts with the factory.
     """
+    from decouple import config
 
-    from .adapters.incoming.api import app
+    from .adapters.incoming.api import create_app
 
-    app.debug = debug
-    return app
+    if debug is None:
+        debug = config("DEBUG", default=False, cast=bool)
+    setup_logging(debug)
+    return create_app(debug)
@@ -0,0 +1,125 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class LRUCache:
+    """
+    A bounded in-process cache evicting the least recently used entry once
+    `maxsize` is reached. Entries older than `ttl` seconds count as misses.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Hashable, tuple[Optional[float], Any]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns an entry without counting the lookup or refreshing its
+        recency.
+        """
+        expires_at, value = self._entries.get(key, (None, default))
+        if expires_at is not None and expires_at <= self.clock():
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl is None else self.clock() + self.ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class BaseSharedCache(ABC):
+    """
+    A cache shared between processes, consulted on local misses.
+    Implementations backed by a network service serialize values themselves.
+    """
+
+    @abstractmethod
+    async def get(self, key: str, default: Any = MISSING) -> Any: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> None: ...
+
+
+class InMemorySharedCache(BaseSharedCache):
+    """
+    A local stand-in for a shared cache backend.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._entries: dict[str, tuple[Optional[float], Any]] = {}
+
+    async def get(self, key: str, default: Any = MISSING) -> Any:
+        expires_at, value = self._entries.get(key, (None, default))
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            return default
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = None if ttl is None else self.clock() + ttl
+        self._entries[key] = (expires_at, value)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
@@ -0,0 +1,117 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+
+@dataclass
+class Record:
+    """
+    One item read from a source. `position` is opaque to the consumer and is
+    handed back to the source once the record and all before it are stored.
+    """
+
+    position: Any
+    data: Optional[Mapping[str, Any]]
+    error: Optional[str] = None
+
+
+@dataclass
+class ConsumerStats:
+    consumed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    lag: Optional[int] = None
+
+    @property
+    def rate(self) -> float:
+        return self.consumed / self.elapsed if self.elapsed else 0.0
+
+
+class BaseSource(ABC):
+    """
+    Where a consumer reads records from, e.g. a file, a pipe or a broker.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def read(
+        self, max_records: int, timeout: float
+    ) -> Optional[Sequence[Record]]:
+        """
+        Returns up to `max_records` records, waiting at most `timeout` seconds
+        for the first one; an empty list if none arrived yet and `None` once
+        the source is exhausted.
+        """
+
+    async def commit(self, position: Any) -> None:
+        """
+        Acknowledges every record up to and including `position`, so a
+        restarted consumer resumes after it.
+        """
+
+    def lag(self) -> Optional[int]:
+        """
+        Returns how far behind the source the last commit is, in the source's
+        own unit, or `None` if unknown.
+        """
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemorySource(BaseSource):
+    """
+    A local stand-in for a queue, fed with `put` and ended with `end`.
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize: int = 0):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.committed = 0
+        self._offset = 0
+        self._ended = False
+
+    async def put(self, data: Mapping[str, Any]) -> None:
+        await self.queue.put(data)
+
+    async def end(self) -> None:
+        await self.queue.put(self._END)
+
+    def _record(self, data: Any) -> Optional[Record]:
+        if data is self._END:
+            self._ended = True
+            return None
+        self._offset += 1
+        return Record(self._offset, data)
+
+    async def read(
+        self, max_records: int, timeout: float
+    ) -> Optional[Sequence[Record]]:
+        if self._ended:
+            return None
+        try:
+            first = self._record(await asyncio.wait_for(self.queue.get(), timeout))
+        except TimeoutError:
+            return []
+        if first is None:
+            return None
+        records = [first]
+        while len(records) < max_records and not self.queue.empty():
+            record = self._record(self.queue.get_nowait())
+            if record is None:
+                break
+            records.append(record)
+        return records
+
+    async def commit(self, position: int) -> None:
+        self.committed = position
+
+    def lag(self) -> int:
+        return self.queue.qsize()
@@ -0,0 +1,101 @@
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Mapping, Optional, Sequence
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _event_id() -> str:
+    return uuid.uuid4().hex
+
+
+@dataclass(frozen=True)
+class Event:
+    """
+    A domain event, e.g. `message.created`, carrying the entity it is about.
+    Events with the same `key` are delivered in the order they were published.
+    """
+
+    type: str
+    payload: Mapping[str, Any]
+    key: Optional[str] = None
+    id: str = field(default_factory=_event_id)
+    occurred_at: datetime = field(default_factory=_now)
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            id=self.id,
+            type=self.type,
+            key=self.key,
+            occurred_at=self.occurred_at.isoformat(),
+            payload=self.payload,
+        )
+
+
+@dataclass
+class ProducerStats:
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    failed: int = 0
+    batches: int = 0
+
+
+class BaseEventSink(ABC):
+    """
+    Where a producer delivers batches of events, e.g. a broker client.
+    """
+
+    @abstractmethod
+    async def write(self, events: Sequence[Event]) -> None: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryEventSink(BaseEventSink):
+    """
+    A local stand-in for a broker, keeping every delivered batch.
+    """
+
+    def __init__(self):
+        self.batches: list[list[Event]] = []
+
+    @property
+    def events(self) -> list[Event]:
+        return [event for batch in self.batches for event in batch]
+
+    async def write(self, events: Sequence[Event]) -> None:
+        self.batches.append(list(events))
+
+
+class BaseProducer(ABC):
+    """
+    Publishes events without waiting for their delivery.
+    """
+
+    stats: ProducerStats
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, event: Event) -> bool:
+        """
+        Hands an event over for delivery and returns whether it was accepted
+        (`False` if it was dropped).
+        """
+
+    async def flush(self) -> None:
+        """
+        Waits until every accepted event has been delivered or has failed.
+        """
+
+    async def close(self) -> None:
+        """
+        Delivers the pending events and releases the sink.
+        """
@@ -1,11 +1,195 @@
+import base64
+import binascii
+import hashlib
+import json
+import operator
 from abc import ABC, abstractmethod
-from typing import Any, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Mapping, Optional, Sequence
 
-from sqlalchemy import delete, select
-from sqlalchemy.ext.asyncio import async_sessionmaker
-from sqlalchemy.orm import selectinload
+from sqlalchemy import (
+    Select,
+    Table,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import (
+    joinedload,
+    load_only,
+    noload,
+    raiseload,
+    selectinload,
+)
 
 from ..domain.models import BaseModel
+from .cache import MISSING, BaseSharedCache, LRUCache
+from .producer import Event
+
+
+@dataclass
+class Page:
+    """
+    A slice of entities and the opaque cursor for the following slice, if any.
+    """
+
+    items: list[BaseModel] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Version:
+    """
+    A cheap summary of a set of entities used as an HTTP cache validator.
+
+    Each part is `(max(updated_at), count, sum(id), sum(revision))` of the
+    entities and then of each included relationship. Insertions and deletions
+    change the count and ids, which are never reused; edits increment a
+    `revision`, since several edits may share an `updated_at`. Entities without a `revision` count 0.
+    """
+
+    parts: tuple[tuple[Optional[datetime], int, int, int], ...]
+
+    @classmethod
+    def of(
+        cls, entities: Sequence[BaseModel], include: Sequence[str] = ()
+    ) -> "Version":
+        groups = [list(entities)]
+        for name in include:
+            groups.append(
+                [item for entity in entities for item in getattr(entity, name)]
+            )
+        return cls(
+            tuple(
+                (
+                    max((entity.updated_at for entity in group), default=None),
+                    len(group),
+                    sum(entity.id for entity in group),
+                    sum(getattr(entity, "revision", 0) for entity in group),
+                )
+                for group in groups
+            )
+        )
+
+    @property
+    def count(self) -> int:
+        return self.parts[0][1]
+
+    @property
+    def last_modified(self) -> Optional[datetime]:
+        return max((part[0] for part in self.parts if part[0]), default=None)
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.sha1(repr(self.parts).encode()).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+
+class EntityNotFoundError(ValueError):
+    """
+    Raised when an operation targets an entity that does not exist.
+    """
+
+
+@dataclass
+class BatchError:
+    """
+    A batch item that could not be processed, by its position in the batch.
+    """
+
+    index: int
+    detail: Any
+
+
+@dataclass
+class BatchResult:
+    """
+    The entities produced from a batch and the items that failed.
+    """
+
+    items: list[BaseModel] = field(default_factory=list)
+    errors: list[BatchError] = field(default_factory=list)
+
+
+@dataclass
+class SearchHit:
+    """
+    An entity matching a full-text search, with its relevance (lower ranks
+    first) and a highlighted excerpt.
+    """
+
+    entity: BaseModel
+    rank: float
+    snippet: str
+
+
+@dataclass(frozen=True)
+class Outbox:
+    """
+    Where a repository records `<prefix>.created|updated|deleted` events in
+    the transaction of each write, to be published later by a relay. `key`
+    names the entity attribute that keys the events.
+    """
+
+    table: Table
+    prefix: str
+    key: Optional[str] = None
+
+
+def _encode_position(position: list) -> str:
+    payload = json.dumps(position)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_position(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def encode_cursor(entity: BaseModel) -> str:
+    """
+    Encodes the keyset position `(created_at, id)` of an entity.
+    """
+    return _encode_position([entity.created_at.isoformat(), entity.id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Decodes a cursor produced by `encode_cursor`, raising `ValueError` if it
+    is malformed.
+    """
+    try:
+        created_at, id_ = _decode_position(cursor)
+        return datetime.fromisoformat(created_at), int(id_)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+
+def encode_search_cursor(hit: SearchHit) -> str:
+    """
+    Encodes the position `(rank, id)` of a search hit.
+    """
+    return _encode_position([hit.rank, hit.entity.id])
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    """
+    Decodes a cursor produced by `encode_search_cursor`, raising `ValueError`
+    if it is malformed.
+    """
+    try:
+        rank, id_ = _decode_position(cursor)
+        return float(rank), int(id_)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
 
 
 class BaseRepository(ABC):
@@ -16,63 +200,729 @@ class BaseRepository(ABC):
     @abstractmethod
     async def list(self, **kwargs) -> list[BaseModel]: ...
 
+    @abstractmethod
+    async def paginate(
+        self, limit: int, cursor: Optional[str] = None, **kwargs
+    ) -> Page: ...
+
+    async def paginate_rows(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> Page:
+        """
+        Returns the page `paginate` would, as read-only rows of `columns`
+        (default all) and the `VERSION_COLUMNS`, without building entities.
+        Raises `NotImplementedError` if the adapter cannot.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support reading rows"
+        )
+
+    async def stream(
+        self, batch_size: int = 500, cursor: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Yields every entity after `cursor` in keyset order, fetching
+        `batch_size` at a time. Adapters with server-side cursors should
+        override this.
+        """
+        while True:
+            page = await self.paginate(batch_size, cursor, **kwargs)
+            for entity in page.items:
+                yield entity
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
+    async def version(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include: Sequence[str] = (),
+        **kwargs,
+    ) -> Optional[Version]:
+        """
+        Returns the `Version` of what `paginate` (or, without `limit`, `list`)
+        would return, without loading it, or `None` if the adapter cannot
+        compute it cheaply.
+        """
+        return None
+
+    async def search(
+        self, query: str, limit: int, cursor: Optional[str] = None, **kwargs
+    ) -> Page:
+        """
+        Returns up to `limit` `SearchHit`s for a full-text `query`, best
+        first, starting after `cursor`. Raises `ValueError` for a malformed
+        query and `NotImplementedError` if the adapter has no search index.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support search")
+
     @abstractmethod
     async def create(self, entity: BaseModel) -> BaseModel: ...
 
+    @abstractmethod
+    async def create_many(
+        self, entities: Sequence[BaseModel], chunk_size: int = 500
+    ) -> BatchResult: ...
+
     @abstractmethod
     async def update(self, id_: int, entity: BaseModel) -> BaseModel: ...
 
     @abstractmethod
     async def delete(self, id_: int) -> None: ...
 
+    @abstractmethod
+    async def update_where(
+        self, data: Mapping[str, Any], **kwargs
+    ) -> Sequence[BaseModel]: ...
+
+    @abstractmethod
+    async def delete_where(self, **kwargs) -> Sequence[int]: ...
+
+
+LOADER_STRATEGIES = {
+    "noload": noload,
+    "selectin": selectinload,
+    "joined": joinedload,
+    "raise": raiseload,
+}
+
+WRITE_EXECUTION_OPTIONS = {"sqlite_begin": "BEGIN IMMEDIATE"}
+
+# Loaded whatever the requested columns: keyset pagination and `Version` need
+# them. `revision` is bookkeeping and stays out of event payloads.
+VERSION_COLUMNS = ("id", "created_at", "updated_at", "revision")
+
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
 
 class SQLAlchemyRepository(BaseRepository):
 
-    def __init__(self, sessionmaker: async_sessionmaker, model: BaseModel):
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker,
+        model: BaseModel,
+        search_table: Optional[Table] = None,
+        read_sessionmaker: Optional[async_sessionmaker] = None,
+        outbox: Optional[Outbox] = None,
+    ):
+        """
+        Writes go through `sessionmaker`; reads go through `read_sessionmaker`
+        (e.g. bound to a replica) when given, until this repository writes
+        and pins its reads to `sessionmaker` to read its own writes. With an
+        `outbox`, every write records its events in it atomically.
+        """
         self.session = sessionmaker
+        self.read_session = read_sessionmaker or sessionmaker
         self.model = model
+        self.search_table = search_table
+        self.outbox = outbox
 
-    async def get(self, id_: int) -> BaseModel:
+    @asynccontextmanager
+    async def _write_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Opens a session whose transaction takes the write lock up front
+        (`BEGIN IMMEDIATE` on SQLite), so concurrent writers wait on the busy
+        timeout instead of failing on a stale read snapshot.
+        """
+        self.read_session = self.session
         async with self.session() as s:
-            result = await s.get(self.model, id_)
+            await s.connection(execution_options=WRITE_EXECUTION_OPTIONS)
+            yield s
+
+    def _event(self, type_: str, entity: BaseModel) -> Event:
+        payload = {}
+        for name in self.model.__mapper__.column_attrs.keys():
+            if name == "revision":
+                continue
+            value = getattr(entity, name)
+            payload[name] = value.isoformat() if isinstance(value, datetime) else value
+        key = getattr(entity, self.outbox.key) if self.outbox.key else None
+        return Event(
+            f"{self.outbox.prefix}.{type_}",
+            payload,
+            key=None if key is None else str(key),
+        )
+
+    async def _record_events(
+        self, session: AsyncSession, events: Sequence[Event]
+    ) -> None:
+        """
+        Adds `events` to the outbox within the session's transaction.
+        """
+        if not events:
+            return
+        rows = [
+            dict(
+                event_id=event.id, type=event.type, key=event.key, payload=event.payload
+            )
+            for event in events
+        ]
+        await session.execute(insert(self.outbox.table), rows)
+
+    def _filters(self, filters: Mapping[str, Any]) -> list:
+        """
+        Translates keyword filters into WHERE clauses.
+
+        `column=value` compares for equality and `column__op=value` applies
+        one of `FILTER_OPERATORS`, e.g. `created_at__gte=...`.
+        """
+        clauses = []
+        columns = self.model.__mapper__.column_attrs
+        for key, value in filters.items():
+            name, _, op = key.partition("__")
+            if name not in columns or (op or "eq") not in FILTER_OPERATORS:
+                raise ValueError(f"{self.model.__name__} cannot filter on {key}")
+            clauses.append(
+                FILTER_OPERATORS[op or "eq"](getattr(self.model, name), value)
+            )
+        return clauses
+
+    def _loader_options(
+        self,
+        load: Optional[Mapping[str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> list:
+        """
+        Translates per-call loading options into ORM loader options.
+
+        `load` maps relationship names, or "*" for every relationship not
+        named, to one of `LOADER_STRATEGIES`. Eagerly loaded relationships do
+        not cascade into their own relationships. `columns` restricts the
+        loaded columns; the `VERSION_COLUMNS` are always loaded.
+        """
+        mapper = self.model.__mapper__
+        options = []
+        for name, strategy in (load or {}).items():
+            if strategy not in LOADER_STRATEGIES:
+                raise ValueError(f"Unknown loading strategy {strategy!r}")
+            loader = LOADER_STRATEGIES[strategy]
+            if name == "*":
+                options.append(loader("*"))
+                continue
+            if name not in mapper.relationships:
+                raise ValueError(f"{self.model.__name__} has no relationship {name!r}")
+            relationship = mapper.relationships[name]
+            option = loader(relationship.class_attribute)
+            if strategy in ("selectin", "joined"):
+                option = option.options(
+                    *(
+                        noload(nested.class_attribute)
+                        for nested in relationship.mapper.relationships
+                    )
+                )
+            options.append(option)
+        if columns is not None:
+            unknown = set(columns) - set(mapper.column_attrs.keys())
+            if unknown:
+                raise ValueError(
+                    f"{self.model.__name__} has no columns {', '.join(sorted(unknown))}"
+                )
+            names = {*VERSION_COLUMNS, *columns}
+            options.append(load_only(*(getattr(self.model, name) for name in names)))
+        return options
+
+    async def get(
+        self,
+        id_: int,
+        load: Optional[Mapping[str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> BaseModel:
+        options = self._loader_options(load, columns)
+        async with self.read_session() as s:
+            result = await s.get(self.model, id_, options=options)
             entity = result
         return entity
 
-    async def list(self, **kwargs) -> list[BaseModel]:
-        query = select(self.model).filter_by(**kwargs)
-        async with self.session() as s:
+    async def list(
+        self,
+        load: Optional[Mapping[str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> list[BaseModel]:
+        query = (
+            select(self.model)
+            .where(*self._filters(kwargs))
+            .options(*self._loader_options(load, columns))
+        )
+        async with self.read_session() as s:
             result = await s.scalars(query)
             entities = result.fetchall()
         return entities
 
+    def _keyset_query(
+        self,
+        cursor: Optional[str] = None,
+        load: Optional[Mapping[str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> Select:
+        key = tuple_(
+            self.model.created_at,
+            self.model.id,
+            types=[self.model.created_at.type, self.model.id.type],
+        )
+        query = (
+            select(self.model)
+            .where(*self._filters(kwargs))
+            .options(*self._loader_options(load, columns))
+        )
+        if cursor is not None:
+            query = query.where(key > decode_cursor(cursor))
+        return query.order_by(self.model.created_at, self.model.id)
+
+    async def paginate(
+        self, limit: int, cursor: Optional[str] = None, **kwargs
+    ) -> Page:
+        """
+        Returns up to `limit` entities ordered by `(created_at, id)`, starting
+        after `cursor`.
+        """
+        query = self._keyset_query(cursor, **kwargs).limit(limit + 1)
+        async with self.read_session() as s:
+            result = await s.scalars(query)
+            entities = result.fetchall()
+        if len(entities) > limit:
+            entities = entities[:limit]
+            return Page(entities, encode_cursor(entities[-1]))
+        return Page(entities)
+
+    async def paginate_rows(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> Page:
+        """
+        Reads the page with a column-only select, in table column order: rows
+        skip the identity map, attribute instrumentation and loader options.
+        """
+        table = self.model.__table__
+        if columns is not None:
+            unknown = set(columns) - set(table.c.keys())
+            if unknown:
+                raise ValueError(
+                    f"{self.model.__name__} has no columns {', '.join(sorted(unknown))}"
+                )
+        names = {*VERSION_COLUMNS, *(columns or table.c.keys())}
+        query = (
+            self._keyset_query(cursor, **kwargs)
+            .with_only_columns(*(column for column in table.c if column.key in names))
+            .limit(limit + 1)
+        )
+        async with self.read_session() as s:
+            rows = (await s.execute(query)).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return Page(rows, encode_cursor(rows[-1]))
+        return Page(rows)
+
+    async def stream(
+        self, batch_size: int = 500, cursor: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Yields entities from a server-side cursor, buffering at most
+        `batch_size` rows at a time.
+        """
+        query = self._keyset_query(cursor, **kwargs).execution_options(
+            yield_per=batch_size
+        )
+        async with self.read_session() as s:
+            result = await s.stream_scalars(query)
+            async for entity in result:
+                yield entity
+
     async def create(self, data: Mapping[str, Any]) -> BaseModel:
-        async with self.session() as s:
+        async with self._write_session() as s:
             entity = self.model(**data)
             s.add(entity)
-            await s.commit()
+            await s.flush()
             await s.refresh(entity)
+            if self.outbox is not None:
+                await self._record_events(s, [self._event("created", entity)])
+            await s.commit()
         return entity
 
+    async def version(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include: Sequence[str] = (),
+        **kwargs,
+    ) -> Version:
+        """
+        Aggregates the keyset window, and the rows of its `include`d
+        relationships, with one small query each.
+        """
+        query = self._keyset_query(cursor, **kwargs)
+        if limit is not None:
+            query = query.limit(limit)
+        window = query.with_only_columns(
+            self.model.id, self.model.updated_at, self.model.revision
+        ).subquery()
+        queries = [
+            select(
+                func.max(window.c.updated_at),
+                func.count(),
+                func.coalesce(func.sum(window.c.id), 0),
+                func.coalesce(func.sum(window.c.revision), 0),
+            )
+        ]
+        for name in include:
+            relationship = self.model.__mapper__.relationships[name]
+            related = relationship.mapper.class_
+            local, remote = relationship.local_remote_pairs[0]
+            queries.append(
+                select(
+                    func.max(related.updated_at),
+                    func.count(related.id),
+                    func.coalesce(func.sum(related.id), 0),
+                    func.coalesce(func.sum(related.revision), 0),
+                ).where(remote.in_(select(window.c[local.key])))
+            )
+        async with self.read_session() as s:
+            parts = [tuple((await s.execute(query)).one()) for query in queries]
+        return Version(tuple(parts))
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        load: Optional[Mapping[str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> Page:
+        """
+        Matches `query` against the `search_table`, an SQLite FTS5 index whose
+        rowids are entity ids, ordered by bm25 rank. `query` uses the FTS5
+        query syntax (phrases, `prefix*`, `AND`/`OR`/`NOT`).
+        """
+        fts = self.search_table
+        if fts is None:
+            return await super().search(query, limit, cursor, **kwargs)
+        index = literal_column(fts.name)
+        snippet = func.snippet(index, -1, "<mark>", "</mark>", "…", 16)
+        statement = (
+            select(self.model, fts.c.rank, snippet)
+            .join(fts, fts.c.rowid == self.model.id)
+            .where(index.match(query), *self._filters(kwargs))
+            .options(*self._loader_options(load, columns))
+            .order_by(fts.c.rank, self.model.id)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            key = tuple_(fts.c.rank, self.model.id)
+            statement = statement.where(key > decode_search_cursor(cursor))
+        try:
+            async with self.read_session() as s:
+                rows = (await s.execute(statement)).all()
+        except OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e.orig}") from e
+        hits = [SearchHit(*row) for row in rows]
+        if len(hits) > limit:
+            hits = hits[:limit]
+            return Page(hits, encode_search_cursor(hits[-1]))
+        return Page(hits)
+
+    async def _insert_returning(
+        self, session: AsyncSession, data: Sequence[Mapping[str, Any]]
+    ) -> Sequence[BaseModel]:
+        query = insert(self.model).returning(self.model).options(noload("*"))
+        result = await session.scalars(query, data)
+        # rows of one multi-row INSERT are numbered in VALUES order
+        return sorted(result.all(), key=lambda entity: entity.id)
+
+    async def create_many(
+        self, data: Sequence[Mapping[str, Any]], chunk_size: int = 500
+    ) -> BatchResult:
+        """
+        Creates entities with multi-row `INSERT ... RETURNING` statements of
+        `chunk_size` rows, in a single transaction. A chunk that fails is
+        retried row by row so only the offending items are reported.
+        """
+        result = BatchResult()
+        async with self._write_session() as s:
+            for start in range(0, len(data), chunk_size):
+                chunk = data[start : start + chunk_size]
+                try:
+                    async with s.begin_nested():
+                        result.items.extend(await self._insert_returning(s, chunk))
+                    continue
+                except DBAPIError:
+                    pass
+                for index, item in enumerate(chunk, start):
+                    try:
+                        async with s.begin_nested():
+                            result.items.extend(await self._insert_returning(s, [item]))
+                    except DBAPIError as e:
+                        result.errors.append(BatchError(index, str(e.orig)))
+            if self.outbox is not None:
+                events = [self._event("created", entity) for entity in result.items]
+                await self._record_events(s, events)
+            await s.commit()
+        return result
+
     async def update(
-        self, id_, data: Mapping[str, Any], set_none: bool = False
-    ) -> BaseModel:
-        async with self.session() as s:
-            existing_entity = await s.get(self.model, id_)
-            for key, value in data.items():
-                if value is not None or (value is None and set_none):
-                    setattr(existing_entity, key, value)
+        self,
+        id_,
+        data: Mapping[str, Any],
+        set_none: bool = False,
+        load: Optional[Mapping[str, str]] = None,
+    ) -> Optional[BaseModel]:
+        """
+        Updates an entity with a single `UPDATE ... RETURNING` and returns it,
+        or `None` if it does not exist. Only column attributes are updated.
+        """
+        columns = self.model.__mapper__.column_attrs.keys()
+        values = {
+            key: value
+            for key, value in data.items()
+            if key in columns and (value is not None or set_none)
+        }
+        if not values:
+            return await self.get(id_, load=load)
+        query = (
+            update(self.model)
+            .where(self.model.id == id_)
+            .values(**values)
+            .returning(self.model)
+            .options(*self._loader_options(load))
+        )
+        async with self._write_session() as s:
+            result = await s.scalars(query)
+            entity = result.one_or_none()
+            if entity is not None and self.outbox is not None:
+                await self._record_events(s, [self._event("updated", entity)])
             await s.commit()
-            await s.refresh(existing_entity)
-        return existing_entity
+        return entity
 
     async def delete(self, id_: int) -> None:
-        query = delete(self.model).where(self.model.id == id_)
-        async with self.session() as s:
+        """
+        Deletes an entity with a single `DELETE ... RETURNING`, raising
+        `EntityNotFoundError` if it does not exist.
+        """
+        query = delete(self.model).where(self.model.id == id_).returning(self.model.id)
+        async with self._write_session() as s:
             result = await s.execute(query)
+            deleted = result.scalar_one_or_none()
+            if deleted is not None and self.outbox is not None:
+                event = Event(f"{self.outbox.prefix}.deleted", {"id": deleted})
+                await self._record_events(s, [event])
+            await s.commit()
+        if deleted is None:
+            raise EntityNotFoundError(f"Entity with id {id_} not deleted")
+
+    async def update_where(
+        self, data: Mapping[str, Any], **kwargs
+    ) -> Sequence[BaseModel]:
+        """
+        Sets `data` on every entity matching the filters with one
+        `UPDATE ... RETURNING` and returns the updated entities, without
+        their relationships.
+        """
+        if not kwargs:
+            raise ValueError("update_where requires at least one filter")
+        query = (
+            update(self.model)
+            .where(*self._filters(kwargs))
+            .values(**data)
+            .returning(self.model)
+            .options(noload("*"))
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write_session() as s:
+            result = await s.scalars(query)
+            entities = result.all()
+            if self.outbox is not None:
+                events = [self._event("updated", entity) for entity in entities]
+                await self._record_events(s, events)
             await s.commit()
-            try:
-                assert result.rowcount == 1
-            except AssertionError:
-                raise ValueError(f"Entity with id {id_} not deleted")
-            entity = await self.get(id_)
+        return entities
+
+    async def delete_where(self, **kwargs) -> Sequence[int]:
+        """
+        Deletes every entity matching the filters with one
+        `DELETE ... RETURNING` and returns the ids of the deleted entities.
+        """
+        if not kwargs:
+            raise ValueError("delete_where requires at least one filter")
+        query = (
+            delete(self.model)
+            .where(*self._filters(kwargs))
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write_session() as s:
+            result = await s.scalars(query)
+            deleted = result.all()
+            if self.outbox is not None:
+                events = [
+                    Event(f"{self.outbox.prefix}.deleted", {"id": id_})
+                    for id_ in deleted
+                ]
+                await self._record_events(s, events)
+            await s.commit()
+        return deleted
+
+
+class CachedRepository(BaseRepository):
+    """
+    Read-through cache in front of another repository.
+
+    Entities fetched by id are kept in a bounded in-process `LRUCache` and,
+    optionally, a shared cache consulted on local misses. Writes invalidate
+    the ids they touch. `related` maps a foreign key attribute to the cached
+    repository of the entity it points at (e.g. a message's `visitor_id`),
+    whose entry is invalidated as well, or cleared entirely when the
+    affected ids are unknown. Listings are never cached.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        cache: LRUCache,
+        namespace: str,
+        shared: Optional[BaseSharedCache] = None,
+        related: Optional[Mapping[str, "CachedRepository"]] = None,
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.namespace = namespace
+        self.shared = shared
+        self.related = related or {}
+
+    def _key(self, id_: int) -> str:
+        return f"{self.namespace}:{id_}"
+
+    async def invalidate(self, id_: int) -> None:
+        self.cache.delete(id_)
+        if self.shared is not None:
+            await self.shared.delete(self._key(id_))
+
+    async def clear(self) -> None:
+        self.cache.clear()
+        if self.shared is not None:
+            await self.shared.delete_prefix(f"{self.namespace}:")
+
+    async def _invalidate_related(self, *entities: Any) -> None:
+        for attribute, repository in self.related.items():
+            for entity in entities:
+                if isinstance(entity, Mapping):
+                    id_ = entity.get(attribute)
+                else:
+                    id_ = getattr(entity, attribute, None)
+                if id_ is not None:
+                    await repository.invalidate(id_)
+
+    async def _clear_related(self) -> None:
+        for repository in self.related.values():
+            await repository.clear()
+
+    async def get(self, id_: int, **kwargs) -> Optional[BaseModel]:
+        """
+        Returns the entity from the cache if present. Calls with loading
+        options bypass the cache, since they shape the entity differently.
+        """
+        if kwargs:
+            return await self.repository.get(id_, **kwargs)
+        entity = self.cache.get(id_)
+        if entity is not MISSING:
+            return entity
+        if self.shared is not None:
+            entity = await self.shared.get(self._key(id_))
+            if entity is not MISSING:
+                self.cache.set(id_, entity)
+                return entity
+        entity = await self.repository.get(id_)
+        if entity is not None:
+            self.cache.set(id_, entity)
+            if self.shared is not None:
+                await self.shared.set(self._key(id_), entity, ttl=self.cache.ttl)
         return entity
+
+    async def list(self, **kwargs) -> list[BaseModel]:
+        return await self.repository.list(**kwargs)
+
+    async def paginate(
+        self, limit: int, cursor: Optional[str] = None, **kwargs
+    ) -> Page:
+        return await self.repository.paginate(limit, cursor, **kwargs)
+
+    async def paginate_rows(self, *args, **kwargs) -> Page:
+        return await self.repository.paginate_rows(*args, **kwargs)
+
+    def stream(self, *args, **kwargs) -> AsyncIterator[BaseModel]:
+        return self.repository.stream(*args, **kwargs)
+
+    async def version(self, *args, **kwargs) -> Optional[Version]:
+        return await self.repository.version(*args, **kwargs)
+
+    async def search(self, *args, **kwargs) -> Page:
+        return await self.repository.search(*args, **kwargs)
+
+    async def create(self, data: Mapping[str, Any], **kwargs) -> BaseModel:
+        entity = await self.repository.create(data, **kwargs)
+        await self._invalidate_related(entity)
+        return entity
+
+    async def create_many(
+        self, data: Sequence[Mapping[str, Any]], chunk_size: int = 500
+    ) -> BatchResult:
+        result = await self.repository.create_many(data, chunk_size=chunk_size)
+        await self._invalidate_related(*result.items)
+        return result
+
+    async def update(
+        self, id_: int, data: Mapping[str, Any], **kwargs
+    ) -> Optional[BaseModel]:
+        previous = self.cache.peek(id_)
+        entity = await self.repository.update(id_, data, **kwargs)
+        await self.invalidate(id_)
+        set_none = kwargs.get("set_none", False)
+        if previous is None and any(
+            attribute in data and (data[attribute] is not None or set_none)
+            for attribute in self.related
+        ):
+            # the entity may have moved away from a related id we don't know
+            await self._clear_related()
+        await self._invalidate_related(
+            *(e for e in (previous, entity) if e is not None)
+        )
+        return entity
+
+    async def delete(self, id_: int) -> None:
+        previous = self.cache.peek(id_)
+        try:
+            await self.repository.delete(id_)
+        finally:
+            await self.invalidate(id_)
+        if previous is None:
+            await self._clear_related()
+        else:
+            await self._invalidate_related(previous)
+
+    async def update_where(
+        self, data: Mapping[str, Any], **kwargs
+    ) -> Sequence[BaseModel]:
+        entities = await self.repository.update_where(data, **kwargs)
+        await self.clear()
+        await self._clear_related()
+        return entities
+
+    async def delete_where(self, **kwargs) -> Sequence[int]:
+        deleted = await self.repository.delete_where(**kwargs)
+        await self.clear()
+        await self._clear_related()
+        return deleted
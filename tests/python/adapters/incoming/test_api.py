@@ -2,11 +2,18 @@
 Tests for the API adapter.
 """
 
+import asyncio
+import importlib
+import io
+import json
+import logging
 import os
+import sqlite3
 from fastapi import FastAPI
 import pytest
 
 from fastapi.testclient import TestClient
+from sqlalchemy import text
 
 VISITOR_NAMES = ("John", "Jane")
 VISITOR_EMAILS = ("John@cto.com", "jane@ceo.com")
@@ -31,7 +38,22 @@ def client(app: FastAPI):
     """
     Fixture for the FastAPI test client.
     """
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_app_factory_creates_new_apps(monkeypatch: pytest.MonkeyPatch):
+    factory = importlib.import_module("src.python.main")
+
+    monkeypatch.setattr(factory, "setup_logging", lambda debug: None)
+    first, second = factory.main(debug=True), factory.main(debug=False)
+
+    assert first is not second
+    assert first.state is not second.state
+    assert (first.debug, second.debug) == (True, False)
+    assert [route.path for route in first.routes] == [
+        route.path for route in second.routes
+    ]
 
 
 def test_root(client: TestClient):
@@ -40,6 +62,185 @@ def test_root(client: TestClient):
     assert response.json() == {"message": "Hello, World"}
 
 
+def test_engine_shared_across_requests(client: TestClient):
+    engine = client.app.state.engine
+    sessionmaker = client.app.state.sessionmaker
+
+    for _ in range(3):
+        response = client.get("/visitors")
+        assert response.status_code == 200
+
+    assert client.app.state.engine is engine
+    assert client.app.state.sessionmaker is sessionmaker
+    assert engine.pool.size() == 5
+
+
+def test_read_replicas(app: FastAPI, monkeypatch: pytest.MonkeyPatch, tmp_path, faker):
+    from src.python.adapters.incoming.api import READ_PRIMARY_COOKIE
+
+    replica = tmp_path / "replica.sqlite"
+    monkeypatch.setenv("DATABASE_READ_URL", f"sqlite+aiosqlite:///{replica}")
+    monkeypatch.setenv("CACHE_ENABLED", "false")
+
+    def replicate():
+        source, target = sqlite3.connect("local-test.sqlite"), sqlite3.connect(replica)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    with TestClient(app) as client:
+        first = client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()
+        assert READ_PRIMARY_COOKIE in client.cookies
+        replicate()
+        second = client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()
+
+        # Pinned to the primary after writing, the client reads its writes.
+        assert client.get(f"/visitors/{second['id']}").status_code == 200
+
+        # Without the pin, reads go to the lagging replica.
+        client.cookies.clear()
+        assert client.get(f"/visitors/{second['id']}").status_code == 404
+        response = client.get("/visitors")
+        assert [visitor["id"] for visitor in response.json()] == [first["id"]]
+        assert READ_PRIMARY_COOKIE not in response.cookies
+
+        async def replica_pragmas():
+            async with next(client.app.state.replicas)() as session:
+                result = await session.execute(text("PRAGMA query_only"))
+                return result.scalar_one()
+
+        assert client.portal.call(replica_pragmas) == 1
+
+
+@pytest.mark.parametrize("outbox", ["false", "true"])
+def test_message_events(
+    app: FastAPI, monkeypatch: pytest.MonkeyPatch, faker, outbox: str
+):
+    monkeypatch.setenv("EVENTS_SINK", "memory")
+    monkeypatch.setenv("EVENTS_LINGER", "0")
+    monkeypatch.setenv("EVENTS_OUTBOX", outbox)
+
+    with TestClient(app) as client:
+        visitor_id = client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()["id"]
+        data = {
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor_id,
+        }
+        message = client.post("/messages", json=data).json()
+        client.post("/messages:batch", json=[data, data])
+        client.patch(f"/messages/{message['id']}", json={"content": "edited"})
+        client.delete(f"/messages/{message['id']}")
+        client.delete(f"/messages/{message['id']}")  # 404, no event
+        filters = {"visitor_id": visitor_id}
+        client.patch("/messages:batch", params=filters, json={"receiver": "r"})
+        client.delete("/messages:batch", params=filters)
+        producer = client.app.state.producer
+        metrics = client.get("/metrics").text.splitlines()
+    # leaving the client flushes the producer
+
+    events = producer.sink.events
+    assert [event.type for event in events] == [
+        "message.created",
+        "message.created",
+        "message.created",
+        "message.updated",
+        "message.deleted",
+        "message.updated",
+        "message.updated",
+        "message.deleted",
+        "message.deleted",
+    ]
+    assert events[0].payload == message
+    assert events[0].key == str(visitor_id)
+    assert events[3].payload["content"] == "edited"
+    assert events[4].payload == {"id": message["id"]}
+    assert [event.payload["receiver"] for event in events[5:7]] == ["r", "r"]
+    assert events[5].key == str(visitor_id)
+    batch_ids = sorted(event.payload["id"] for event in events[5:7])
+    assert sorted(event.payload["id"] for event in events[7:]) == batch_ids
+    assert producer.stats.published == producer.stats.delivered == 9
+    if outbox == "true":
+        assert client.app.state.outbox_relay.stats.relayed == 9
+        assert "events_outbox_relay_errors_total 0" in metrics
+
+
+@pytest.mark.parametrize("outbox", ["false", "true"])
+def test_message_events_without_visitor(
+    app: FastAPI, monkeypatch: pytest.MonkeyPatch, outbox: str
+):
+    monkeypatch.setenv("EVENTS_SINK", "memory")
+    monkeypatch.setenv("EVENTS_LINGER", "0")
+    monkeypatch.setenv("EVENTS_OUTBOX", outbox)
+
+    with TestClient(app) as client:
+        # messages may lose their visitor; the API requires one on creation
+        with sqlite3.connect("local-test.sqlite") as db:
+            message_id = db.execute(
+                "INSERT INTO messages (content, sender, receiver) "
+                "VALUES ('hi', 'a', 'b') RETURNING id"
+            ).fetchone()[0]
+        response = client.patch(f"/messages/{message_id}", json={"content": "edit"})
+        assert response.json()["visitor_id"] is None
+        producer = client.app.state.producer
+
+    assert [event.key for event in producer.sink.events] == [None]
+
+
+def test_shutdown_disposes_engines_when_flushing_fails(
+    app: FastAPI, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("EVENTS_SINK", "memory")
+
+    async def fail():
+        raise RuntimeError("broker down")
+
+    with pytest.raises(RuntimeError, match="broker down"):
+        with TestClient(app) as client:
+            pool = client.app.state.engine.sync_engine.pool
+            client.app.state.producer.close = fail
+    # disposing of an engine replaces its pool
+    assert client.app.state.engine.sync_engine.pool is not pool
+
+
+@pytest.mark.asyncio
+async def test_background_task_errors_are_logged(caplog):
+    from src.python.adapters.incoming.api import start_background_task
+
+    async def fail():
+        raise RuntimeError("relay bug")
+
+    task = start_background_task(fail(), "outbox-relay")
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)  # done callbacks run on the next iteration
+
+    assert "Background task outbox-relay stopped" in caplog.text
+    assert "relay bug" in caplog.text
+
+
+def test_sqlite_pragmas_from_env(monkeypatch: pytest.MonkeyPatch):
+    from src.python.adapters.incoming.settings import get_sqlite_pragmas
+
+    assert get_sqlite_pragmas()["journal_mode"] == "WAL"
+    monkeypatch.setenv("DATABASE_SQLITE_MMAP_SIZE", "0")
+    assert get_sqlite_pragmas()["mmap_size"] == "0"
+    replica = get_sqlite_pragmas(replica=True)
+    assert "journal_mode" not in replica and "synchronous" not in replica
+    assert (replica["query_only"], replica["mmap_size"]) == ("ON", "0")
+    monkeypatch.setenv("DATABASE_SQLITE_PROFILE", "none")
+    assert get_sqlite_pragmas() == {}
+    monkeypatch.setenv("DATABASE_SQLITE_PROFILE", "turbo")
+    with pytest.raises(ValueError):
+        get_sqlite_pragmas()
+
+
 ##### Visitors #####
 
 
@@ -53,6 +254,95 @@ def test_visitors_get(client: TestClient, name: str, email: str):
     assert len(visitors) == 0
 
 
+def test_visitors_get_paginated(client: TestClient, faker):
+    created_ids = [
+        client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()["id"]
+        for _ in range(5)
+    ]
+
+    listed_ids = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/visitors", params=params)
+        assert response.status_code == 200
+        visitors = response.json()
+        assert len(visitors) <= 2
+        listed_ids.extend(visitor["id"] for visitor in visitors)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        assert 'rel="next"' in response.headers["Link"]
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert listed_ids == created_ids
+
+
+@pytest.mark.parametrize("params", ({"limit": 0}, {"limit": 1001}, {"cursor": "x"}))
+def test_visitors_get_invalid_pagination(client: TestClient, params: dict):
+    response = client.get("/visitors", params=params)
+    assert response.status_code in (400, 422)
+
+
+def test_visitors_get_include_and_fields(client: TestClient, faker):
+    from sqlalchemy import event
+
+    visitor = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()
+    message = client.post(
+        "/messages",
+        json={
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor["id"],
+        },
+    ).json()
+
+    statements = []
+    engine = client.app.state.engine.sync_engine
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    response = client.get("/visitors")
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert "messages" not in response.json()[0]
+    assert response.json()[0]["name"] == visitor["name"]
+
+    statements.clear()
+    response = client.get("/visitors", params={"include": "messages"})
+    assert response.status_code == 200
+    assert len(statements) == 2
+    assert response.json() == [{**visitor, "messages": [message]}]
+
+    statements.clear()
+    response = client.get("/visitors", params={"fields": "id,name"})
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert "email" not in statements[0]
+    assert response.json() == [{"id": visitor["id"], "name": visitor["name"]}]
+
+    event.remove(engine, "before_cursor_execute", record)
+
+    response = client.get("/messages", params={"fields": "id,content"})
+    assert response.json() == [{"id": message["id"], "content": message["content"]}]
+
+
+@pytest.mark.parametrize(
+    "params",
+    ({"fields": "id,password"}, {"include": "visitor"}, {"fields": "deleted_at"}),
+)
+def test_visitors_get_invalid_fieldset(client: TestClient, params: dict):
+    response = client.get("/visitors", params=params)
+    assert response.status_code == 400
+
+
 @pytest.mark.parametrize("name", VISITOR_NAMES)
 @pytest.mark.parametrize("email", VISITOR_EMAILS)
 def test_visitors_create(client: TestClient, name: str, email: str):
@@ -66,6 +356,26 @@ def test_visitors_create(client: TestClient, name: str, email: str):
     assert visitor["id"] > 0
 
 
+def test_visitors_create_batch(client: TestClient, faker):
+    payload = [{"name": faker.name(), "email": faker.email()} for _ in range(5)]
+
+    response = client.post("/visitors:batch", json=payload)
+    assert response.status_code == 201, response.text
+    result = response.json()
+    assert result["errors"] == []
+    assert [
+        {"name": visitor["name"], "email": visitor["email"]}
+        for visitor in result["items"]
+    ] == payload
+    for visitor in result["items"]:
+        assert client.get(f"/visitors/{visitor['id']}").json() == visitor
+
+
+def test_visitors_create_batch_too_large(client: TestClient):
+    response = client.post("/visitors:batch", json=[{}] * 10_001)
+    assert response.status_code == 422
+
+
 @pytest.mark.parametrize("name", VISITOR_NAMES)
 @pytest.mark.parametrize("email", VISITOR_EMAILS)
 def test_visitors_get_by_id(client: TestClient, name: str, email: str):
@@ -78,12 +388,56 @@ def test_visitors_get_by_id(client: TestClient, name: str, email: str):
     assert response.json() == visitor
 
 
+def test_visitors_get_by_id_cached(
+    app: FastAPI, monkeypatch: pytest.MonkeyPatch, faker
+):
+    with TestClient(app) as client:
+        # off by default: other processes would not see the invalidations
+        assert client.app.state.caches is None
+
+    monkeypatch.setenv("CACHE_ENABLED", "true")
+    with TestClient(app) as client:
+        visitor = client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()
+        cache = client.app.state.caches["visitors"]
+
+        assert client.get(f"/visitors/{visitor['id']}").json() == visitor
+        assert client.get(f"/visitors/{visitor['id']}").json() == visitor
+        assert cache.stats.hits == 1
+
+        message = client.post(
+            "/messages",
+            json={
+                "content": faker.text(),
+                "sender": faker.name(),
+                "receiver": faker.name(),
+                "visitor_id": visitor["id"],
+            },
+        ).json()
+        response = client.get(f"/visitors/{visitor['id']}")
+        assert response.json()["messages"] == [message]
+        metrics = client.get("/metrics").text.splitlines()
+
+    assert 'cache_operations_total{cache="visitors",outcome="hits"} 1' in metrics
+    assert 'cache_operations_total{cache="visitors",outcome="misses"} 2' in metrics
+    assert 'cache_entries{cache="visitors"} 1' in metrics
+
+
 def test_visitors_get_by_id_404(client: TestClient, faker):
     dummy_id = faker.random_int(1000, 2000)
     response = client.get(f"/visitors/{dummy_id}")
     assert response.status_code == 404
 
 
+def test_visitors_update_and_delete_404(client: TestClient, faker):
+    dummy_id = faker.random_int(1000, 2000)
+    response = client.put(f"/visitors/{dummy_id}", json={"name": "x", "email": "y"})
+    assert response.status_code == 404
+    response = client.delete(f"/visitors/{dummy_id}")
+    assert response.status_code == 404
+
+
 @pytest.mark.parametrize("name", VISITOR_NAMES)
 @pytest.mark.parametrize("email", VISITOR_EMAILS)
 @pytest.mark.parametrize("method", ("put", "patch"))
@@ -130,6 +484,266 @@ def test_messages_get(client: TestClient):
     assert len(messages) == 0
 
 
+def test_messages_get_paginated(client: TestClient, faker):
+    visitor_id = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()["id"]
+    created_ids = [
+        client.post(
+            "/messages",
+            json={
+                "content": faker.text(),
+                "sender": faker.name(),
+                "receiver": faker.name(),
+                "visitor_id": visitor_id,
+            },
+        ).json()["id"]
+        for _ in range(3)
+    ]
+
+    response = client.get("/messages", params={"limit": 2})
+    assert response.status_code == 200
+    assert [message["id"] for message in response.json()] == created_ids[:2]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/messages", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 200
+    assert [message["id"] for message in response.json()] == created_ids[2:]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_messages_get_filtered(client: TestClient, faker):
+    visitor_ids = [
+        client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()["id"]
+        for _ in range(2)
+    ]
+    messages = [
+        client.post(
+            "/messages",
+            json={
+                "content": faker.text(),
+                "sender": sender,
+                "receiver": receiver,
+                "visitor_id": visitor_id,
+            },
+        ).json()
+        for sender, receiver, visitor_id in (
+            ("John", "Jane", visitor_ids[0]),
+            ("Jane", "John", visitor_ids[0]),
+            ("John", "Jane", visitor_ids[1]),
+        )
+    ]
+
+    def ids(**params):
+        response = client.get("/messages", params=params)
+        assert response.status_code == 200
+        return [message["id"] for message in response.json()]
+
+    assert ids(sender="John") == [messages[0]["id"], messages[2]["id"]]
+    assert ids(receiver="John") == [messages[1]["id"]]
+    assert ids(visitor_id=visitor_ids[1]) == [messages[2]["id"]]
+    assert ids(sender="John", visitor_id=visitor_ids[0]) == [messages[0]["id"]]
+
+    created_at = messages[0]["created_at"]
+    assert ids(created_after=created_at) == [m["id"] for m in messages]
+    assert ids(created_before=created_at) == []
+    assert ids(created_after="2000-01-01T00:00:00+02:00", receiver="John") == [
+        messages[1]["id"]
+    ]
+
+    response = client.get("/messages", params={"created_after": "yesterday"})
+    assert response.status_code == 422
+
+
+def test_messages_get_matches_schema(client: TestClient, faker):
+    """
+    Listings are serialized from plain rows; the bytes must be exactly what
+    rendering each message through its schema produces.
+    """
+    from fastapi.responses import JSONResponse
+
+    visitor = client.post(
+        "/visitors", json={"name": "Zoë ✓", "email": faker.email()}
+    ).json()
+    for content in ('"quoted" \\ slash/', "héllo\n\t\u0001 ✓ 😀", faker.text()):
+        client.post(
+            "/messages",
+            json={
+                "content": content,
+                "sender": faker.name(),
+                "receiver": faker.name(),
+                "visitor_id": visitor["id"],
+            },
+        )
+
+    for path in ("/messages", "/visitors"):
+        listed = client.get(path)
+        items = [client.get(f"{path}/{item['id']}").json() for item in listed.json()]
+        if path == "/visitors":
+            items = [
+                {k: v for k, v in item.items() if k != "messages"} for item in items
+            ]
+        assert listed.content == JSONResponse(items).body
+        assert listed.headers["content-type"] == "application/json"
+
+    listed = client.get("/messages", params={"fields": "visitor_id,content,id"})
+    assert list(listed.json()[0]) == ["id", "content", "visitor_id"]
+
+
+def test_listings_without_row_reads(app: FastAPI):
+    """
+    Repositories implementing only the port, without `paginate_rows`, are
+    listed through their entities.
+    """
+    from src.python.adapters.incoming import api
+    from src.python.domain.models import Message, Visitor
+    from src.python.ports.repository import BaseRepository, Page
+
+    class PortOnlyRepository(BaseRepository):
+        def __init__(self, entities):
+            self.entities = entities
+
+        async def get(self, id_):
+            return next((e for e in self.entities if e.id == id_), None)
+
+        async def list(self, **kwargs):
+            return self.entities
+
+        async def paginate(self, limit, cursor=None, **kwargs):
+            return Page(self.entities[:limit])
+
+        async def create(self, entity):
+            raise NotImplementedError
+
+        async def create_many(self, entities, chunk_size=500):
+            raise NotImplementedError
+
+        async def update(self, id_, entity):
+            raise NotImplementedError
+
+        async def delete(self, id_):
+            raise NotImplementedError
+
+        async def update_where(self, data, **kwargs):
+            raise NotImplementedError
+
+        async def delete_where(self, **kwargs):
+            raise NotImplementedError
+
+    visitor = Visitor(name="Zoë", email="zoe@example.com", id=1)
+    message = Message(content="hi ✓", sender="a", receiver="b", visitor_id=1, id=2)
+    app.dependency_overrides = {
+        api.get_visitor_repository: lambda: PortOnlyRepository([visitor]),
+        api.get_message_repository: lambda: PortOnlyRepository([message]),
+    }
+    try:
+        with TestClient(app) as client:
+            visitors = client.get("/visitors")
+            messages = client.get("/messages", params={"fields": "id,content"})
+    finally:
+        app.dependency_overrides = {}
+
+    assert visitors.status_code == 200
+    assert [(v["id"], v["name"]) for v in visitors.json()] == [(1, "Zoë")]
+    assert "messages" not in visitors.json()[0]
+    assert messages.status_code == 200
+    assert messages.json() == [{"id": 2, "content": "hi ✓"}]
+
+
+def test_messages_search(client: TestClient, faker):
+    visitor_id = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()["id"]
+    for content in ("lunch at noon?", "running late for lunch", "see you"):
+        client.post(
+            "/messages",
+            json={
+                "content": content,
+                "sender": faker.name(),
+                "receiver": faker.name(),
+                "visitor_id": visitor_id,
+            },
+        )
+
+    response = client.get("/messages/search", params={"q": "lunch", "limit": 1})
+    assert response.status_code == 200
+    [hit] = response.json()
+    assert "<mark>lunch</mark>" in hit["snippet"]
+    assert isinstance(hit["rank"], float)
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(
+        "/messages/search",
+        params={"q": "lunch", "limit": 1, "cursor": cursor, "fields": "content"},
+    )
+    [next_hit] = response.json()
+    assert next_hit["content"] != hit["content"]
+    assert set(next_hit) == {"content", "rank", "snippet"}
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/messages/search", params={"q": "run*"})
+    assert [hit["content"] for hit in response.json()] == ["running late for lunch"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"q": ""}, {"q": '"lunch'}, {"q": "lunch", "cursor": "not-a-cursor"}],
+)
+def test_messages_search_invalid(client: TestClient, params: dict):
+    response = client.get("/messages/search", params=params)
+    assert response.status_code in (400, 422)
+
+
+def test_messages_get_streamed(client: TestClient, faker):
+    visitor_id = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()["id"]
+    for _ in range(3):
+        client.post(
+            "/messages",
+            json={
+                "content": faker.text(),
+                "sender": faker.name(),
+                "receiver": faker.name(),
+                "visitor_id": visitor_id,
+            },
+        )
+    messages = client.get("/messages").json()
+
+    response = client.get("/messages", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == messages
+
+    response = client.get("/messages", params={"stream": True, "limit": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json() == messages
+
+
+def test_visitors_get_streamed(client: TestClient, faker):
+    response = client.get("/visitors", params={"stream": True})
+    assert response.status_code == 200
+    assert response.json() == []
+
+    name = faker.name()
+    client.post("/visitors", json={"name": name, "email": faker.email()})
+    client.post("/visitors", json={"name": faker.name(), "email": faker.email()})
+
+    response = client.get(
+        "/visitors",
+        params={"name": name},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    visitors = [json.loads(line) for line in response.text.splitlines()]
+    assert visitors == client.get("/visitors", params={"name": name}).json()
+    assert len(visitors) == 1
+
+
 def test_messages_create(client: TestClient, faker):
     content = faker.text()
     sender = faker.name()
@@ -161,6 +775,91 @@ def test_messages_create(client: TestClient, faker):
     assert message["id"] > 0
 
 
+def test_messages_create_batch(client: TestClient, faker):
+    visitor_id = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()["id"]
+    payload = [
+        {
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor_id,
+        }
+        for _ in range(4)
+    ]
+    payload.insert(2, {"content": faker.text()})
+
+    response = client.post("/messages:batch", json=payload)
+    assert response.status_code == 207, response.text
+    result = response.json()
+    assert [error["index"] for error in result["errors"]] == [2]
+    assert {detail["loc"][0] for detail in result["errors"][0]["detail"]} == {
+        "sender",
+        "receiver",
+        "visitor_id",
+    }
+    assert [message["content"] for message in result["items"]] == [
+        item["content"] for index, item in enumerate(payload) if index != 2
+    ]
+    assert client.get("/messages").json() == result["items"]
+
+
+def test_messages_update_and_delete_batch(client: TestClient, faker):
+    visitor_ids = [
+        client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()["id"]
+        for _ in range(2)
+    ]
+    payload = [
+        {
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor_id,
+        }
+        for visitor_id in (visitor_ids[0], visitor_ids[0], visitor_ids[1])
+    ]
+    assert client.post("/messages:batch", json=payload).status_code == 201
+
+    response = client.patch(
+        "/messages:batch",
+        params={"visitor_id": visitor_ids[0]},
+        json={"receiver": "reassigned"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"count": 2}
+    receivers = [message["receiver"] for message in client.get("/messages").json()]
+    assert receivers == ["reassigned", "reassigned", payload[2]["receiver"]]
+
+    response = client.delete("/messages:batch", params={"receiver": "reassigned"})
+    assert response.status_code == 200
+    assert response.json() == {"count": 2}
+    assert len(client.get("/messages").json()) == 1
+
+    assert client.delete("/messages:batch").status_code == 400
+    assert client.patch("/messages:batch", json={"content": "x"}).status_code == 400
+    response = client.patch("/messages:batch", params={"sender": "x"}, json={})
+    assert response.status_code == 400
+
+
+def test_visitors_update_and_delete_batch(client: TestClient, faker):
+    name = faker.name()
+    payload = [{"name": name, "email": faker.email()} for _ in range(3)]
+    assert client.post("/visitors:batch", json=payload).status_code == 201
+
+    response = client.patch(
+        "/visitors:batch", params={"name": name}, json={"email": "same@example.com"}
+    )
+    assert response.json() == {"count": 3}
+    assert {v["email"] for v in client.get("/visitors").json()} == {"same@example.com"}
+
+    response = client.delete("/visitors:batch", params={"email": "same@example.com"})
+    assert response.json() == {"count": 3}
+    assert client.get("/visitors").json() == []
+
+
 def test_messages_get_by_id(client: TestClient, faker):
     content = faker.text()
     sender = faker.name()
@@ -198,6 +897,14 @@ def test_messages_get_by_id_404(client: TestClient, faker):
     assert response.status_code == 404
 
 
+def test_messages_update_and_delete_404(client: TestClient, faker):
+    dummy_id = faker.random_int(1000, 2000)
+    response = client.put(f"/messages/{dummy_id}", json={"content": "x"})
+    assert response.status_code == 404
+    response = client.delete(f"/messages/{dummy_id}")
+    assert response.status_code == 404
+
+
 def test_messages_update(client: TestClient, faker):
     content = faker.text()
     sender = faker.name()
@@ -271,3 +978,251 @@ def test_messages_delete(client: TestClient, faker):
 
     response = client.delete(f"/visitors/{visitor_id}")
     assert response.status_code == 204
+
+
+def test_visitors_get_by_id_conditional(client: TestClient, faker):
+    visitor = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()
+
+    response = client.get(f"/visitors/{visitor['id']}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert "Last-Modified" in response.headers
+
+    response = client.get(f"/visitors/{visitor['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    client.post(
+        "/messages",
+        json={
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor["id"],
+        },
+    )
+    response = client.get(f"/visitors/{visitor['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()["messages"]) == 1
+
+    response = client.get("/visitors/0", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+
+def test_messages_get_by_id_conditional(client: TestClient, faker):
+    visitor = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()
+    message = client.post(
+        "/messages",
+        json={
+            "content": faker.text(),
+            "sender": faker.name(),
+            "receiver": faker.name(),
+            "visitor_id": visitor["id"],
+        },
+    ).json()
+
+    response = client.get(f"/messages/{message['id']}")
+    last_modified = response.headers["Last-Modified"]
+    assert last_modified.endswith("GMT")
+
+    response = client.get(
+        f"/messages/{message['id']}", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        f"/messages/{message['id']}",
+        headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"},
+    )
+    assert response.status_code == 200
+
+
+def test_messages_conditional_same_second_edits(client: TestClient, faker):
+    visitor = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()
+    data = {
+        "content": "one",
+        "sender": faker.name(),
+        "receiver": faker.name(),
+        "visitor_id": visitor["id"],
+    }
+    message = client.post("/messages", json=data).json()
+
+    # updated_at has second precision, so these edits usually share it
+    etags = {client.get(f"/messages/{message['id']}").headers["ETag"]}
+    list_etags = {client.get("/messages").headers["ETag"]}
+    for content in ("two", "three"):
+        etag = client.get(f"/messages/{message['id']}").headers["ETag"]
+        client.put(f"/messages/{message['id']}", json={**data, "content": content})
+
+        response = client.get(
+            f"/messages/{message['id']}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["content"] == content
+        etags.add(response.headers["ETag"])
+        list_etags.add(client.get("/messages").headers["ETag"])
+
+    assert len(etags) == len(list_etags) == 3
+
+
+def test_messages_conditional_after_delete_and_create(client: TestClient, faker):
+    visitor = client.post(
+        "/visitors", json={"name": faker.name(), "email": faker.email()}
+    ).json()
+    data = {
+        "content": "first",
+        "sender": faker.name(),
+        "receiver": faker.name(),
+        "visitor_id": visitor["id"],
+    }
+    message = client.post("/messages", json=data).json()
+    etag = client.get(f"/messages/{message['id']}").headers["ETag"]
+    list_etag = client.get("/messages").headers["ETag"]
+
+    # within the same second, so only the id tells the messages apart
+    client.delete(f"/messages/{message['id']}")
+    created = client.post("/messages", json={**data, "content": "second"}).json()
+
+    assert created["id"] != message["id"]
+    response = client.get(f"/messages/{message['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+    response = client.get("/messages", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert [item["content"] for item in response.json()] == ["second"]
+
+
+def test_visitors_list_conditional(client: TestClient, faker):
+    ids = [
+        client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()["id"]
+        for _ in range(3)
+    ]
+
+    response = client.get("/visitors?limit=2")
+    etag = response.headers["ETag"]
+
+    response = client.get("/visitors?limit=2", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # A wider window has a different tag.
+    response = client.get("/visitors?limit=3", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    client.delete(f"/visitors/{ids[0]}")
+    response = client.get("/visitors?limit=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_request_logging(app: FastAPI):
+    from src.python.adapters.outgoing.logging import configure_logging, stop_logging
+
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    stream = io.StringIO()
+    try:
+        with TestClient(app) as client:
+            configure_logging(stream=stream)
+            response = client.get("/messages/1", headers={"X-Request-ID": "req-1"})
+            generated = client.get("/messages").headers["X-Request-ID"]
+            stop_logging()
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    assert response.headers["X-Request-ID"] == "req-1"
+    assert len(generated) == 32
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    access = [entry for entry in entries if entry["logger"].endswith(".access")]
+    assert [entry["request_id"] for entry in access] == ["req-1", generated]
+    assert access[0]["route"] == "/messages/{message_id}"
+    assert access[0]["status"] == 404
+    assert access[0]["db_queries"] >= 1
+    assert access[0]["db_time_ms"] > 0
+    assert access[1]["message"] == '"GET /messages" 200'
+
+
+def test_metrics(app: FastAPI, monkeypatch: pytest.MonkeyPatch):
+    with TestClient(app) as client:
+        client.get("/messages")
+        client.get("/messages/0")
+        client.get("/not-a-route")
+        metrics = client.get("/metrics")
+
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = metrics.text.splitlines()
+    assert 'http_requests_total{method="GET",route="/messages",status="200"} 1' in lines
+    assert (
+        'http_requests_total{method="GET",route="/messages/{message_id}",status="404"} 1'
+        in lines
+    )
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
+    assert "http_requests_in_flight 1" in lines  # the scrape itself
+    assert any(
+        line.startswith('db_statement_duration_seconds_count{database="primary"')
+        for line in lines
+    )
+    assert any(line.startswith("db_pool_checkout_wait_seconds_count") for line in lines)
+
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    with TestClient(app) as client:
+        assert client.get("/metrics").status_code == 404
+
+
+def test_profiling(app: FastAPI, monkeypatch: pytest.MonkeyPatch):
+    with TestClient(app) as client:
+        response = client.get("/visitors", headers={"X-Profile": "1"})
+        assert "X-Profile-Id" not in response.headers
+        assert client.get("/debug/profiles").status_code == 404
+
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    with TestClient(app) as client:
+        assert "X-Profile-Id" not in client.get("/visitors").headers
+        profile_id = client.get("/visitors", headers={"X-Profile": "1"}).headers[
+            "X-Profile-Id"
+        ]
+        profiles = client.get("/debug/profiles").json()
+        collapsed = client.get(f"/debug/profiles/{profile_id}")
+        assert client.get("/debug/profiles/unknown").status_code == 404
+
+    assert [profile["id"] for profile in profiles] == [profile_id]
+    assert profiles[0]["route"] == "/visitors"
+    assert collapsed.headers["content-type"].startswith("text/plain")
+
+
+def test_profiling_attributes_orm_time(
+    app: FastAPI, monkeypatch: pytest.MonkeyPatch, faker
+):
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    monkeypatch.setenv("CACHE_ENABLED", "false")
+    orm_stacks = []
+    with TestClient(app) as client:
+        visitor = client.post(
+            "/visitors", json={"name": faker.name(), "email": faker.email()}
+        ).json()
+        # the ORM runs in SQLAlchemy's greenlets; sample until it shows up
+        for _ in range(20):
+            profile_id = client.get(
+                f"/visitors/{visitor['id']}", headers={"X-Profile": "1"}
+            ).headers["X-Profile-Id"]
+            collapsed = client.get(f"/debug/profiles/{profile_id}").text
+            orm_stacks += [
+                line for line in collapsed.splitlines() if "(session.py:" in line
+            ]
+            if orm_stacks:
+                break
+
+    assert orm_stacks
+    for stack in orm_stacks:
+        assert "get_visitor_by_id (api.py:" in stack
+        assert "SQLAlchemyRepository.get (repository.py:" in stack
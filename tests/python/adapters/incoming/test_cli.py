@@ -0,0 +1,79 @@
+"""
+Tests for the CLI adapter.
+"""
+
+import pytest
+
+from src.python.__main__ import parser
+
+
+@pytest.fixture
+def database_url(database_url, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    return database_url
+
+
+def test_db_upgrade(database_url, capsys):
+    from src.python.adapters.outgoing import migrations
+
+    args = parser.parse_args(["db", "current"])
+    args.handler(args)
+    assert "version 0" in capsys.readouterr().out
+
+    args = parser.parse_args(["db", "upgrade"])
+    args.handler(args)
+    assert f"version {migrations.head()}" in capsys.readouterr().out
+
+    args = parser.parse_args(["db", "--database-url", database_url, "current"])
+    args.handler(args)
+    assert f"version {migrations.head()}" in capsys.readouterr().out
+
+
+def test_serve_without_command():
+    args = parser.parse_args(["--port", "9000"])
+    assert args.command is None
+    assert args.port == 9000
+
+
+def test_consume(database_url, tmp_path, capsys):
+    import json
+
+    source = tmp_path / "messages.ndjson"
+    message = dict(content="hi", sender="a", receiver="b", visitor_id=1)
+    source.write_text(json.dumps(message) + "\n" + json.dumps({"content": 1}) + "\n")
+
+    args = parser.parse_args(["consume", str(source), "--batch-size", "10"])
+    args.handler(args)
+    assert "consumed=2 inserted=1 failed=1" in capsys.readouterr().out
+
+
+def test_loadtest(database_url, capsys):
+    args = parser.parse_args(
+        ["loadtest", "--requests", "30", "--clients", "3", "--read-ratio", "0.5"]
+    )
+    args.handler(args)
+    out = capsys.readouterr().out
+    assert "requests=30" in out and "errors=0 (0.0%)" in out
+    assert "POST /messages: n=" in out
+
+
+def test_server_options(monkeypatch, caplog):
+    from src.python.__main__ import server_options
+
+    args = parser.parse_args(
+        ["--workers", "4", "--loop", "uvloop", "--limit-concurrency", "100"]
+    )
+    assert args.workers == 4
+
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    options = server_options(args)
+    assert options["loop"] == "asyncio"
+    assert options["http"] == "h11"
+    assert options["limit_concurrency"] == 100
+    assert options["timeout_keep_alive"] == 75
+    assert "uvloop is not installed, using asyncio" in caplog.text
+
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: object())
+    options = server_options(parser.parse_args(["--http", "h11"]))
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "h11"
@@ -0,0 +1,128 @@
+"""
+Tests the batch consumer adapter.
+"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from src.python.adapters.incoming.consumer import BatchConsumer, NDJSONFileSource
+from src.python.adapters.outgoing.relational_database import MessageModel
+from src.python.ports.consumer import InMemorySource
+from src.python.ports.repository import SQLAlchemyRepository
+
+
+@pytest.fixture
+def repository(sessionmaker):
+    return SQLAlchemyRepository(sessionmaker, MessageModel)
+
+
+async def _count(repository) -> int:
+    async with repository.session() as s:
+        return await s.scalar(select(func.count()).select_from(MessageModel))
+
+
+@pytest.mark.asyncio
+async def test_consumer_in_memory_source(repository, message_data):
+    source = InMemorySource()
+    for i in range(25):
+        await source.put(message_data(i))
+    await source.put({"content": "no sender"})
+    await source.end()
+
+    consumer = BatchConsumer(source, repository, batch_size=10, concurrency=2)
+    stats = await consumer.run()
+
+    assert (stats.consumed, stats.inserted, stats.failed) == (26, 25, 1)
+    assert stats.batches == 3
+    assert source.committed == 26
+    assert await _count(repository) == 25
+
+
+@pytest.mark.asyncio
+async def test_consumer_ndjson_resumes_from_checkpoint(
+    repository, message_data, tmp_path
+):
+    path, checkpoint = tmp_path / "messages.ndjson", tmp_path / "offset.json"
+    lines = [json.dumps(message_data(i)) for i in range(5)] + ["{not json"]
+    path.write_text("\n".join(lines) + "\n")
+
+    stats = await BatchConsumer(
+        NDJSONFileSource(path, checkpoint), repository, batch_size=2
+    ).run()
+    assert (stats.inserted, stats.failed, stats.lag) == (5, 1, 0)
+    assert json.loads(checkpoint.read_text()) == {"offset": path.stat().st_size}
+
+    with path.open("a") as f:
+        f.write(json.dumps(message_data(5)) + "\n")
+    stats = await BatchConsumer(NDJSONFileSource(path, checkpoint), repository).run()
+    assert (stats.consumed, stats.inserted) == (1, 1)
+    assert await _count(repository) == 6
+
+
+@pytest.mark.asyncio
+async def test_ndjson_source_follow_holds_partial_lines(message_data, tmp_path):
+    path = tmp_path / "messages.ndjson"
+    path.write_text(json.dumps(message_data(0)) + '\n{"content"')
+    source = NDJSONFileSource(path, follow=True)
+    await source.start()
+
+    assert [r.data for r in await source.read(10, 0)] == [message_data(0)]
+    assert await source.read(10, 0) == []
+    with path.open("a") as f:
+        f.write(': "late"}\n')
+    assert [r.data for r in await source.read(10, 0)] == [{"content": "late"}]
+    await source.close()
+
+
+class FirstBatchLastRepository:
+    """
+    Holds the batch starting with `first` until the `others` batches are
+    stored, so batches complete out of order.
+    """
+
+    def __init__(self, repository, first: dict, others: int):
+        self.repository = repository
+        self.first = first
+        self.others = others
+        self.released = asyncio.Event()
+
+    async def create_many(self, data, chunk_size=500):
+        first = data[0] == self.first
+        if first:
+            await self.released.wait()
+        result = await self.repository.create_many(data, chunk_size=chunk_size)
+        if not first:
+            self.others -= 1
+            if self.others == 0:
+                self.released.set()
+        return result
+
+
+@pytest.mark.asyncio
+async def test_consumer_commits_only_contiguous_batches(repository, message_data):
+    class RecordingSource(InMemorySource):
+        def __init__(self):
+            super().__init__()
+            self.commits = []
+
+        async def commit(self, position):
+            self.commits.append(position)
+            await super().commit(position)
+
+    source = RecordingSource()
+    for i in range(6):
+        await source.put(message_data(i))
+    await source.end()
+
+    consumer = BatchConsumer(
+        source,
+        FirstBatchLastRepository(repository, message_data(0), others=2),
+        batch_size=2,
+        concurrency=3,
+    )
+    await asyncio.wait_for(consumer.run(), timeout=10)
+    # the later batches finished first but were not acknowledged before it
+    assert source.commits == [6]
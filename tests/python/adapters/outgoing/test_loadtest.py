@@ -0,0 +1,112 @@
+"""
+Tests the load testing adapter.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.python.adapters.outgoing.loadtest import (
+    LoadGenerator,
+    LoadRequest,
+    LoadStats,
+    MixedWorkload,
+    RequestLog,
+    format_report,
+)
+
+
+def slow_app(delay: float):
+    async def app(scope, receive, send):
+        await asyncio.sleep(delay)
+        status = 404 if scope["path"].startswith("/missing") else 200
+        await send(dict(type="http.response.start", status=status, headers=[]))
+        await send(dict(type="http.response.body", body=b"[]"))
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+def test_request_log(tmp_path):
+    log = tmp_path / "access.ndjson"
+    entries = [
+        dict(time="2024-01-01T00:00:00.000+00:00", method="GET", path="/messages"),
+        dict(message="not a request"),
+        dict(
+            time="2024-01-01T00:00:01.500+00:00",
+            method="get",
+            path="/messages/1",
+            route="/messages/{message_id}",
+        ),
+        dict(method="POST", path="/messages", body={"content": "hi"}),
+    ]
+    log.write_text("\n".join(json.dumps(e) for e in entries) + "\nnot json\n")
+
+    assert list(RequestLog(log)) == [
+        LoadRequest("GET", "/messages", "GET /messages", None, 0.0),
+        LoadRequest("GET", "/messages/1", "GET /messages/{message_id}", None, 1.5),
+        LoadRequest("POST", "/messages", "POST /messages", {"content": "hi"}),
+    ]
+
+
+def test_mixed_workload():
+    workload = MixedWorkload(read_ratio=0.5, seed=1)
+    workload.visitor_id, workload.message_ids = 7, [1, 2]
+    requests = [request for request, _ in zip(workload, range(1000))]
+
+    writes = [request for request in requests if request.method == "POST"]
+    assert 400 < len(writes) < 600
+    assert all(request.body["visitor_id"] == 7 for request in writes)
+    assert {request.name for request in requests} == {
+        "POST /messages",
+        "GET /messages",
+        "GET /messages/{message_id}",
+    }
+
+
+def write_log(path, paths):
+    path.write_text(
+        "".join(json.dumps(dict(method="GET", path=p)) + "\n" for p in paths)
+    )
+    return RequestLog(path)
+
+
+@pytest.mark.asyncio
+async def test_closed_loop(tmp_path):
+    workload = write_log(tmp_path / "requests.ndjson", ["/messages"] * 50)
+    async with slow_app(0.01) as client:
+        generator = LoadGenerator(client, clients=4, requests=40)
+        stats = await generator.run(workload)
+
+    assert stats.sent == 40
+    assert stats.errors == 0
+    # each client waits for its response before sending the next request
+    assert max(stats.all_latencies()) < 0.1
+    assert stats.elapsed >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_open_loop_includes_queueing_delay(tmp_path):
+    workload = write_log(
+        tmp_path / "requests.ndjson", ["/messages"] * 18 + ["/missing"] * 2
+    )
+    async with slow_app(0.02) as client:
+        # one client, but requests arrive about every 2ms and take 20ms each
+        generator = LoadGenerator(client, clients=1, rate=500, seed=1)
+        stats = await generator.run(workload)
+
+    assert stats.sent == 20
+    assert stats.errors == 2
+    assert stats.statuses["GET /missing"][404] == 2
+    # later requests waited for the earlier ones
+    assert max(stats.all_latencies()) > 0.2
+    report = format_report(stats)
+    assert "requests=20" in report and "errors=2 (10.0%)" in report
+    assert "GET /missing: n=2" in report
+
+
+def test_format_report_without_requests():
+    assert format_report(LoadStats()).startswith("requests=0")
@@ -0,0 +1,76 @@
+"""
+Tests the JSON logging adapter.
+"""
+
+import io
+import json
+import logging
+
+import pytest
+
+from src.python.adapters.outgoing.logging import (
+    SamplingFilter,
+    configure_logging,
+    log_context,
+    stop_logging,
+)
+
+
+@pytest.fixture
+def log_stream():
+    """
+    Configures JSON logging into a buffer, restoring pytest's handlers after.
+    """
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    stream = io.StringIO()
+    configure_logging(logging.DEBUG, stream=stream)
+    yield stream
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _entries(stream: io.StringIO) -> list[dict]:
+    stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_logs_json_with_context(log_stream):
+    logger = logging.getLogger("test")
+    token = log_context.set({"request_id": "abc", "route": "/messages"})
+    logger.info("created %d messages", 3, extra={"count": 3})
+    log_context.reset(token)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+
+    created, failed = _entries(log_stream)
+    assert created["message"] == "created 3 messages"
+    assert created["level"] == "INFO"
+    assert created["logger"] == "test"
+    assert created["count"] == 3
+    assert created["request_id"] == "abc"
+    assert created["route"] == "/messages"
+    assert "request_id" not in failed
+    assert "ValueError: boom" in failed["exc_info"]
+
+
+def test_sampling_filter():
+    def record(level, request_id=None):
+        record = logging.LogRecord("test", level, "", 0, "message", None, None)
+        if request_id is not None:
+            record.request_id = request_id
+        return record
+
+    never, always = SamplingFilter(0.0), SamplingFilter(1.0)
+    assert not never.filter(record(logging.DEBUG))
+    assert never.filter(record(logging.INFO))
+    assert always.filter(record(logging.DEBUG))
+
+    half = SamplingFilter(0.5)
+    kept = [half.filter(record(logging.DEBUG, str(i))) for i in range(1000)]
+    assert 400 < kept.count(True) < 600
+    # a request's records are kept or dropped together
+    assert kept == [half.filter(record(logging.DEBUG, str(i))) for i in range(1000)]
@@ -0,0 +1,72 @@
+"""
+Tests the metrics adapter.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from src.python.adapters.outgoing.metrics import MetricsRegistry, instrument_engine
+from src.python.adapters.outgoing.relational_database import create_database_engine
+
+
+def test_render_counter_and_gauge():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    requests.inc("/a")
+    requests.inc("/a")
+    requests.inc('/"b"')
+    registry.gauge("in_flight", "In flight.").set(2.5)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/a"} 2\n'
+        'requests_total{route="/\\"b\\""} 1\n'
+        "# HELP in_flight In flight.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 2.5\n"
+    )
+    with pytest.raises(ValueError):
+        registry.counter("requests_total", "Again.")
+
+
+def test_render_histogram():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("op",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "get")
+
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'latency_seconds_bucket{op="get",le="0.1"} 2',
+        'latency_seconds_bucket{op="get",le="1.0"} 3',
+        'latency_seconds_bucket{op="get",le="+Inf"} 4',
+        'latency_seconds_sum{op="get"} 3.65',
+        'latency_seconds_count{op="get"} 4',
+    ]
+
+
+def test_collectors_run_on_render():
+    registry = MetricsRegistry()
+    size = registry.gauge("size", "Size.")
+    registry.collectors.append(lambda: size.set(7))
+    assert "size 7" in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_instrument_engine(tmp_path):
+    engine = await create_database_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'metrics.sqlite'}", pool_size=1
+    )
+    registry = MetricsRegistry()
+    instrument_engine(engine, registry)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await conn.execute(text("SELECT 2"))
+    await engine.dispose()
+
+    statements = registry.metrics["db_statement_duration_seconds"]
+    assert statements.series[("primary", "SELECT")][0][-1] == 0
+    assert sum(statements.series[("primary", "SELECT")][0]) == 2
+    checkout_wait = registry.metrics["db_pool_checkout_wait_seconds"]
+    assert sum(checkout_wait.series[("primary",)][0]) == 1
@@ -0,0 +1,149 @@
+"""
+Tests the schema migrations adapter.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import event, inspect
+
+from src.python.adapters.outgoing import migrations
+from src.python.adapters.outgoing.relational_database import create_database_engine
+
+
+async def _table_names(engine):
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda c: inspect(c).get_table_names())
+
+
+@pytest.mark.asyncio
+async def test_upgrade_fresh_database(database_url):
+    engine = await create_database_engine(database_url)
+    assert await migrations.current_version(engine) == 0
+    assert await _table_names(engine) == []
+
+    version = await migrations.upgrade(engine)
+
+    assert version == migrations.head()
+    assert await migrations.current_version(engine) == migrations.head()
+    assert {"visitors", "messages", "schema_version"} <= set(await _table_names(engine))
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_is_idempotent(database_url):
+    engine = await create_database_engine(database_url)
+    await migrations.upgrade(engine)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    assert await migrations.upgrade(engine) == migrations.head()
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    assert not any(
+        s.lstrip().upper().startswith(("CREATE", "ALTER", "BEGIN IMMEDIATE"))
+        for s in statements
+    )
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_concurrent_migrators(database_url):
+    engines = [await create_database_engine(database_url) for _ in range(3)]
+
+    versions = await asyncio.gather(*(migrations.upgrade(e) for e in engines))
+
+    assert versions == [migrations.head()] * 3
+    async with engines[0].connect() as conn:
+        rows = (await conn.execute(migrations.schema_version.select())).all()
+    assert [row.version for row in rows] == [m.version for m in migrations.MIGRATIONS]
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_to_target(database_url):
+    engine = await create_database_engine(database_url)
+    assert await migrations.upgrade(engine, target=0) == 0
+    assert await migrations.upgrade(engine, target=1) == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_adds_revision(database_url):
+    engine = await create_database_engine(database_url)
+    await migrations.upgrade(engine, target=5)
+    # the initial schema now has the column; recreate one from before it
+    async with engine.begin() as conn:
+        for table in ("visitors", "messages"):
+            await conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN revision")
+        await conn.exec_driver_sql(
+            "INSERT INTO visitors (name, email) VALUES ('John', 'john@cto.com')"
+        )
+
+    assert await migrations.upgrade(engine) == migrations.head()
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql("SELECT revision FROM visitors")
+        assert result.scalars().all() == [1]
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_stops_id_reuse(database_url):
+    engine = await create_database_engine(database_url)
+    await migrations.upgrade(engine, target=6)
+    # recreate the tables of the initial schema, which had no AUTOINCREMENT
+    async with engine.begin() as conn:
+        for table in ("messages", "visitors"):
+            await conn.exec_driver_sql(f"DROP TABLE {table}")
+        await conn.exec_driver_sql(
+            """CREATE TABLE visitors (
+                name VARCHAR NOT NULL, email VARCHAR NOT NULL,
+                id INTEGER NOT NULL PRIMARY KEY,
+                created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+                updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+                revision INTEGER DEFAULT 1 NOT NULL
+            )"""
+        )
+        await conn.exec_driver_sql(
+            """CREATE TABLE messages (
+                content VARCHAR NOT NULL, sender VARCHAR NOT NULL,
+                receiver VARCHAR NOT NULL,
+                visitor_id INTEGER REFERENCES visitors (id),
+                id INTEGER NOT NULL PRIMARY KEY,
+                created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+                updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+                revision INTEGER DEFAULT 1 NOT NULL
+            )"""
+        )
+        await conn.exec_driver_sql(
+            "INSERT INTO visitors (name, email) VALUES ('John', 'john@cto.com')"
+        )
+        for content in ("hello", "world"):
+            await conn.exec_driver_sql(
+                "INSERT INTO messages (content, sender, receiver, visitor_id) "
+                f"VALUES ('{content}', 'John', 'Jane', 1)"
+            )
+
+    assert await migrations.upgrade(engine) == migrations.head()
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DELETE FROM messages WHERE id = 2")
+        await conn.exec_driver_sql(
+            "INSERT INTO messages (content, sender, receiver) "
+            "VALUES ('again', 'John', 'Jane')"
+        )
+        result = await conn.exec_driver_sql("SELECT id, content FROM messages")
+        assert result.all() == [(1, "hello"), (3, "again")]
+        result = await conn.exec_driver_sql(
+            "SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'again'"
+        )
+        assert result.scalars().all() == [3]
+        indexes = await conn.run_sync(
+            lambda c: {index["name"] for index in inspect(c).get_indexes("messages")}
+        )
+        assert "ix_messages_created_at_id" in indexes
+    await engine.dispose()
@@ -0,0 +1,162 @@
+"""
+Tests the outbox written by the repository and its relay.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from src.python.adapters.outgoing.outbox import OutboxRelay
+from src.python.adapters.outgoing.producer import BatchingProducer
+from src.python.adapters.outgoing.relational_database import MessageModel, outbox
+from src.python.ports.producer import InMemoryEventSink
+from src.python.ports.repository import Outbox, SQLAlchemyRepository
+
+
+class RejectingProducer(BatchingProducer):
+    def __init__(self, sink, accept: int):
+        super().__init__(sink, linger=0)
+        self.accept = accept
+
+    async def publish(self, event):
+        if self.accept == 0:
+            return False
+        self.accept -= 1
+        return await super().publish(event)
+
+
+class FailingSink(InMemoryEventSink):
+    async def write(self, events):
+        raise ConnectionError("broker unavailable")
+
+
+@pytest.fixture
+def repository(sessionmaker):
+    return SQLAlchemyRepository(
+        sessionmaker, MessageModel, outbox=Outbox(outbox, "message", key="sender")
+    )
+
+
+async def _rows(sessionmaker) -> list:
+    async with sessionmaker() as s:
+        return (await s.execute(select(outbox).order_by(outbox.c.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_repository_records_events(repository, sessionmaker, message_data):
+    message = await repository.create(message_data(0))
+    await repository.create_many([message_data(1), message_data(2)])
+    await repository.update(message.id, {"content": "edited"})
+    await repository.delete(message.id)
+    with pytest.raises(IntegrityError):
+        await repository.create(dict(content=None, sender="s", receiver="r"))
+    await repository.update_where({"receiver": "q"}, sender="s1")
+    await repository.update_where({"receiver": "q"}, sender="nobody")
+    deleted = await repository.delete_where(receiver="q")
+
+    rows = await _rows(sessionmaker)
+    assert [row.type for row in rows] == [
+        "message.created",
+        "message.created",
+        "message.created",
+        "message.updated",
+        "message.deleted",
+        "message.updated",
+        "message.deleted",
+    ]
+    assert rows[0].key == "s0"
+    assert rows[0].payload["id"] == message.id
+    assert rows[0].payload["created_at"] == message.created_at.isoformat()
+    assert rows[3].payload["content"] == "edited"
+    assert rows[4].payload == {"id": message.id}
+    assert rows[5].key == "s1"
+    assert rows[5].payload["receiver"] == "q"
+    assert rows[6].payload == {"id": deleted[0]}
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_and_deletes(repository, sessionmaker, message_data):
+    await repository.create_many([message_data(i) for i in range(5)])
+    sink = InMemoryEventSink()
+    producer = BatchingProducer(sink, linger=0)
+    relay = OutboxRelay(sessionmaker, outbox, producer, batch_size=2)
+
+    await relay.drain()
+    await producer.close()
+
+    contents = [event.payload["content"] for event in sink.events]
+    assert contents == [f"hello {i}" for i in range(5)]
+    assert await _rows(sessionmaker) == []
+    assert await relay.pending() == 0
+    assert relay.stats.relayed == 5
+    assert relay.stats.batches == 3
+
+
+@pytest.mark.asyncio
+async def test_relay_claims_exclusively(repository, sessionmaker, message_data):
+    await repository.create_many([message_data(i) for i in range(3)])
+    relay = OutboxRelay(sessionmaker, outbox, producer=None, batch_size=2)
+
+    first, second = await relay._claim(), await relay._claim()
+    assert len(first) == 2
+    assert [row.id for row in second] == [first[-1].id + 1]
+    assert await relay._claim() == []
+
+
+@pytest.mark.asyncio
+async def test_relay_releases_undelivered(repository, sessionmaker, message_data):
+    await repository.create_many([message_data(i) for i in range(3)])
+
+    sink = InMemoryEventSink()
+    producer = RejectingProducer(sink, accept=1)
+    relay = OutboxRelay(sessionmaker, outbox, producer)
+    assert await relay.relay_once() == 1
+    await producer.close()
+    assert relay.stats.retried == 2
+    rows = await _rows(sessionmaker)
+    assert [row.claimed_until for row in rows] == [None, None]
+
+    producer = BatchingProducer(FailingSink(), linger=0, max_retries=0)
+    relay = OutboxRelay(sessionmaker, outbox, producer)
+    assert await relay.relay_once() == 0
+    await producer.close()
+    assert await relay.pending() == 2
+    assert [row.attempts for row in await _rows(sessionmaker)] == [2, 2]
+
+
+class FlakyProducer(BatchingProducer):
+    def __init__(self, sink, failures: int):
+        super().__init__(sink, linger=0)
+        self.failures = failures
+
+    async def publish(self, event):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("producer bug")
+        return await super().publish(event)
+
+
+@pytest.mark.asyncio
+async def test_relay_run_survives_errors(
+    repository, sessionmaker, message_data, caplog
+):
+    await repository.create_many([message_data(i) for i in range(3)])
+    sink = InMemoryEventSink()
+    producer = FlakyProducer(sink, failures=2)
+    relay = OutboxRelay(sessionmaker, outbox, producer, poll_interval=0)
+
+    task = asyncio.create_task(relay.run())
+    for _ in range(100):
+        if relay.stats.relayed == 3:
+            break
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await producer.close()
+
+    assert relay.stats.relayed == 3
+    assert relay.stats.errors == 2
+    assert "Outbox relay poll failed" in caplog.text
+    assert len(sink.events) == 3
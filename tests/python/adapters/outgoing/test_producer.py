@@ -0,0 +1,185 @@
+"""
+Tests the event producer adapter.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from src.python.adapters.outgoing.producer import BatchingProducer, NDJSONFileSink
+from src.python.ports.producer import Event, InMemoryEventSink
+
+
+class BlockedSink(InMemoryEventSink):
+    """
+    Holds every write until released, so the queue fills up.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def write(self, events):
+        await self.released.wait()
+        await super().write(events)
+
+
+class FlakySink(InMemoryEventSink):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    async def write(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker unavailable")
+        await super().write(events)
+
+
+def _events(count: int) -> list[Event]:
+    return [Event("message.created", {"id": i}, key=str(i % 3)) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_producer_batches_by_size():
+    sink = InMemoryEventSink()
+    producer = BatchingProducer(sink, batch_size=4, linger=1.0)
+    await producer.start()
+    for event in _events(10):
+        assert await producer.publish(event)
+    await producer.close()
+
+    assert [len(batch) for batch in sink.batches] == [4, 4, 2]
+    assert [event.payload["id"] for event in sink.events] == list(range(10))
+    assert producer.stats.published == producer.stats.delivered == 10
+    assert producer.stats.batches == 3
+
+
+@pytest.mark.asyncio
+async def test_producer_batches_by_linger():
+    sink = InMemoryEventSink()
+    producer = BatchingProducer(sink, batch_size=100, linger=0.01)
+    await producer.start()
+    await producer.publish(_events(1)[0])
+    await asyncio.sleep(0.1)
+
+    assert len(sink.batches) == 1
+    await producer.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "overflow, accepted, delivered",
+    [
+        ("drop_new", 2, [0, 1, 2]),
+        ("drop_oldest", 5, [0, 4, 5]),
+        ("block", 2, [0, 1, 2]),
+    ],
+)
+async def test_producer_overflow(overflow, accepted, delivered):
+    sink = BlockedSink()
+    producer = BatchingProducer(
+        sink,
+        max_queue_size=2,
+        batch_size=1,
+        linger=0,
+        overflow=overflow,
+        block_timeout=0.01,
+    )
+    await producer.start()
+    events = _events(6)
+    await producer.publish(events[0])
+    await asyncio.sleep(0)  # the first event is taken off the queue
+    results = [await producer.publish(event) for event in events[1:]]
+
+    sink.released.set()
+    await producer.close()
+    assert results.count(True) == accepted
+    assert [event.payload["id"] for event in sink.events] == delivered
+    assert producer.stats.dropped == 6 - len(delivered)
+
+
+@pytest.mark.asyncio
+async def test_producer_block_applies_backpressure():
+    sink = BlockedSink()
+    producer = BatchingProducer(
+        sink, max_queue_size=1, batch_size=1, linger=0, block_timeout=None
+    )
+    await producer.start()
+    events = _events(3)
+    await producer.publish(events[0])
+    await asyncio.sleep(0)
+    await producer.publish(events[1])
+
+    blocked = asyncio.create_task(producer.publish(events[2]))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    sink.released.set()
+    assert await blocked
+    await producer.close()
+    assert len(sink.events) == 3
+
+
+@pytest.mark.asyncio
+async def test_producer_retries_failed_batches():
+    sink = FlakySink(failures=2)
+    producer = BatchingProducer(sink, batch_size=10, linger=0, retry_backoff=0)
+    await producer.start()
+    for event in _events(3):
+        await producer.publish(event)
+    await producer.close()
+    assert len(sink.events) == 3
+
+    sink = FlakySink(failures=10)
+    producer = BatchingProducer(sink, linger=0, max_retries=1, retry_backoff=0)
+    await producer.publish(_events(1)[0])
+    await producer.close()
+    assert sink.events == []
+    assert producer.stats.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_producer_close_flushes_and_rejects():
+    sink = InMemoryEventSink()
+    producer = BatchingProducer(sink, batch_size=1000, linger=60)
+    await producer.start()
+    for event in _events(5):
+        await producer.publish(event)
+    await producer.close()
+
+    assert len(sink.events) == 5
+    assert not await producer.publish(_events(1)[0])
+    assert producer.stats.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_producer_flush_waits_for_delivery():
+    sink = InMemoryEventSink()
+    producer = BatchingProducer(sink, batch_size=1000, linger=0.01)
+    for event in _events(3):
+        await producer.publish(event)
+    await producer.flush()
+
+    assert len(sink.events) == 3
+    await producer.close()
+
+
+def test_producer_invalid_overflow():
+    with pytest.raises(ValueError):
+        BatchingProducer(InMemoryEventSink(), overflow="spill")
+
+
+@pytest.mark.asyncio
+async def test_ndjson_file_sink(tmp_path):
+    path = tmp_path / "events.ndjson"
+    sink = NDJSONFileSink(path)
+    events = _events(3)
+    await sink.write(events[:2])
+    await sink.write(events[2:])
+    await sink.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["id"] for line in lines] == [event.id for event in events]
+    assert lines[0]["type"] == "message.created"
+    assert lines[0]["payload"] == {"id": 0}
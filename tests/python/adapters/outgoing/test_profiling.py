@@ -0,0 +1,74 @@
+"""
+Tests the request profiling adapter.
+"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from src.python.adapters.outgoing.profiling import Profiler, StackSampler, collapse
+
+
+def busy_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_collapse():
+    stack = collapse(sys._getframe())
+    line = test_collapse.__code__.co_firstlineno
+    assert stack.endswith(f"test_collapse (test_profiling.py:{line})")
+    assert stack.count(";") > 1
+
+
+def test_stack_sampler():
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    switch_interval = sys.getswitchinterval()
+    sampler.start()
+    busy_work(0.1)
+    stacks = sampler.stop()
+
+    assert sys.getswitchinterval() == switch_interval
+    busy = sum(count for stack, count in stacks.items() if "busy_work" in stack)
+    assert busy > 10
+
+
+@pytest.mark.asyncio
+async def test_stack_sampler_joins_greenlets():
+    from sqlalchemy.util import greenlet_spawn
+
+    async def awaiting_orm():
+        await greenlet_spawn(busy_work, 0.1)
+
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    await awaiting_orm()
+    stacks = sampler.stop()
+
+    busy = [stack for stack in stacks if "busy_work" in stack]
+    assert busy
+    assert all(
+        stack.index("awaiting_orm") < stack.index("greenlet_spawn") for stack in busy
+    )
+
+
+@pytest.mark.asyncio
+async def test_profiler(tmp_path):
+    profiler = Profiler(directory=tmp_path, keep=2)
+    for id_ in ("a", "b", "c"):
+        assert profiler.start()
+        assert not profiler.start()  # one profile at a time
+        busy_work(0.02)
+        profile = await profiler.stop(id_, "GET", "/visitors", "/visitors")
+
+    assert [p.id for p in profiler.profiles] == ["b", "c"]
+    assert profiler.get("a") is None
+    assert profiler.get("c") is profile
+    assert profile.samples == sum(profile.stacks.values()) > 0
+    lines = (tmp_path / "c.collapsed").read_text().splitlines()
+    assert lines == profile.collapsed().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
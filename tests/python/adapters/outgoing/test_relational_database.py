@@ -6,15 +6,21 @@ import datetime
 
 import pytest
 import pytest_asyncio
+from polyfactory import Ignore
 from polyfactory.factories.sqlalchemy_factory import SQLAlchemyFactory
 from polyfactory.pytest_plugin import register_fixture
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
+from src.python.adapters.outgoing import migrations
 from src.python.adapters.outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
     MessageModel,
     VisitorModel,
     create_database_engine,
     get_sessionmaker,
+    maintain_sqlite,
+    warm_pool,
 )
 
 
@@ -24,10 +30,97 @@ async def create_sqlite_engine():
     Creates a SQLite database engine.
     """
     engine = await create_database_engine("sqlite+aiosqlite:///:memory:")
+    await migrations.upgrade(engine)
     yield engine
     await engine.dispose()
 
 
+@pytest.mark.asyncio
+async def test_create_database_engine_pool_options(tmp_path):
+    """
+    Tests that file databases are pooled with the given settings.
+    """
+    engine = await create_database_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.sqlite'}",
+        pool_size=3,
+        max_overflow=2,
+        pool_pre_ping=True,
+        pool_recycle=60,
+    )
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 2
+    assert engine.pool._pre_ping
+    assert engine.pool._recycle == 60
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_pool(tmp_path):
+    """
+    Tests that warming opens pooled connections up to the pool size.
+    """
+    engine = await create_database_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'warm.sqlite'}", pool_size=3
+    )
+    await warm_pool(engine, 10)
+    assert engine.pool.checkedin() == 3
+    assert engine.pool.checkedout() == 0
+    await engine.dispose()
+
+    memory = await create_database_engine("sqlite+aiosqlite:///:memory:", pool_size=3)
+    await warm_pool(memory, 3)
+    await memory.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_database_engine_memory_not_pooled():
+    """
+    Tests that in-memory databases ignore pool sizing.
+    """
+    engine = await create_database_engine("sqlite+aiosqlite:///:memory:", pool_size=3)
+    assert isinstance(engine.pool, StaticPool)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_database_engine_sqlite_pragmas(tmp_path):
+    """
+    Tests that the performance profile is applied to every connection.
+    """
+    engine = await create_database_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pragmas.sqlite'}",
+        pool_size=2,
+        sqlite_pragmas=SQLITE_PRAGMA_PROFILES["performance"],
+    )
+    # synchronous=NORMAL and temp_store=MEMORY read back as numbers
+    expected = dict(
+        journal_mode="wal",
+        synchronous=1,
+        temp_store=2,
+        busy_timeout=5000,
+        cache_size=-64 * 1024,
+    )
+    async with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            for name, value in expected.items():
+                result = await conn.exec_driver_sql(f"PRAGMA {name}")
+                assert result.scalar() == value
+    await maintain_sqlite(engine)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "pragmas", [{"journal_mode": "WAL; DROP TABLE visitors"}, {"x y": 1}]
+)
+async def test_create_database_engine_invalid_pragmas(pragmas):
+    with pytest.raises(ValueError):
+        await create_database_engine(
+            "sqlite+aiosqlite:///:memory:", sqlite_pragmas=pragmas
+        )
+
+
 class VisitorFactory(SQLAlchemyFactory[VisitorModel]):
     __set_as_default_factory_for_type__ = True
 
@@ -35,6 +128,7 @@ class VisitorFactory(SQLAlchemyFactory[VisitorModel]):
     created_at = None
     updated_at = None
     deleted_at = None
+    revision = Ignore()
     messages = []
 
 
@@ -45,6 +139,7 @@ class MessageFactory(SQLAlchemyFactory[MessageModel]):
     created_at = None
     updated_at = None
     deleted_at = None
+    revision = Ignore()
 
 
 visitor_factory = register_fixture(VisitorFactory)
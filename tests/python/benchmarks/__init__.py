@@ -0,0 +1,234 @@
+"""
+Helpers for the latency benchmarks: seeding a dataset, measuring operations at
+a fixed concurrency and comparing the results with the stored baseline.
+
+The benchmarks are configured with environment variables:
+
+- `BENCHMARK_SIZE`: messages in the seeded dataset, e.g. `10k` (the default),
+  `100k` or `1M`, with one visitor per `MESSAGES_PER_VISITOR` messages.
+- `BENCHMARK_REQUESTS`: operations measured per route or method (300).
+- `BENCHMARK_CONCURRENCY`: operations in flight at once (8).
+- `BENCHMARK_TOLERANCE`: the fraction by which median latency may grow, or
+  throughput shrink, relative to the baseline before failing (1.0, i.e.
+  twice as slow). Only reads are compared, and only their median latency
+  and throughput: writes and tail percentiles mostly measure waits on the
+  SQLite write lock and are reported but too noisy to gate on.
+- `BENCHMARK_HOST`: the key of the baselines for this machine (its host
+  name). Without a baseline for the host and dataset size, the comparison
+  is skipped.
+- `BENCHMARK_UPDATE_BASELINE`: when set, records the results as the new
+  baseline for the host and dataset size instead of comparing with it.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Collection
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.python.adapters.outgoing import migrations
+from src.python.adapters.outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
+    MessageModel,
+    VisitorModel,
+    create_database_engine,
+    get_sessionmaker,
+)
+from src.python.ports.repository import SQLAlchemyRepository
+
+from ..ports import MessageFactory, VisitorFactory
+
+BASELINE = Path(__file__).with_name("baseline.json")
+MESSAGES_PER_VISITOR = 10
+SEED_CHUNK = 10_000
+# Latencies within this many milliseconds of the baseline are never regressions,
+# so sub-millisecond operations do not fail on scheduling noise.
+LATENCY_SLACK_MS = 1.0
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def _size(value: str) -> int:
+    value = value.strip().lower()
+    if value[-1:] in _SUFFIXES:
+        return int(float(value[:-1]) * _SUFFIXES[value[-1]])
+    return int(value)
+
+
+SIZE = _size(os.environ.get("BENCHMARK_SIZE", "10k"))
+REQUESTS = int(os.environ.get("BENCHMARK_REQUESTS", 300))
+CONCURRENCY = int(os.environ.get("BENCHMARK_CONCURRENCY", 8))
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 1.0))
+HOST = os.environ.get("BENCHMARK_HOST") or platform.node()
+UPDATE_BASELINE = bool(os.environ.get("BENCHMARK_UPDATE_BASELINE"))
+
+
+VISITORS = max(SIZE // MESSAGES_PER_VISITOR, 1)
+
+
+def visitor_email(visitor_id: int) -> str:
+    return f"visitor-{visitor_id}@example.com"
+
+
+def message_data(i: int) -> dict:
+    """
+    Returns the data of the `i`th message a benchmark creates, for one of the
+    seeded visitors.
+    """
+    return dict(
+        content=f"hello benchmark {i}",
+        sender="John",
+        receiver="Jane",
+        visitor_id=1 + i % VISITORS,
+    )
+
+
+async def create_migrated_engine(database_url: str, **options) -> AsyncEngine:
+    """
+    Creates an engine with the "performance" SQLite pragmas, unless others are
+    given, on a database migrated to the head schema.
+    """
+    options.setdefault("sqlite_pragmas", SQLITE_PRAGMA_PROFILES["performance"])
+    engine = await create_database_engine(database_url, **options)
+    await migrations.upgrade(engine)
+    return engine
+
+
+async def seed(database_url: str, size: int = SIZE) -> None:
+    """
+    Creates a database with `size` messages spread evenly over visitors. Every
+    tenth message contains the word "hello", for search queries.
+    """
+    engine = await create_migrated_engine(database_url)
+    sessionmaker = get_sessionmaker(engine)
+    visitors = SQLAlchemyRepository(sessionmaker, VisitorModel)
+    messages = SQLAlchemyRepository(sessionmaker, MessageModel)
+    visitor_count = max(size // MESSAGES_PER_VISITOR, 1)
+    for start in range(0, visitor_count, SEED_CHUNK):
+        await visitors.create_many(
+            [
+                dict(name=visitor.name, email=visitor_email(i + 1))
+                for i, visitor in enumerate(
+                    VisitorFactory.batch(min(SEED_CHUNK, visitor_count - start)),
+                    start,
+                )
+            ]
+        )
+    for start in range(0, size, SEED_CHUNK):
+        batch = MessageFactory.batch(min(SEED_CHUNK, size - start))
+        await messages.create_many(
+            [
+                {
+                    **asdict(message),
+                    "content": (
+                        f"hello {message.content}" if i % 10 == 0 else message.content
+                    ),
+                    "visitor_id": 1 + i % visitor_count,
+                }
+                for i, message in enumerate(batch, start)
+            ]
+        )
+    await engine.dispose()
+
+
+@dataclass
+class Latencies:
+    """
+    The latencies in seconds of operations run over `elapsed` seconds.
+    """
+
+    samples: list[float] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the nearest-rank `q`th percentile.
+        """
+        ordered = sorted(self.samples)
+        return ordered[max(0, min(len(ordered), round(q / 100 * len(ordered))) - 1)]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.samples) / self.elapsed
+
+    def summary(self) -> dict[str, float]:
+        return dict(
+            throughput=round(self.throughput, 1),
+            **{f"p{q}": round(self.percentile(q) * 1000, 3) for q in (50, 95, 99)},
+        )
+
+
+async def measure(
+    operation: Callable[[int], Awaitable[Any]],
+    requests: int = REQUESTS,
+    concurrency: int = CONCURRENCY,
+) -> Latencies:
+    """
+    Runs `operation(i)` for `i` in `range(requests)` with `concurrency`
+    operations in flight and records each latency.
+    """
+    latencies = Latencies()
+    indexes = iter(range(requests))
+
+    async def worker():
+        for i in indexes:
+            started = time.perf_counter()
+            await operation(i)
+            latencies.samples.append(time.perf_counter() - started)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    latencies.elapsed = time.perf_counter() - start
+    return latencies
+
+
+def report(title: str, results: dict[str, dict[str, float]]) -> None:
+    print(f"\n{title} ({SIZE} messages, concurrency {CONCURRENCY}):")
+    for name, result in results.items():
+        print(
+            f"{name:>36}: {result['throughput']:8.1f}/s "
+            f"p50 {result['p50']:7.2f}ms p95 {result['p95']:7.2f}ms "
+            f"p99 {result['p99']:7.2f}ms"
+        )
+
+
+def compare_with_baseline(
+    suite: str, results: dict[str, dict[str, float]], compared: Collection[str]
+) -> list[str]:
+    """
+    Returns the regressions of the `compared` operations of `results` against
+    the baseline of the `suite` for the host and dataset size, or records
+    all of `results` as the baseline with `BENCHMARK_UPDATE_BASELINE`. Skips
+    the test when the host has no baseline; operations without one are not
+    compared.
+    """
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if UPDATE_BASELINE:
+        baselines.setdefault(HOST, {}).setdefault(str(SIZE), {})[suite] = results
+        BASELINE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        return []
+    baseline = baselines.get(HOST, {}).get(str(SIZE), {}).get(suite)
+    if baseline is None:
+        pytest.skip(f"No {suite} baseline for host {HOST!r} and size {SIZE}")
+    regressions = []
+    for name in compared:
+        result = results.get(name)
+        if result is None or name not in baseline:
+            continue
+        expected = baseline[name]
+        if result["p50"] > expected["p50"] * (1 + TOLERANCE) + LATENCY_SLACK_MS:
+            regressions.append(
+                f"{name}: p50 {result['p50']:.2f}ms, baseline {expected['p50']:.2f}ms"
+            )
+        if result["throughput"] < expected["throughput"] / (1 + TOLERANCE):
+            regressions.append(
+                f"{name}: {result['throughput']:.1f}/s, "
+                f"baseline {expected['throughput']:.1f}/s"
+            )
+    return regressions
@@ -0,0 +1,26 @@
+import asyncio
+import shutil
+
+import pytest
+
+from . import SIZE, seed
+
+
+@pytest.fixture(scope="session")
+def seeded_database(tmp_path_factory):
+    """
+    A database seeded once per session with `BENCHMARK_SIZE` messages.
+    """
+    path = tmp_path_factory.mktemp("seed") / f"{SIZE}.sqlite"
+    asyncio.run(seed(f"sqlite+aiosqlite:///{path}"))
+    return path
+
+
+@pytest.fixture
+def database_url(seeded_database, tmp_path):
+    """
+    The URL of a copy of the seeded database, for benchmarks that write.
+    """
+    path = tmp_path / seeded_database.name
+    shutil.copy(seeded_database, path)
+    return f"sqlite+aiosqlite:///{path}"
@@ -0,0 +1,58 @@
+"""
+Benchmarks the batch consumer against storing messages one by one, the way
+replaying `POST /messages` does (without the HTTP overhead).
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+import json
+import time
+
+import pytest
+
+from src.python.adapters.incoming.consumer import BatchConsumer, NDJSONFileSource
+from src.python.adapters.outgoing.relational_database import (
+    MessageModel,
+    get_sessionmaker,
+)
+from src.python.ports.repository import SQLAlchemyRepository
+
+from . import create_migrated_engine
+
+MESSAGES = 50_000
+REPLAYED = 2_000
+
+
+def _message(i: int) -> dict:
+    return dict(content="x" * 200, sender="John", receiver="Jane", visitor_id=i % 100)
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_consumer_throughput(tmp_path):
+    source = tmp_path / "messages.ndjson"
+    with source.open("w") as f:
+        for i in range(MESSAGES):
+            f.write(json.dumps(_message(i)) + "\n")
+
+    engine = await create_migrated_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'bulk.sqlite'}"
+    )
+    repository = SQLAlchemyRepository(get_sessionmaker(engine), MessageModel)
+    stats = await BatchConsumer(
+        NDJSONFileSource(source, tmp_path / "offset.json"), repository
+    ).run()
+    print(f"consumer: {stats.rate:10.0f} messages/s, {stats.batches} batches")
+    assert stats.inserted == MESSAGES
+    await engine.dispose()
+
+    engine = await create_migrated_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'one.sqlite'}"
+    )
+    repository = SQLAlchemyRepository(get_sessionmaker(engine), MessageModel)
+    start = time.perf_counter()
+    for i in range(REPLAYED):
+        await repository.create(_message(i))
+    elapsed = time.perf_counter() - start
+    print(f"one by one: {REPLAYED / elapsed:8.0f} messages/s")
+    await engine.dispose()
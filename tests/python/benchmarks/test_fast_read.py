@@ -0,0 +1,64 @@
+"""
+Benchmarks the per-row cost of rendering a listing page: loading ORM entities
+and rendering each through its schema, against reading plain rows with
+`paginate_rows` and serializing the page in one pass. See the package
+docstring for the configuration.
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from src.python.adapters.incoming.api import MessageSchema, fieldset_parameters
+from src.python.adapters.outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
+    MessageModel,
+    create_database_engine,
+    get_sessionmaker,
+)
+from src.python.ports.repository import SQLAlchemyRepository
+
+from . import SIZE
+
+PAGE_SIZE = min(1000, SIZE)
+PAGES = 50
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_fast_read(seeded_database):
+    engine = await create_database_engine(
+        f"sqlite+aiosqlite:///{seeded_database}",
+        sqlite_pragmas=SQLITE_PRAGMA_PROFILES["performance"],
+    )
+    messages = SQLAlchemyRepository(get_sessionmaker(engine), MessageModel)
+    # the fieldset of `GET /messages` without query parameters
+    fieldset = await fieldset_parameters(MessageSchema)()
+
+    async def entities() -> bytes:
+        page = await messages.paginate(
+            limit=PAGE_SIZE, load=fieldset.load(), columns=fieldset.fields
+        )
+        return JSONResponse([fieldset.dump(entity) for entity in page.items]).body
+
+    async def rows() -> bytes:
+        page = await messages.paginate_rows(limit=PAGE_SIZE, columns=fieldset.fields)
+        return fieldset.dump_rows(page.items)
+
+    assert await entities() == await rows()
+    results = {}
+    for name, read in (("entities", entities), ("rows", rows)):
+        start = time.perf_counter()
+        for _ in range(PAGES):
+            await read()
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / (PAGES * PAGE_SIZE) * 1e6
+    await engine.dispose()
+
+    print(f"\nListing pages of {PAGE_SIZE} messages ({SIZE} messages):")
+    for name, cost in results.items():
+        print(f"{name:>36}: {cost:7.2f}us/row")
+    assert results["rows"] < results["entities"]
@@ -0,0 +1,46 @@
+"""
+Benchmarks the batching event producer against the NDJSON file sink.
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+import statistics
+import time
+
+import pytest
+
+from src.python.adapters.outgoing.producer import BatchingProducer, NDJSONFileSink
+from src.python.ports.producer import Event
+
+EVENTS = 100_000
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_size", [1, 100, 1000])
+async def test_producer_throughput(tmp_path, batch_size):
+    path = tmp_path / "events.ndjson"
+    producer = BatchingProducer(
+        NDJSONFileSink(path), batch_size=batch_size, block_timeout=None
+    )
+    await producer.start()
+    payload = {"id": 1, "content": "x" * 200, "sender": "John", "receiver": "Jane"}
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        before = time.perf_counter()
+        await producer.publish(Event("message.created", payload, key=str(i % 100)))
+        latencies.append(time.perf_counter() - before)
+    await producer.close(timeout=None)
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"batch_size={batch_size:>5}: {EVENTS / elapsed:10.0f} events/s, "
+        f"publish p50 {quantiles[49] * 1e6:6.1f}us p99 {quantiles[98] * 1e6:6.1f}us, "
+        f"{producer.stats.batches} batches"
+    )
+    assert producer.stats.delivered == EVENTS
+    assert producer.stats.dropped == 0
+    assert sum(1 for _ in path.open()) == EVENTS
@@ -0,0 +1,105 @@
+"""
+Benchmarks the methods of `SQLAlchemyRepository` directly on a seeded dataset,
+i.e. the routes' database work without HTTP, validation or caching. See the
+package docstring for the configuration.
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+from contextlib import aclosing
+
+import pytest
+
+from src.python.adapters.outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
+    MessageModel,
+    VisitorModel,
+    create_database_engine,
+    get_sessionmaker,
+    messages_search,
+)
+from src.python.ports.repository import SQLAlchemyRepository
+
+from . import (
+    REQUESTS,
+    SIZE,
+    VISITORS,
+    compare_with_baseline,
+    measure,
+    message_data,
+    report,
+)
+
+NO_RELATIONSHIPS = {"*": "noload"}
+
+
+async def _stream_page(messages: SQLAlchemyRepository, size: int = 500) -> None:
+    """
+    Reads the first `size` messages of a stream.
+    """
+    async with aclosing(messages.stream(load=NO_RELATIONSHIPS)) as stream:
+        read = 0
+        async for _ in stream:
+            read += 1
+            if read == size:
+                break
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_repository(database_url):
+    if REQUESTS > VISITORS:
+        pytest.skip("Deletes need BENCHMARK_REQUESTS of at most the visitors")
+    engine = await create_database_engine(
+        database_url,
+        pool_size=8,
+        sqlite_pragmas=SQLITE_PRAGMA_PROFILES["performance"],
+    )
+    sessionmaker = get_sessionmaker(engine)
+    visitors = SQLAlchemyRepository(sessionmaker, VisitorModel)
+    messages = SQLAlchemyRepository(
+        sessionmaker, MessageModel, search_table=messages_search
+    )
+
+    # Methods run in this order, reads first; the deletes come last.
+    reads = {
+        "visitors.get": lambda i: visitors.get(1 + i % VISITORS),
+        "visitors.paginate": lambda i: visitors.paginate(
+            limit=50, load={"messages": "selectin"}
+        ),
+        "messages.get": lambda i: messages.get(1 + i % SIZE),
+        "messages.list": lambda i: messages.list(
+            load=NO_RELATIONSHIPS, visitor_id=1 + i % VISITORS
+        ),
+        "messages.paginate": lambda i: messages.paginate(
+            limit=50, load=NO_RELATIONSHIPS
+        ),
+        "messages.stream": lambda i: _stream_page(messages),
+        "messages.version": lambda i: messages.version(limit=50),
+        "messages.search": lambda i: messages.search(
+            "hello", limit=20, load=NO_RELATIONSHIPS
+        ),
+    }
+    writes = {
+        "messages.create": lambda i: messages.create(message_data(i)),
+        "messages.create_many": lambda i: messages.create_many(
+            [message_data(i * 10 + j) for j in range(10)]
+        ),
+        "messages.update": lambda i: messages.update(
+            1 + i % SIZE, dict(content=f"updated {i}"), load=NO_RELATIONSHIPS
+        ),
+        "messages.update_where": lambda i: messages.update_where(
+            dict(receiver=f"Receiver {i}"), visitor_id=1 + i % VISITORS
+        ),
+        "messages.delete": lambda i: messages.delete(SIZE - i),
+        "messages.delete_where": lambda i: messages.delete_where(visitor_id=1 + i),
+    }
+    results = {
+        name: (await measure(operation)).summary()
+        for name, operation in {**reads, **writes}.items()
+    }
+    await engine.dispose()
+
+    report("Repository", results)
+    regressions = compare_with_baseline("repository", results, reads)
+    assert not regressions, "\n".join(["Regressions:", *regressions])
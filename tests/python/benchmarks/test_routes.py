@@ -0,0 +1,145 @@
+"""
+Benchmarks every route of the API in-process, through an ASGI transport, on
+a seeded dataset. See the package docstring for the configuration.
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+from typing import Awaitable, Callable
+
+import httpx
+import pytest
+
+from . import (
+    REQUESTS,
+    SIZE,
+    VISITORS,
+    compare_with_baseline,
+    measure,
+    message_data,
+    report,
+    visitor_email,
+)
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _visitor(i: int) -> dict:
+    return dict(name=f"Visitor {i}", email=f"new-{i}@example.com")
+
+
+# Routes run in this order; the deletes come last and remove distinct rows from
+# the end of the dataset (single deletes) and the start (batch deletes).
+ROUTES: dict[str, tuple[int, Request]] = {
+    "GET /": (200, lambda c, i: c.get("/")),
+    "GET /metrics": (200, lambda c, i: c.get("/metrics")),
+    "GET /visitors": (200, lambda c, i: c.get("/visitors", params=dict(limit=50))),
+    "GET /visitors?include=messages": (
+        200,
+        lambda c, i: c.get("/visitors", params=dict(limit=50, include="messages")),
+    ),
+    "GET /visitors/{id}": (200, lambda c, i: c.get(f"/visitors/{1 + i % VISITORS}")),
+    "POST /visitors": (201, lambda c, i: c.post("/visitors", json=_visitor(i))),
+    "POST /visitors:batch": (
+        201,
+        lambda c, i: c.post(
+            "/visitors:batch", json=[_visitor(i * 10 + j) for j in range(10)]
+        ),
+    ),
+    "PATCH /visitors:batch": (
+        200,
+        lambda c, i: c.patch(
+            "/visitors:batch",
+            params=dict(email=visitor_email(1 + i % VISITORS)),
+            json=dict(name=f"Patched {i}"),
+        ),
+    ),
+    "PUT /visitors/{id}": (
+        200,
+        lambda c, i: c.put(
+            f"/visitors/{1 + i % VISITORS}",
+            json=dict(name=f"Put {i}", email=visitor_email(1 + i % VISITORS)),
+        ),
+    ),
+    "PATCH /visitors/{id}": (
+        200,
+        lambda c, i: c.patch(
+            f"/visitors/{1 + i % VISITORS}",
+            json=dict(name=f"Patched {i}", email=visitor_email(1 + i % VISITORS)),
+        ),
+    ),
+    "GET /messages": (200, lambda c, i: c.get("/messages", params=dict(limit=50))),
+    "GET /messages?visitor_id=": (
+        200,
+        lambda c, i: c.get("/messages", params=dict(visitor_id=1 + i % VISITORS)),
+    ),
+    "GET /messages/search": (
+        200,
+        lambda c, i: c.get("/messages/search", params=dict(q="hello", limit=20)),
+    ),
+    "GET /messages/{id}": (200, lambda c, i: c.get(f"/messages/{1 + i % SIZE}")),
+    "POST /messages": (201, lambda c, i: c.post("/messages", json=message_data(i))),
+    "POST /messages:batch": (
+        201,
+        lambda c, i: c.post(
+            "/messages:batch", json=[message_data(i * 10 + j) for j in range(10)]
+        ),
+    ),
+    "PATCH /messages:batch": (
+        200,
+        lambda c, i: c.patch(
+            "/messages:batch",
+            params=dict(visitor_id=1 + i % VISITORS),
+            json=dict(receiver=f"Receiver {i}"),
+        ),
+    ),
+    "PUT /messages/{id}": (
+        200,
+        lambda c, i: c.put(f"/messages/{1 + i % SIZE}", json=message_data(i)),
+    ),
+    "PATCH /messages/{id}": (
+        200,
+        lambda c, i: c.patch(
+            f"/messages/{1 + i % SIZE}", json=dict(content=f"patched {i}")
+        ),
+    ),
+    "DELETE /messages/{id}": (204, lambda c, i: c.delete(f"/messages/{SIZE - i}")),
+    "DELETE /messages:batch": (
+        200,
+        lambda c, i: c.delete("/messages:batch", params=dict(visitor_id=1 + i)),
+    ),
+    "DELETE /visitors/{id}": (204, lambda c, i: c.delete(f"/visitors/{VISITORS - i}")),
+    "DELETE /visitors:batch": (
+        200,
+        lambda c, i: c.delete(
+            "/visitors:batch", params=dict(email=visitor_email(1 + i))
+        ),
+    ),
+}
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_routes(database_url, monkeypatch):
+    if 2 * REQUESTS > VISITORS:
+        pytest.skip("Deletes need BENCHMARK_REQUESTS of at most half the visitors")
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    from src.python.adapters.incoming.api import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        for name, (status, request) in ROUTES.items():
+
+            async def operation(i: int) -> None:
+                response = await request(client, i)
+                assert response.status_code == status, (name, response.text)
+
+            results[name] = (await measure(operation)).summary()
+
+    report("Routes", results)
+    reads = [name for name in results if name.startswith("GET ")]
+    regressions = compare_with_baseline("routes", results, reads)
+    assert not regressions, "\n".join(["Regressions:", *regressions])
@@ -0,0 +1,91 @@
+"""
+Benchmarks the SQLite pragma profiles under a concurrent read/write mix.
+
+Run with `python -m pytest -m benchmark -s tests/python/benchmarks`.
+"""
+
+import asyncio
+import time
+from dataclasses import asdict
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.python.adapters.outgoing.relational_database import (
+    SQLITE_PRAGMA_PROFILES,
+    MessageModel,
+    get_sessionmaker,
+)
+from src.python.ports.repository import SQLAlchemyRepository
+
+from ..ports import MessageFactory
+from . import create_migrated_engine
+
+WRITERS = 4
+READERS = 4
+OPERATIONS = 200
+SEED = 5_000
+
+
+async def _run_mix(database_url: str, profile: str) -> dict[str, float]:
+    engine = await create_migrated_engine(
+        database_url,
+        pool_size=WRITERS + READERS,
+        sqlite_pragmas=SQLITE_PRAGMA_PROFILES[profile],
+    )
+    messages = SQLAlchemyRepository(get_sessionmaker(engine), MessageModel)
+    await messages.create_many(
+        [asdict(message) for message in MessageFactory.batch(SEED)]
+    )
+
+    counts = dict(writes=0, reads=0, errors=0)
+
+    async def run(kind, operation):
+        for _ in range(OPERATIONS):
+            try:
+                await operation()
+            except OperationalError:  # database is locked
+                counts["errors"] += 1
+            else:
+                counts[kind] += 1
+
+    def write():
+        return messages.create(asdict(MessageFactory.build()))
+
+    def read():
+        return messages.paginate(limit=50, load={"*": "noload"})
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(run("writes", write) for _ in range(WRITERS)),
+        *(run("reads", read) for _ in range(READERS)),
+    )
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return dict(
+        writes=counts["writes"] / elapsed,
+        reads=counts["reads"] / elapsed,
+        errors=counts["errors"],
+        elapsed=elapsed,
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_sqlite_performance_profile(tmp_path):
+    results = {
+        profile: await _run_mix(
+            f"sqlite+aiosqlite:///{tmp_path / f'{profile}.sqlite'}", profile
+        )
+        for profile in ("none", "performance")
+    }
+
+    for profile, result in results.items():
+        print(
+            f"{profile:>12}: {result['writes']:8.1f} writes/s "
+            f"{result['reads']:8.1f} reads/s {result['errors']:4d} lock errors "
+            f"in {result['elapsed']:.2f}s"
+        )
+    tuned, baseline = results["performance"], results["none"]
+    assert tuned["errors"] == 0
+    assert tuned["writes"] + tuned["reads"] > baseline["writes"] + baseline["reads"]
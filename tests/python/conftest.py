@@ -24,3 +24,44 @@ def async_sessionmaker(async_bootstrapped_sqlite_engine):
     from sqlalchemy.ext.asyncio import async_sessionmaker
 
     return async_sessionmaker(async_bootstrapped_sqlite_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """
+    The URL of a SQLite database file, created on first connection.
+    """
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.sqlite'}"
+
+
+@pytest_asyncio.fixture
+async def sessionmaker(database_url):
+    """
+    A sessionmaker of the database at `database_url`, migrated to the head
+    schema.
+    """
+    from src.python.adapters.outgoing import migrations
+    from src.python.adapters.outgoing.relational_database import (
+        create_database_engine,
+        get_sessionmaker,
+    )
+
+    engine = await create_database_engine(database_url)
+    await migrations.upgrade(engine)
+    yield get_sessionmaker(engine)
+    await engine.dispose()
+
+
+@pytest.fixture
+def message_data():
+    """
+    Builds the data of the `i`th message of a test, alternating between two
+    senders.
+    """
+
+    def build(i: int) -> dict:
+        return dict(
+            content=f"hello {i}", sender=f"s{i % 2}", receiver="r", visitor_id=1
+        )
+
+    return build
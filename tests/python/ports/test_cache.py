@@ -0,0 +1,98 @@
+"""
+Tests cache logic.
+"""
+
+import pytest
+
+from src.python.ports.cache import MISSING, InMemorySharedCache, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_get_set():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a") is MISSING
+    assert cache.get("a", None) is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_lru_cache_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 9.9
+    assert cache.peek("a") == 1
+    assert cache.get("a") == 1
+
+    clock.now = 10
+    assert cache.peek("a") is None
+    assert cache.get("a") is MISSING
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_lru_cache_peek_is_not_counted():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    cache.set("c", 3)
+
+    assert cache.peek("a") is None
+    assert cache.stats.hits == cache.stats.misses == 0
+
+
+def test_lru_cache_delete_and_clear():
+    cache = LRUCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.peek("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_memory_shared_cache():
+    clock = FakeClock()
+    cache = InMemorySharedCache(clock=clock)
+    await cache.set("visitors:1", "one", ttl=5)
+    await cache.set("visitors:2", "two")
+    await cache.set("messages:1", "message")
+
+    assert await cache.get("visitors:1") == "one"
+    clock.now = 5
+    assert await cache.get("visitors:1") is MISSING
+    assert await cache.get("visitors:2") == "two"
+
+    await cache.delete_prefix("visitors:")
+    assert await cache.get("visitors:2") is MISSING
+    assert await cache.get("messages:1") == "message"
+
+    await cache.delete("messages:1")
+    assert await cache.get("messages:1", None) is None
@@ -2,15 +2,35 @@
 Tests repository logic.
 """
 
+import datetime
 from dataclasses import asdict
 from operator import contains
+from types import SimpleNamespace
 from typing import Sequence
 
 import pytest
-
-from src.python.adapters.outgoing.relational_database import MessageModel, VisitorModel
+from sqlalchemy.exc import InvalidRequestError
+
+from src.python.adapters.outgoing import migrations
+from src.python.adapters.outgoing.relational_database import (
+    MessageModel,
+    VisitorModel,
+    create_database_engine,
+    messages_search,
+)
 from src.python.domain.models import Visitor
-from src.python.ports.repository import BaseRepository, SQLAlchemyRepository
+from src.python.ports.cache import InMemorySharedCache, LRUCache
+from src.python.ports.repository import (
+    BaseRepository,
+    BatchResult,
+    CachedRepository,
+    EntityNotFoundError,
+    Page,
+    SQLAlchemyRepository,
+    Version,
+    decode_cursor,
+    encode_cursor,
+)
 
 from ..adapters.outgoing.test_relational_database import get_sessionmaker, create_sqlite_engine
 from . import visitor_factory, VisitorFactory, MessageFactory  # imported as a fixture
@@ -26,9 +46,15 @@ def my_repository(visitor_factory):
         def list(self, length: int) -> list[Visitor]:
             return visitor_factory.batch(length)
 
+        def paginate(self, limit: int, cursor: str = None) -> Page:
+            return Page(visitor_factory.batch(limit))
+
         def create(self, entity: Visitor) -> Visitor:
             return visitor_factory.build(**asdict(entity))
 
+        def create_many(self, entities: Sequence[Visitor], chunk_size: int = 500):
+            return BatchResult([self.create(entity) for entity in entities])
+
         def update(self, id_: int, entity: Visitor) -> Visitor:
             entity.id = id_
             return visitor_factory.build(**asdict(entity))
@@ -36,6 +62,12 @@ def my_repository(visitor_factory):
         def delete(self, id_: int):
             return
 
+        def update_where(self, data: dict, **kwargs) -> Sequence[Visitor]:
+            return []
+
+        def delete_where(self, **kwargs) -> Sequence[int]:
+            return []
+
     return MyRepository
 
 
@@ -58,6 +90,34 @@ def test_repository_list(my_repository, faker):
     assert len(visitors) == length
 
 
+def test_repository_paginate(my_repository, faker):
+    limit = faker.random_int(1, 50)
+    repo = my_repository()
+    page = repo.paginate(limit)
+    assert len(page.items) == limit
+    assert page.next_cursor is None
+
+
+def test_repository_create_many(my_repository, visitor_factory):
+    repo = my_repository()
+    visitors = visitor_factory.batch(3)
+    result = repo.create_many(visitors)
+    assert result.items == visitors
+    assert result.errors == []
+
+
+def test_cursor_round_trip(visitor_factory):
+    visitor = visitor_factory.build(id=42, created_at=datetime.datetime(2024, 3, 1))
+    cursor = encode_cursor(visitor)
+    assert decode_cursor(cursor) == (datetime.datetime(2024, 3, 1), 42)
+
+
+@pytest.mark.parametrize("cursor", ("", "not-a-cursor", "bnVsbA", "WzEsMiwzXQ"))
+def test_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
 def test_repository_create(my_repository, visitor_factory):
     repo = my_repository()
     visitor_before = visitor_factory.build()
@@ -117,8 +177,488 @@ async def test_sqlalchemy_repository_crud(my_sqlalchemy_repository_and_factory):
             continue
         assert getattr(updated_entity, key) == value
 
-
     delete_operation = await repo.delete(created_entity_id)
     assert delete_operation is None
 
-    assert await repo.list() == []
\ No newline at end of file
+    assert await repo.list() == []
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_paginate(my_sqlalchemy_repository_and_factory):
+    repo, factory = my_sqlalchemy_repository_and_factory
+    created = [await repo.create(asdict(factory.build())) for _ in range(7)]
+
+    seen = []
+    cursor = None
+    while True:
+        page = await repo.paginate(limit=3, cursor=cursor)
+        assert len(page.items) <= 3
+        seen.extend(entity.id for entity in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert seen == [entity.id for entity in created]
+
+    filtered = await repo.paginate(limit=10, id=created[3].id)
+    assert [entity.id for entity in filtered.items] == [created[3].id]
+    assert filtered.next_cursor is None
+
+    for entity in created:
+        await repo.delete(entity.id)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_paginate_rows(create_sqlite_engine):
+    repo = SQLAlchemyRepository(get_sessionmaker(create_sqlite_engine), VisitorModel)
+    created = [await repo.create(asdict(VisitorFactory.build())) for _ in range(5)]
+
+    page = await repo.paginate_rows(limit=3, columns=["email"])
+    assert [row.id for row in page.items] == [entity.id for entity in created[:3]]
+    assert page.items[0].email == created[0].email
+    assert "name" not in page.items[0]._fields
+    assert page.next_cursor == (await repo.paginate(limit=3)).next_cursor
+
+    rest = await repo.paginate_rows(limit=3, cursor=page.next_cursor)
+    assert [row.id for row in rest.items] == [entity.id for entity in created[3:]]
+    assert rest.next_cursor is None
+
+    filtered = await repo.paginate_rows(limit=10, id=created[1].id)
+    assert [row.id for row in filtered.items] == [created[1].id]
+
+    with pytest.raises(ValueError):
+        await repo.paginate_rows(limit=10, columns=["nothing"])
+
+    for entity in created:
+        await repo.delete(entity.id)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_stream(my_sqlalchemy_repository_and_factory):
+    repo, factory = my_sqlalchemy_repository_and_factory
+    created = [await repo.create(asdict(factory.build())) for _ in range(5)]
+
+    streamed = [entity.id async for entity in repo.stream(batch_size=2)]
+    assert streamed == [entity.id for entity in created]
+
+    # the port's default implementation walks keyset pages instead
+    paged = [entity.id async for entity in BaseRepository.stream(repo, batch_size=2)]
+    assert paged == streamed
+
+    cursor = (await repo.paginate(limit=2)).next_cursor
+    resumed = [entity.id async for entity in repo.stream(cursor=cursor)]
+    assert resumed == streamed[2:]
+
+    for entity in created:
+        await repo.delete(entity.id)
+
+
+@pytest.fixture
+def count_statements(create_sqlite_engine):
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_loading(create_sqlite_engine, count_statements):
+    sessionmaker = get_sessionmaker(create_sqlite_engine)
+    visitors = SQLAlchemyRepository(sessionmaker, VisitorModel)
+    messages = SQLAlchemyRepository(sessionmaker, MessageModel)
+    visitor = await visitors.create(asdict(VisitorFactory.build()))
+    for _ in range(3):
+        await messages.create(
+            {**asdict(MessageFactory.build()), "visitor_id": visitor.id}
+        )
+
+    count_statements.clear()
+    listed = await visitors.list(load={"*": "noload"}, id=visitor.id)
+    assert len(count_statements) == 1
+    assert listed[0].messages == []
+
+    count_statements.clear()
+    listed = await visitors.list(load={"messages": "selectin"}, id=visitor.id)
+    assert len(count_statements) == 2
+    assert len(listed[0].messages) == 3
+
+    count_statements.clear()
+    page = await messages.paginate(
+        limit=10, load={"*": "noload"}, columns=["content"], visitor_id=visitor.id
+    )
+    assert len(count_statements) == 1
+    assert "sender" not in count_statements[0]
+    assert all(message.content for message in page.items)
+
+    listed = await visitors.list(load={"messages": "raise"}, id=visitor.id)
+    with pytest.raises(InvalidRequestError):
+        listed[0].messages
+
+    fetched = await visitors.get(visitor.id, load={"messages": "joined"})
+    assert len(fetched.messages) == 3
+
+    with pytest.raises(ValueError):
+        await visitors.list(load={"messages": "eager"})
+    with pytest.raises(ValueError):
+        await visitors.list(load={"nothing": "noload"})
+    with pytest.raises(ValueError):
+        await visitors.list(columns=["nothing"])
+
+    for message in fetched.messages:
+        await messages.delete(message.id)
+    await visitors.delete(visitor.id)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_create_many(
+    my_sqlalchemy_repository_and_factory, create_sqlite_engine, count_statements
+):
+    repo, factory = my_sqlalchemy_repository_and_factory
+    data = [
+        {key: value for key, value in asdict(factory.build()).items() if value}
+        for _ in range(7)
+    ]
+
+    result = await repo.create_many(data, chunk_size=3)
+    assert result.errors == []
+    assert len(result.items) == 7
+    assert [entity.id for entity in result.items] == sorted(
+        entity.id for entity in result.items
+    )
+    for item, entity in zip(data, result.items):
+        assert entity.created_at
+        for key, value in item.items():
+            assert getattr(entity, key) == value
+
+    # a failing row only fails itself; the rest of its chunk is kept
+    broken = [data[0], {**data[1], "id": result.items[0].id}, data[2]]
+    partial = await repo.create_many(broken, chunk_size=10)
+    assert [error.index for error in partial.errors] == [1]
+    assert "UNIQUE" in partial.errors[0].detail
+    assert len(partial.items) == 2
+
+    for entity in result.items + partial.items:
+        await repo.delete(entity.id)
+    assert await repo.list() == []
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_update_and_delete_where(
+    create_sqlite_engine, count_statements
+):
+    sessionmaker = get_sessionmaker(create_sqlite_engine)
+    messages = SQLAlchemyRepository(sessionmaker, MessageModel)
+    data = [
+        {**asdict(MessageFactory.build()), "receiver": receiver}
+        for receiver in ("alice", "alice", "bob")
+    ]
+    created = (await messages.create_many(data)).items
+
+    updated = await messages.update_where({"receiver": "carol"}, receiver="alice")
+    assert sorted(m.id for m in updated) == [created[0].id, created[1].id]
+    assert [m.receiver for m in updated] == ["carol", "carol"]
+    assert await messages.update_where({"receiver": "dave"}, receiver="nobody") == []
+    assert sorted(m.receiver for m in await messages.list()) == [
+        "bob",
+        "carol",
+        "carol",
+    ]
+
+    with pytest.raises(ValueError):
+        await messages.update_where({"receiver": "erin"})
+    with pytest.raises(ValueError):
+        await messages.delete_where()
+
+    deleted = await messages.delete_where(receiver="carol")
+    assert sorted(deleted) == [created[0].id, created[1].id]
+    assert [m.id for m in await messages.list()] == [created[2].id]
+    assert await messages.delete_where(id=created[2].id) == [created[2].id]
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_update_and_delete_single_statement(
+    create_sqlite_engine,
+):
+    from sqlalchemy import event
+
+    sessionmaker = get_sessionmaker(create_sqlite_engine)
+    messages = SQLAlchemyRepository(sessionmaker, MessageModel)
+    message = await messages.create(asdict(MessageFactory.build()))
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if not statement.startswith("BEGIN"):
+            statements.append(statement)
+
+    event.listen(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+    updated = await messages.update(
+        message.id, {"content": "changed"}, load={"*": "noload"}
+    )
+    assert [s.split()[0] for s in statements] == ["UPDATE"]
+    assert updated.content == "changed"
+    assert updated.sender == message.sender
+
+    statements.clear()
+    await messages.delete(message.id)
+    assert [s.split()[0] for s in statements] == ["DELETE"]
+    event.remove(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+
+    assert await messages.update(message.id, {"content": "gone"}) is None
+    with pytest.raises(EntityNotFoundError):
+        await messages.delete(message.id)
+
+
+@pytest.fixture
+def explain_statements(create_sqlite_engine):
+    """
+    Records SELECTs with their parameters and returns a coroutine giving the
+    query plan of the last one.
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, *args):
+        if statement.startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async def explain():
+        statement, parameters = statements[-1]
+        async with create_sqlite_engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+            return [row[-1] for row in result.all()]
+
+    event.listen(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+    yield explain
+    event.remove(create_sqlite_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "model, filters, index",
+    [
+        (VisitorModel, {"name": "John"}, "ix_visitors_name_created_at_id"),
+        (VisitorModel, {"email": "j@x.com"}, "ix_visitors_email_created_at_id"),
+        (MessageModel, {"visitor_id": 1}, "ix_messages_visitor_id_created_at_id"),
+        (MessageModel, {"sender": "John"}, "ix_messages_sender_created_at_id"),
+        (MessageModel, {"receiver": "Jane"}, "ix_messages_receiver_created_at_id"),
+        (
+            MessageModel,
+            {"receiver": "Jane", "created_at__gte": datetime.datetime(2020, 1, 1)},
+            "ix_messages_receiver_created_at_id",
+        ),
+        (
+            MessageModel,
+            {
+                "created_at__gte": datetime.datetime(2020, 1, 1),
+                "created_at__lt": datetime.datetime(2030, 1, 1),
+            },
+            "ix_messages_created_at_id",
+        ),
+    ],
+)
+async def test_sqlalchemy_repository_filters_use_indexes(
+    create_sqlite_engine, explain_statements, model, filters, index
+):
+    repository = SQLAlchemyRepository(get_sessionmaker(create_sqlite_engine), model)
+    cursor = encode_cursor(
+        SimpleNamespace(id=1, created_at=datetime.datetime(2020, 1, 1))
+    )
+
+    for cursor in (None, cursor):
+        await repository.paginate(
+            limit=10, cursor=cursor, load={"*": "noload"}, **filters
+        )
+        # One index range scan, already in keyset order (no temp B-tree sort).
+        plan = await explain_statements()
+        assert len(plan) == 1
+        assert plan[0].startswith(f"SEARCH {model.__tablename__} USING INDEX {index} ")
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_filter_operators(create_sqlite_engine):
+    messages = SQLAlchemyRepository(
+        get_sessionmaker(create_sqlite_engine), MessageModel
+    )
+    message = await messages.create(asdict(MessageFactory.build()))
+
+    assert [m.id for m in await messages.list(id__gte=message.id)] == [message.id]
+    assert await messages.list(id__lt=message.id, sender=message.sender) == []
+    with pytest.raises(ValueError):
+        await messages.list(id__like=message.id)
+    with pytest.raises(ValueError):
+        await messages.list(unknown=1)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_search(create_sqlite_engine):
+    messages = SQLAlchemyRepository(
+        get_sessionmaker(create_sqlite_engine), MessageModel, messages_search
+    )
+    contents = (
+        "zebra crossing ahead",
+        "zebra zebra everywhere",
+        "no stripes here",
+        "the zebras are grazing",
+    )
+    created = await messages.create_many(
+        [{**asdict(MessageFactory.build()), "content": c} for c in contents]
+    )
+    ids = [message.id for message in created.items]
+
+    page = await messages.search("zebra", limit=2)
+    assert [hit.entity.id for hit in page.items] == [ids[1], ids[0]]
+    assert page.items[0].rank <= page.items[1].rank
+    assert page.items[0].snippet == "<mark>zebra</mark> <mark>zebra</mark> everywhere"
+    page = await messages.search("zebra", limit=2, cursor=page.next_cursor)
+    assert [hit.entity.id for hit in page.items] == [ids[3]]
+    assert page.next_cursor is None
+
+    await messages.update(ids[2], {"content": "a zebra after all"})
+    await messages.delete(ids[1])
+    page = await messages.search("zebra", limit=10, sender=created.items[2].sender)
+    assert [hit.entity.id for hit in page.items] == [ids[2]]
+    page = await messages.search("zebra", limit=10, id__gte=ids[0])
+    assert {hit.entity.id for hit in page.items} == {ids[0], ids[2], ids[3]}
+
+    with pytest.raises(ValueError):
+        await messages.search('"unterminated', limit=10)
+    with pytest.raises(NotImplementedError):
+        await SQLAlchemyRepository(
+            get_sessionmaker(create_sqlite_engine), MessageModel
+        ).search("zebra", limit=10)
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_version(create_sqlite_engine, count_statements):
+    sessionmaker = get_sessionmaker(create_sqlite_engine)
+    visitors = SQLAlchemyRepository(sessionmaker, VisitorModel)
+    messages = SQLAlchemyRepository(sessionmaker, MessageModel)
+    created = [await visitors.create(asdict(VisitorFactory.build())) for _ in range(3)]
+    await messages.create(
+        {**asdict(MessageFactory.build()), "visitor_id": created[0].id}
+    )
+
+    count_statements.clear()
+    version = await visitors.version(limit=2, include=("messages",))
+    assert len(count_statements) == 2
+    page = await visitors.paginate(limit=2, load={"messages": "selectin"})
+    assert version == Version.of(page.items, ("messages",))
+    assert version.count == 2
+    assert version.etag.startswith('W/"')
+
+    await messages.create(
+        {**asdict(MessageFactory.build()), "visitor_id": created[1].id}
+    )
+    assert await visitors.version(limit=2, include=("messages",)) != version
+    assert await visitors.version(limit=2) == Version.of(page.items)
+
+    await visitors.delete(created[1].id)
+    assert await visitors.version(limit=2) != Version.of(page.items)
+    assert (await visitors.version(id=created[1].id)).count == 0
+
+    # edits within the same second share updated_at but not the revision
+    version = await visitors.version(id=created[0].id)
+    updated = await visitors.update(created[0].id, {"name": "edited"})
+    assert updated.revision == created[0].revision + 1
+    assert await visitors.version(id=created[0].id) != version
+    version = await visitors.version(id=created[0].id)
+    again = await visitors.update_where({"name": "again"}, id=created[0].id)
+    assert [visitor.revision for visitor in again] == [updated.revision + 1]
+    assert await visitors.version(id=created[0].id) != version
+
+
+@pytest.mark.asyncio
+async def test_sqlalchemy_repository_read_write_split(tmp_path):
+    engines = {}
+    for name in ("primary", "replica"):
+        engines[name] = await create_database_engine(
+            f"sqlite+aiosqlite:///{tmp_path / name}.sqlite"
+        )
+        await migrations.upgrade(engines[name])
+    primary, replica = (get_sessionmaker(engine) for engine in engines.values())
+
+    visitors = SQLAlchemyRepository(primary, VisitorModel, read_sessionmaker=replica)
+    assert await visitors.list() == []
+    visitor = await visitors.create(asdict(VisitorFactory.build()))
+    # the write pins this repository's reads to the primary
+    assert [v.id for v in await visitors.list()] == [visitor.id]
+
+    visitors = SQLAlchemyRepository(primary, VisitorModel, read_sessionmaker=replica)
+    assert await visitors.get(visitor.id) is None
+    assert (await visitors.paginate(limit=10)).items == []
+    assert await visitors.version() == Version.of([])
+    for engine in engines.values():
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cached_repository(create_sqlite_engine, count_statements):
+    sessionmaker = get_sessionmaker(create_sqlite_engine)
+    shared = InMemorySharedCache()
+    visitors = CachedRepository(
+        SQLAlchemyRepository(sessionmaker, VisitorModel),
+        LRUCache(maxsize=10),
+        "visitors",
+        shared=shared,
+    )
+    messages = CachedRepository(
+        SQLAlchemyRepository(sessionmaker, MessageModel),
+        LRUCache(maxsize=10),
+        "messages",
+        shared=shared,
+        related={"visitor_id": visitors},
+    )
+    visitor = await visitors.create(asdict(VisitorFactory.build()))
+
+    count_statements.clear()
+    first = await visitors.get(visitor.id)
+    assert await visitors.get(visitor.id) is first
+    assert len(count_statements) == 2  # the visitor and its messages, once
+    assert visitors.cache.stats.hits == 1
+    assert visitors.cache.stats.misses == 1
+
+    # another process' local cache misses but the shared cache hits
+    other = CachedRepository(visitors.repository, LRUCache(), "visitors", shared)
+    count_statements.clear()
+    assert await other.get(visitor.id) is first
+    assert count_statements == []
+
+    # writes to a message invalidate the visitor it belongs to
+    message = await messages.create(
+        {**asdict(MessageFactory.build()), "visitor_id": visitor.id}
+    )
+    assert [m.id for m in (await visitors.get(visitor.id)).messages] == [message.id]
+
+    await messages.get(message.id)
+    await messages.update(message.id, {"content": "changed"})
+    assert (await messages.get(message.id)).content == "changed"
+    assert (await visitors.get(visitor.id)).messages[0].content == "changed"
+
+    await messages.delete(message.id)
+    assert await messages.get(message.id) is None
+    assert (await visitors.get(visitor.id)).messages == []
+
+    # bulk writes clear the caches
+    await visitors.update_where({"name": "renamed"}, id=visitor.id)
+    assert (await visitors.get(visitor.id)).name == "renamed"
+
+    # loading options bypass the cache
+    count_statements.clear()
+    await visitors.get(visitor.id, load={"*": "noload"})
+    assert len(count_statements) == 1
+
+    await visitors.delete(visitor.id)
+    assert await visitors.get(visitor.id) is None
+    fresh = CachedRepository(visitors.repository, LRUCache(), "visitors", shared)
+    assert await fresh.get(visitor.id) is None
@@ -0,0 +1,76 @@
+"""
+Guards the cold start of the package entry points: importing them must not
+load the heavy dependencies, which only the commands that need them import.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parents[2]
+HEAVY_MODULES = (
+    "fastapi",
+    "starlette",
+    "pydantic",
+    "sqlalchemy",
+    "decouple",
+    "uvicorn",
+)
+# Microseconds; the entry points import in about 15ms, leaving room for slow CI.
+BUDGET = 100_000
+
+
+def import_times(*args: str) -> dict[str, int]:
+    """
+    Returns the cumulative import time in microseconds of every module that
+    a fresh interpreter run with `args` loads.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time: <self> | <cumulative> | <indented module name>"
+        fields = line.split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+@pytest.mark.parametrize("module", ["src.python", "src.python.__main__"])
+def test_entry_point_import_time(module):
+    times = import_times("-c", f"import {module}")
+
+    assert module in times
+    assert not [name for name in HEAVY_MODULES if name in times]
+    assert times[module] < BUDGET
+
+
+def test_consume_does_not_import_the_api(tmp_path):
+    source = tmp_path / "messages.ndjson"
+    source.write_text('{"content": "hi", "sender": "a", "receiver": "b"}\n')
+    database_url = f"sqlite+aiosqlite:///{tmp_path / 'consume.sqlite'}"
+
+    times = import_times(
+        "-m", "src.python", "consume", str(source), "--database-url", database_url
+    )
+
+    assert "src.python.adapters.incoming.consumer" in times
+    assert "src.python.adapters.incoming.schemas" in times
+    assert not [name for name in ("fastapi", "starlette") if name in times]
+    assert "src.python.adapters.incoming.api" not in times
+
+
+def test_app_is_imported_on_access():
+    import src.python
+    from src.python.adapters.incoming.api import app
+
+    assert src.python.app is app
+    with pytest.raises(AttributeError):
+        src.python.missing